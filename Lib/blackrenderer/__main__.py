@@ -2,7 +2,11 @@ import argparse
 import os
 import pathlib
 import re
+import sys
+from .paintStats import PaintStats
 from .render import renderText
+from .renderCache import RenderCache
+from .trace import Tracer
 from .backends import listBackends
 
 
@@ -24,14 +28,57 @@ def main():
         "output",
         metavar="OUTPUT",
         type=outputFilePath,
-        help="an output file name, with .png, .pdf or .svg extension, "
-        "or '-', to print SVG to stdout",
+        nargs="+",
+        help="one or more output file names, with .png, .pdf or .svg extension, "
+        "or '-', to print SVG to stdout. The text is only drawn once when "
+        "rendering to multiple files",
     )
     parser.add_argument("--font-size", type=float, default=250)
     parser.add_argument("--features", type=parseFeatures)
     parser.add_argument("--variations", type=parseVariations)
     parser.add_argument("--margin", type=float, default=20)
     parser.add_argument("--palette-index", type=int, default=0)
+    parser.add_argument(
+        "--auto-crop",
+        action="store_true",
+        help="Size the image to the painted area instead of the glyph "
+        "extents or clip boxes.",
+    )
+    parser.add_argument(
+        "--glyph-cache-dir",
+        type=pathlib.Path,
+        help="A directory to cache compiled glyphs in, so subsequent runs "
+        "don't need to process the same glyphs again. It can be shared "
+        "between processes.",
+    )
+    parser.add_argument(
+        "--result-cache-dir",
+        type=pathlib.Path,
+        help="A directory to cache rendered images in. Identical requests "
+        "are served from the cache. It can be shared between processes.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print call counts and timings per glyph, per Paint format and "
+        "per Canvas method to stderr. There are no Paint format statistics "
+        "with the harfbuzz engine.",
+    )
+    parser.add_argument(
+        "--trace",
+        type=pathlib.Path,
+        metavar="TRACE_FILE",
+        help="Write the timings of the render phases to TRACE_FILE, as Chrome "
+        "trace event JSON, to be viewed with chrome://tracing or "
+        "https://ui.perfetto.dev",
+    )
+    parser.add_argument(
+        "--engine",
+        default="python",
+        choices=["python", "harfbuzz"],
+        help="The paint graph traversal engine -- defaults to python. The "
+        "harfbuzz engine needs uharfbuzz 0.39 or later.",
+    )
     parser.add_argument(
         "--backend",
         default=None,
@@ -40,6 +87,12 @@ def main():
         ".svg, in which case the svg backend will be used.",
     )
     args = parser.parse_args()
+    if args.result_cache_dir is not None:
+        resultCache = RenderCache(cacheDir=args.result_cache_dir)
+    else:
+        resultCache = None
+    paintStats = PaintStats() if args.stats else None
+    tracer = Tracer() if args.trace is not None else None
     renderText(
         args.font,
         args.text,
@@ -50,7 +103,17 @@ def main():
         variations=args.variations,
         paletteIndex=args.palette_index,
         backendName=args.backend,
+        autoCrop=args.auto_crop,
+        glyphCacheDir=args.glyph_cache_dir,
+        resultCache=resultCache,
+        paintStats=paintStats,
+        tracer=tracer,
+        engine=args.engine,
     )
+    if tracer is not None:
+        tracer.save(args.trace)
+    if paintStats is not None:
+        paintStats.printReport(perGlyph=True, file=sys.stderr)
 
 
 def existingFilePath(path):
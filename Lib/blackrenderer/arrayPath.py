@@ -0,0 +1,338 @@
+from fontTools.pens.basePen import (
+    MissingComponentError,
+    decomposeQuadraticSegment,
+    decomposeSuperBezierSegment,
+)
+from fontTools.pens.recordingPen import RecordingPen
+from fontTools.pens.transformPen import TransformPen
+import threading
+import numpy as np
+import uharfbuzz as hb
+
+
+# The verb values match Skia's SkPath::Verb values, so the verbs array can be
+# handed to skia.Path.Make() as is (after removing END verbs).
+MOVE = 0
+LINE = 1
+QUAD = 2
+CUBIC = 4
+CLOSE = 5
+END = 6  # end of an open contour, not a Skia verb
+
+# Number of points consumed by each verb, indexed by verb value
+VERB_NUM_POINTS = np.array([1, 1, 2, 2, 3, 0, 0], dtype=np.intp)
+
+_emptyVerbs = np.empty(0, dtype=np.uint8)
+_emptyPoints = np.empty((0, 2), dtype=np.float64)
+
+
+class ArrayPath:
+    """A compact path, storing its verbs in a uint8 array and its points
+    in a float64 N×2 array.
+
+    An ArrayPath is constructed through the pen protocol, and can be replayed
+    into any other pen with the replay() method. Components are decomposed,
+    by looking up their base glyphs in 'glyphSet'.
+    """
+
+    def __init__(self, verbs=None, points=None, glyphSet=None):
+        if verbs is None:
+            verbs = _emptyVerbs
+            points = _emptyPoints
+        self._verbs = verbs
+        self._points = points
+        self.glyphSet = glyphSet
+        # Construction buffers, consolidated into the arrays upon access
+        self._verbBuffer = []
+        self._coordBuffer = []
+
+    @classmethod
+    def concat(cls, paths):
+        paths = list(paths)
+        if not paths:
+            return cls()
+        return cls(
+            np.concatenate([p.verbs for p in paths]),
+            np.concatenate([p.points for p in paths]),
+        )
+
+    def __repr__(self):
+        return f"ArrayPath(<{len(self.verbs)} verbs, {len(self.points)} points>)"
+
+    def __len__(self):
+        return len(self.verbs)
+
+    @property
+    def verbs(self):
+        self._consolidate()
+        return self._verbs
+
+    @property
+    def points(self):
+        self._consolidate()
+        return self._points
+
+    def _consolidate(self):
+        if not self._verbBuffer:
+            return
+        verbs = np.array(self._verbBuffer, dtype=np.uint8)
+        points = np.array(self._coordBuffer, dtype=np.float64).reshape((-1, 2))
+        if len(self._verbs):
+            verbs = np.concatenate([self._verbs, verbs])
+            points = np.concatenate([self._points, points])
+        self._verbs = verbs
+        self._points = points
+        self._verbBuffer = []
+        self._coordBuffer = []
+
+    @property
+    def bounds(self):
+        """The bounding box of all points (including off-curve points), or
+        None if the path has no points.
+        """
+        return pointsBounds(self.points)
+
+    def transformed(self, transform):
+        """Return a new ArrayPath with all points transformed by the 2x3
+        affine 'transform'.
+        """
+        return ArrayPath(self.verbs, transformPoints(self.points, transform))
+
+    # Pen protocol
+
+    def moveTo(self, pt):
+        self._verbBuffer.append(MOVE)
+        self._coordBuffer.extend(pt)
+
+    def lineTo(self, pt):
+        self._verbBuffer.append(LINE)
+        self._coordBuffer.extend(pt)
+
+    def curveTo(self, *points):
+        numPoints = len(points)
+        if numPoints == 3:
+            self._verbBuffer.append(CUBIC)
+            for pt in points:
+                self._coordBuffer.extend(pt)
+        elif numPoints == 2:
+            self.qCurveTo(*points)
+        elif numPoints == 1:
+            self.lineTo(points[0])
+        else:
+            for segment in decomposeSuperBezierSegment(points):
+                self.curveTo(*segment)
+
+    def qCurveTo(self, *points):
+        if points[-1] is None:
+            # TrueType contour without on-curve points
+            x, y = points[-2]
+            nx, ny = points[0]
+            impliedStartPoint = (0.5 * (x + nx), 0.5 * (y + ny))
+            self.moveTo(impliedStartPoint)
+            points = points[:-1] + (impliedStartPoint,)
+        numPoints = len(points)
+        if numPoints == 2:
+            self._verbBuffer.append(QUAD)
+            for pt in points:
+                self._coordBuffer.extend(pt)
+        elif numPoints == 1:
+            self.lineTo(points[0])
+        else:
+            for segment in decomposeQuadraticSegment(points):
+                self.qCurveTo(*segment)
+
+    def closePath(self):
+        self._verbBuffer.append(CLOSE)
+
+    def endPath(self):
+        self._verbBuffer.append(END)
+
+    def addComponent(self, glyphName, transformation):
+        # Decompose, like fontTools' DecomposingPen
+        if self.glyphSet is None or glyphName not in self.glyphSet:
+            raise MissingComponentError(glyphName)
+        self.glyphSet[glyphName].draw(TransformPen(self, transformation))
+
+    def appendOutline(self, verbs, coords):
+        """Append an outline as returned by getGlyphOutline()."""
+        self._verbBuffer.extend(verbs)
+        self._coordBuffer.extend(coords)
+
+    def appendArrays(self, verbs, points):
+        """Append an outline given as a verbs array and an N×2 points array.
+        If the path is empty, it takes the arrays without copying.
+        """
+        self._consolidate()
+        if len(self._verbs):
+            verbs = np.concatenate([self._verbs, verbs])
+            points = np.concatenate([self._points, points])
+        self._verbs = verbs
+        self._points = points
+
+    # Pen protocol output
+
+    def replay(self, pen):
+        points = self.points.tolist()
+        pointIndex = 0
+        for verb in self.verbs.tolist():
+            if verb == MOVE:
+                pen.moveTo(tuple(points[pointIndex]))
+                pointIndex += 1
+            elif verb == LINE:
+                pen.lineTo(tuple(points[pointIndex]))
+                pointIndex += 1
+            elif verb == QUAD:
+                pen.qCurveTo(tuple(points[pointIndex]), tuple(points[pointIndex + 1]))
+                pointIndex += 2
+            elif verb == CUBIC:
+                pen.curveTo(
+                    tuple(points[pointIndex]),
+                    tuple(points[pointIndex + 1]),
+                    tuple(points[pointIndex + 2]),
+                )
+                pointIndex += 3
+            elif verb == CLOSE:
+                pen.closePath()
+            elif verb == END:
+                pen.endPath()
+            else:
+                raise ValueError(f"unknown verb: {verb}")
+
+    draw = replay
+
+    @property
+    def value(self):
+        """The path as a list of (operator, operands) tuples, like
+        fontTools' RecordingPen.value.
+        """
+        pen = RecordingPen()
+        self.replay(pen)
+        return pen.value
+
+
+def getGlyphOutline(hbFont, glyphID):
+    """Return the outline of a glyph as a (verbs, coords) tuple, where 'verbs'
+    is a list of verb values, and 'coords' a flat list of x, y coordinates.
+
+    The outline is collected straight from HarfBuzz's draw callbacks, so it
+    can be handed to a backend in bulk, instead of segment by segment through
+    the pen protocol.
+    """
+    if _fontHasDrawGlyph:
+        outline = _Outline()
+        hbFont.draw_glyph(glyphID, _getDrawFuncs(), outline)
+    else:
+        # Older uharfbuzz versions take the callback data when setting the
+        # callbacks, so we keep a DrawFuncs object per thread
+        drawFuncs, outline = _getThreadDrawFuncs()
+        outline.verbs = []
+        outline.coords = []
+        drawFuncs.get_glyph_shape(hbFont, glyphID)
+    return outline.verbs, outline.coords
+
+
+def replayOutline(verbs, coords, pen):
+    """Draw an outline as returned by getGlyphOutline() into 'pen'."""
+    i = 0
+    for verb in verbs:
+        if verb == MOVE:
+            pen.moveTo((coords[i], coords[i + 1]))
+            i += 2
+        elif verb == LINE:
+            pen.lineTo((coords[i], coords[i + 1]))
+            i += 2
+        elif verb == QUAD:
+            pen.qCurveTo((coords[i], coords[i + 1]), (coords[i + 2], coords[i + 3]))
+            i += 4
+        elif verb == CUBIC:
+            pen.curveTo(
+                (coords[i], coords[i + 1]),
+                (coords[i + 2], coords[i + 3]),
+                (coords[i + 4], coords[i + 5]),
+            )
+            i += 6
+        elif verb == CLOSE:
+            pen.closePath()
+        elif verb == END:
+            pen.endPath()
+        else:
+            raise ValueError(f"unknown verb: {verb}")
+
+
+class _Outline:
+    __slots__ = ("verbs", "coords")
+
+    def __init__(self):
+        self.verbs = []
+        self.coords = []
+
+
+def _moveTo(x, y, outline):
+    outline.verbs.append(MOVE)
+    outline.coords += (x, y)
+
+
+def _lineTo(x, y, outline):
+    outline.verbs.append(LINE)
+    outline.coords += (x, y)
+
+
+def _quadTo(x1, y1, x2, y2, outline):
+    outline.verbs.append(QUAD)
+    outline.coords += (x1, y1, x2, y2)
+
+
+def _cubicTo(x1, y1, x2, y2, x3, y3, outline):
+    outline.verbs.append(CUBIC)
+    outline.coords += (x1, y1, x2, y2, x3, y3)
+
+
+def _closePath(outline):
+    outline.verbs.append(CLOSE)
+
+
+_fontHasDrawGlyph = hasattr(hb.Font, "draw_glyph")
+_drawFuncs = None
+_threadDrawFuncs = threading.local()
+
+
+def _getDrawFuncs():
+    global _drawFuncs
+    if _drawFuncs is None:
+        drawFuncs = hb.DrawFuncs()
+        drawFuncs.set_move_to_func(_moveTo)
+        drawFuncs.set_line_to_func(_lineTo)
+        drawFuncs.set_quadratic_to_func(_quadTo)
+        drawFuncs.set_cubic_to_func(_cubicTo)
+        drawFuncs.set_close_path_func(_closePath)
+        _drawFuncs = drawFuncs
+    return _drawFuncs
+
+
+def _getThreadDrawFuncs():
+    value = getattr(_threadDrawFuncs, "value", None)
+    if value is None:
+        outline = _Outline()
+        drawFuncs = hb.DrawFuncs()
+        drawFuncs.set_move_to_func(_moveTo, outline)
+        drawFuncs.set_line_to_func(_lineTo, outline)
+        drawFuncs.set_quadratic_to_func(_quadTo, outline)
+        drawFuncs.set_cubic_to_func(_cubicTo, outline)
+        drawFuncs.set_close_path_func(_closePath, outline)
+        value = _threadDrawFuncs.value = drawFuncs, outline
+    return value
+
+
+def transformPoints(points, transform):
+    """Transform an N×2 array of points by the 2x3 affine 'transform'."""
+    xx, yx, xy, yy, dx, dy = transform
+    matrix = np.array([[xx, yx], [xy, yy]], dtype=np.float64)
+    return points @ matrix + (dx, dy)
+
+
+def pointsBounds(points):
+    if not len(points):
+        return None
+    xMin, yMin = points.min(axis=0).tolist()
+    xMax, yMax = points.max(axis=0).tolist()
+    return xMin, yMin, xMax, yMax
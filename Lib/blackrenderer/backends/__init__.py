@@ -6,12 +6,14 @@ _surfaces = {
     None: {
         "cairo": "blackrenderer.backends.cairo.CairoPixelSurface",
         "coregraphics": "blackrenderer.backends.coregraphics.CoreGraphicsPixelSurface",
+        "numpy": "blackrenderer.backends.numpy.NumpyPixelSurface",
         "skia": "blackrenderer.backends.skia.SkiaPixelSurface",
         "svg": "blackrenderer.backends.svg.SVGSurface",
     },
     ".png": {
         "cairo": "blackrenderer.backends.cairo.CairoPixelSurface",
         "coregraphics": "blackrenderer.backends.coregraphics.CoreGraphicsPixelSurface",
+        "numpy": "blackrenderer.backends.numpy.NumpyPixelSurface",
         "skia": "blackrenderer.backends.skia.SkiaPixelSurface",
     },
     ".pdf": {
@@ -111,3 +111,8 @@ class Surface(ABC):
     @abstractmethod
     def saveImage(self, path):
         ...
+
+    def encodeImage(self):
+        # Return the data that saveImage() writes, or None for surfaces that
+        # can only save to a file
+        return None
@@ -1,10 +1,9 @@
 from contextlib import contextmanager
 import os
 from math import sqrt
-from fontTools.pens.basePen import BasePen
-from fontTools.pens.recordingPen import RecordingPen
 from fontTools.ttLib.tables.otTables import CompositeMode, ExtendMode
 import cairo
+from ..arrayPath import CLOSE, CUBIC, LINE, MOVE, QUAD, ArrayPath
 from .base import Canvas, Surface
 from .sweepGradient import buildSweepGradientPatches
 
@@ -48,32 +47,13 @@ _extendModeMap = {
 }
 
 
-class CairoPen(BasePen):
-    def __init__(self, context):
-        super().__init__(None)
-        self.context = context
-
-    def _moveTo(self, pt):
-        self.context.move_to(*pt)
-
-    def _lineTo(self, pt):
-        self.context.line_to(*pt)
-
-    def _curveToOne(self, pt1, pt2, pt3):
-        self.context.curve_to(*pt1, *pt2, *pt3)
-
-    def _closePath(self):
-        self.context.close_path()
-
-
 class CairoCanvas(Canvas):
     def __init__(self, context):
         self.context = context
-        self._pen = CairoPen(context)
 
     @staticmethod
     def newPath():
-        return RecordingPen()
+        return ArrayPath()
 
     @contextmanager
     def savedState(self):
@@ -100,7 +80,7 @@ class CairoCanvas(Canvas):
 
     def clipPath(self, path):
         self.context.new_path()
-        path.replay(self._pen)
+        self._appendPath(path)
         self.context.clip()
 
     def drawPathSolid(self, path, color):
@@ -155,7 +135,7 @@ class CairoCanvas(Canvas):
         self.context.save()
         if path is not None:
             self.context.new_path()
-            path.replay(self._pen)
+            self._appendPath(path)
             self.context.clip()
         # else: unbounded source, paint the entire clip area
         self.transform(gradientTransform)
@@ -196,12 +176,51 @@ class CairoCanvas(Canvas):
 
     def _drawPath(self, path):
         if path is not None:
-            path.replay(self._pen)
+            self._appendPath(path)
         else:
             # unbounded source, paint the entire clip area
             x1, y1, x2, y2 = self.context.clip_extents()
             self.context.rectangle(x1, y1, x2 - x1, y2 - y1)
 
+    def _appendPath(self, path):
+        # Feed the path's arrays to cairo directly. Cairo has no quadratic
+        # curves, so convert them to cubics.
+        context = self.context
+        coords = path.points.ravel().tolist()
+        i = 0
+        for verb in path.verbs.tolist():
+            if verb == MOVE:
+                context.move_to(coords[i], coords[i + 1])
+                i += 2
+            elif verb == LINE:
+                context.line_to(coords[i], coords[i + 1])
+                i += 2
+            elif verb == QUAD:
+                x0, y0 = context.get_current_point()
+                x1, y1, x2, y2 = coords[i], coords[i + 1], coords[i + 2], coords[i + 3]
+                context.curve_to(
+                    x0 + 2 / 3 * (x1 - x0),
+                    y0 + 2 / 3 * (y1 - y0),
+                    x2 + 2 / 3 * (x1 - x2),
+                    y2 + 2 / 3 * (y1 - y2),
+                    x2,
+                    y2,
+                )
+                i += 4
+            elif verb == CUBIC:
+                context.curve_to(
+                    coords[i],
+                    coords[i + 1],
+                    coords[i + 2],
+                    coords[i + 3],
+                    coords[i + 4],
+                    coords[i + 5],
+                )
+                i += 6
+            elif verb == CLOSE:
+                context.close_path()
+            # END: nothing to do, the next contour starts with a MOVE
+
 
 class CairoPixelSurface(Surface):
     fileExtension = ".png"
@@ -5,6 +5,7 @@ from fontTools.pens.basePen import BasePen
 from fontTools.ttLib.tables.otTables import CompositeMode, ExtendMode
 from CoreFoundation import CFDataCreateMutable
 import Quartz as CG
+from ..arrayPath import CLOSE, CUBIC, LINE, MOVE, QUAD
 from .base import Canvas, Surface
 from .sweepGradient import buildSweepGradientPatches
 
@@ -64,6 +65,37 @@ class CoreGraphicsPathPen(BasePen):
     def _closePath(self):
         CG.CGPathCloseSubpath(self.path)
 
+    def appendOutline(self, verbs, coords):
+        # Bypass the pen protocol, see arrayPath.getGlyphOutline()
+        path = self.path
+        i = 0
+        for verb in verbs:
+            if verb == MOVE:
+                CG.CGPathMoveToPoint(path, None, coords[i], coords[i + 1])
+                i += 2
+            elif verb == LINE:
+                CG.CGPathAddLineToPoint(path, None, coords[i], coords[i + 1])
+                i += 2
+            elif verb == QUAD:
+                CG.CGPathAddQuadCurveToPoint(
+                    path, None, coords[i], coords[i + 1], coords[i + 2], coords[i + 3]
+                )
+                i += 4
+            elif verb == CUBIC:
+                CG.CGPathAddCurveToPoint(
+                    path,
+                    None,
+                    coords[i],
+                    coords[i + 1],
+                    coords[i + 2],
+                    coords[i + 3],
+                    coords[i + 4],
+                    coords[i + 5],
+                )
+                i += 6
+            elif verb == CLOSE:
+                CG.CGPathCloseSubpath(path)
+
 
 class CoreGraphicsCanvas(Canvas):
     def __init__(self, context):
@@ -0,0 +1,636 @@
+from contextlib import contextmanager
+import math
+import os
+import struct
+from typing import NamedTuple
+import zlib
+from fontTools.misc.transform import Transform
+from fontTools.ttLib.tables.otTables import CompositeMode, ExtendMode
+import numpy as np
+from ..arrayPath import CUBIC, LINE, MOVE, QUAD, VERB_NUM_POINTS, ArrayPath
+from .base import Canvas, Surface
+
+
+# Number of sub-scanlines per pixel row. Horizontal coverage is computed
+# exactly, vertical coverage is sampled.
+SUBSAMPLES = 16
+
+# Maximum distance (in pixels) between a curve and its flattened polyline
+FLATTEN_TOLERANCE = 0.1
+
+# Number of entries in a gradient color lookup table
+COLOR_LUT_SIZE = 1024
+
+
+class NumpyCanvas(Canvas):
+    def __init__(self, image, transform):
+        self.width = image.shape[1]
+        self.height = image.shape[0]
+        # A stack of premultiplied float32 RGBA images. The first one is the
+        # surface itself; compositeMode() pushes additional layers.
+        self.layers = [image]
+        self.currentTransform = transform
+        self.clipMask = None  # None means: not clipped
+
+    @staticmethod
+    def newPath():
+        return ArrayPath()
+
+    @contextmanager
+    def savedState(self):
+        savedTransform = self.currentTransform
+        savedClipMask = self.clipMask
+        try:
+            yield
+        finally:
+            self.currentTransform = savedTransform
+            self.clipMask = savedClipMask
+
+    @contextmanager
+    def compositeMode(self, compositeMode):
+        blendFunc = _blendFuncs[compositeMode]
+        clipMask = self.clipMask
+        layer = np.zeros_like(self.layers[-1])
+        self.layers.append(layer)
+        try:
+            with self.savedState():
+                yield
+        finally:
+            self.layers.pop()
+        backdrop = self.layers[-1]
+        result = blendFunc(layer, backdrop)
+        if clipMask is not None:
+            result = backdrop + (result - backdrop) * clipMask[..., None]
+        backdrop[:] = result
+
+    def transform(self, transform):
+        self.currentTransform = self.currentTransform.transform(transform)
+
+    def clipPath(self, path):
+        clipMask = np.zeros((self.height, self.width), dtype=np.float32)
+        coverage = self._rasterize(path)
+        if coverage is not None:
+            clipMask[coverage.rows, coverage.cols] = coverage.values
+        if self.clipMask is not None:
+            clipMask *= self.clipMask
+        self.clipMask = clipMask
+
+    def drawPathSolid(self, path, color):
+        coverage = self._getCoverage(path)
+        if coverage is None:
+            return
+        self._fill(coverage, _premultiply(np.array(color, dtype=np.float32)))
+
+    def drawPathLinearGradient(
+        self, path, colorLine, pt1, pt2, extendMode, gradientTransform
+    ):
+        coverage = self._getCoverage(path)
+        if coverage is None:
+            return
+        x, y = self._gradientSpaceCoordinates(coverage, gradientTransform)
+        x1, y1 = pt1
+        dx = pt2[0] - x1
+        dy = pt2[1] - y1
+        squaredLength = dx * dx + dy * dy
+        if squaredLength == 0:
+            return
+        t = ((x - x1) * dx + (y - y1) * dy) / squaredLength
+        self._fillGradient(coverage, colorLine, t, extendMode)
+
+    def drawPathRadialGradient(
+        self,
+        path,
+        colorLine,
+        startCenter,
+        startRadius,
+        endCenter,
+        endRadius,
+        extendMode,
+        gradientTransform,
+    ):
+        coverage = self._getCoverage(path)
+        if coverage is None:
+            return
+        x, y = self._gradientSpaceCoordinates(coverage, gradientTransform)
+        t, valid = _twoPointConicalParameter(
+            x, y, startCenter, startRadius, endCenter, endRadius
+        )
+        self._fillGradient(coverage, colorLine, t, extendMode, valid)
+
+    def drawPathSweepGradient(
+        self,
+        path,
+        colorLine,
+        center,
+        startAngle,
+        endAngle,
+        extendMode,
+        gradientTransform,
+    ):
+        coverage = self._getCoverage(path)
+        if coverage is None:
+            return
+        # Same angle normalization as the Skia backend
+        startAngle %= 360
+        endAngle %= 360
+        if startAngle >= endAngle:
+            endAngle += 360
+        x, y = self._gradientSpaceCoordinates(coverage, gradientTransform)
+        angle = np.degrees(np.arctan2(y - center[1], x - center[0])) % 360
+        t = (angle - startAngle) / (endAngle - startAngle)
+        self._fillGradient(coverage, colorLine, t, extendMode)
+
+    def _getCoverage(self, path):
+        if path is None:
+            # unbounded source, paint the entire clip area
+            coverage = Coverage(
+                slice(0, self.height),
+                slice(0, self.width),
+                np.ones((self.height, self.width), dtype=np.float32),
+            )
+        else:
+            coverage = self._rasterize(path)
+            if coverage is None:
+                return None
+        if self.clipMask is not None:
+            coverage = coverage._replace(
+                values=coverage.values * self.clipMask[coverage.rows, coverage.cols]
+            )
+        return coverage
+
+    def _rasterize(self, path):
+        return rasterizePath(path, self.currentTransform, self.width, self.height)
+
+    def _gradientSpaceCoordinates(self, coverage, gradientTransform):
+        # Map the pixel centers of the coverage area back to gradient space
+        t = self.currentTransform.transform(gradientTransform).inverse()
+        xx, yx, xy, yy, dx, dy = t
+        px = np.arange(coverage.cols.start, coverage.cols.stop) + 0.5
+        py = np.arange(coverage.rows.start, coverage.rows.stop) + 0.5
+        px, py = np.meshgrid(px, py)
+        return xx * px + xy * py + dx, yx * px + yy * py + dy
+
+    def _fillGradient(self, coverage, colorLine, t, extendMode, valid=None):
+        lut = buildColorLUT(colorLine)
+        t = _extendFuncs[extendMode](t)
+        indices = np.rint(t * (COLOR_LUT_SIZE - 1)).astype(np.intp)
+        np.clip(indices, 0, COLOR_LUT_SIZE - 1, out=indices)
+        colors = lut[indices]
+        if valid is not None:
+            colors[~valid] = 0
+        self._fill(coverage, colors)
+
+    def _fill(self, coverage, color):
+        layer = self.layers[-1]
+        dst = layer[coverage.rows, coverage.cols]
+        src = color * coverage.values[..., None]
+        layer[coverage.rows, coverage.cols] = src + dst * (1 - src[..., 3:])
+
+
+class Coverage(NamedTuple):
+    rows: slice
+    cols: slice
+    values: np.ndarray  # float32 array of shape (numRows, numCols)
+
+
+def rasterizePath(path, transform, width, height):
+    """Compute the antialiased coverage of 'path', transformed by 'transform',
+    using the nonzero winding rule.
+
+    Returns a Coverage tuple describing the covered area of the
+    width × height pixel grid, or None if the path covers no pixels.
+    """
+    edges = flattenPath(path.transformed(transform))
+    if not len(edges):
+        return None
+    x0, y0, x1, y1 = edges.T
+    direction = np.where(y1 > y0, 1, -1)
+    notHorizontal = y0 != y1
+    swap = y0 > y1
+    xa = np.where(swap, x1, x0)[notHorizontal]
+    ya = np.where(swap, y1, y0)[notHorizontal]
+    xb = np.where(swap, x0, x1)[notHorizontal]
+    yb = np.where(swap, y0, y1)[notHorizontal]
+    direction = direction[notHorizontal]
+    if not len(ya):
+        return None
+
+    rowMin = max(0, math.floor(ya.min()))
+    rowMax = min(height, math.ceil(yb.max()))
+    if rowMin >= rowMax:
+        return None
+
+    # Each edge crosses the sub-scanlines kStart <= k < kEnd, where the
+    # sub-scanline k is located at y = (k + 0.5) / SUBSAMPLES
+    kStart = np.ceil(ya * SUBSAMPLES - 0.5).astype(np.intp)
+    kEnd = np.ceil(yb * SUBSAMPLES - 0.5).astype(np.intp)
+    np.clip(kStart, rowMin * SUBSAMPLES, rowMax * SUBSAMPLES, out=kStart)
+    np.clip(kEnd, rowMin * SUBSAMPLES, rowMax * SUBSAMPLES, out=kEnd)
+    counts = kEnd - kStart
+    numCrossings = counts.sum()
+    if not numCrossings:
+        return None
+
+    # Compute all edge/sub-scanline crossings
+    edgeIndices = np.repeat(np.arange(len(counts)), counts)
+    firstCrossing = np.cumsum(counts) - counts
+    k = kStart[edgeIndices] + (np.arange(numCrossings) - firstCrossing[edgeIndices])
+    sampleY = (k + 0.5) / SUBSAMPLES
+    slope = (xb - xa) / (yb - ya)
+    crossX = xa[edgeIndices] + (sampleY - ya[edgeIndices]) * slope[edgeIndices]
+    winding = direction[edgeIndices]
+
+    # Sort the crossings per sub-scanline, from left to right. The winding
+    # number returns to zero at the end of each sub-scanline, so we can
+    # compute the winding numbers for all sub-scanlines in one go.
+    order = np.lexsort((crossX, k))
+    k = k[order]
+    crossX = crossX[order]
+    windingAfter = np.cumsum(winding[order])
+    windingBefore = windingAfter - winding[order]
+    spanStarts = (windingBefore == 0) & (windingAfter != 0)
+    spanEnds = (windingBefore != 0) & (windingAfter == 0)
+    spanRows = k[spanStarts] // SUBSAMPLES - rowMin
+    spanX0 = crossX[spanStarts]
+    spanX1 = crossX[spanEnds]
+
+    colMin = max(0, math.floor(spanX0.min()))
+    colMax = min(width, math.ceil(spanX1.max()))
+    if colMin >= colMax:
+        return None
+    numRows = rowMax - rowMin
+    numCols = colMax - colMin
+
+    # Accumulate the exact horizontal coverage of each span, so that the
+    # cumulative sum over a row gives the coverage for each pixel
+    stride = numCols + 2
+    spanX0 = np.clip(spanX0 - colMin, 0, numCols)
+    spanX1 = np.clip(spanX1 - colMin, 0, numCols)
+    indices = []
+    weights = []
+    for spanX, sign in [(spanX0, 1), (spanX1, -1)]:
+        col = np.floor(spanX)
+        frac = spanX - col
+        index = spanRows * stride + col.astype(np.intp)
+        indices += [index, index + 1]
+        weights += [sign * (1 - frac), sign * frac]
+    accumulator = np.bincount(
+        np.concatenate(indices),
+        weights=np.concatenate(weights) / SUBSAMPLES,
+        minlength=numRows * stride,
+    ).reshape((numRows, stride))
+    values = np.cumsum(accumulator, axis=1)[:, :numCols].astype(np.float32)
+    np.clip(values, 0, 1, out=values)
+    return Coverage(slice(rowMin, rowMax), slice(colMin, colMax), values)
+
+
+def flattenPath(path):
+    """Convert a path into an array of line segments (x0, y0, x1, y1), with
+    all contours closed, and curves approximated by polylines.
+    """
+    verbs = path.verbs
+    points = path.points
+    numPoints = VERB_NUM_POINTS[verbs]
+    firstPoint = np.cumsum(numPoints) - numPoints
+    isMove = verbs == MOVE
+    contourIndices = np.cumsum(isMove) - 1
+    inContour = contourIndices >= 0
+
+    edges = []
+    for verb, flattenFunc in [
+        (LINE, None),
+        (QUAD, _flattenQuadratic),
+        (CUBIC, _flattenCubic),
+    ]:
+        selection = (verbs == verb) & inContour
+        if not selection.any():
+            continue
+        first = firstPoint[selection]
+        segmentPoints = [points[first - 1]] + [
+            points[first + i] for i in range(VERB_NUM_POINTS[verb])
+        ]
+        if flattenFunc is None:
+            edges.append(np.concatenate(segmentPoints, axis=1))
+        else:
+            edges.append(flattenFunc(*segmentPoints))
+
+    # Implicitly close all contours
+    movePoints = firstPoint[isMove]
+    if len(movePoints):
+        pointContours = np.repeat(contourIndices, numPoints)
+        lastPoints = np.flatnonzero(np.diff(pointContours, append=-2))
+        lastPoints = lastPoints[pointContours[lastPoints] >= 0]
+        edges.append(np.concatenate([points[lastPoints], points[movePoints]], axis=1))
+
+    if not edges:
+        return np.empty((0, 4))
+    return np.concatenate(edges)
+
+
+def _flattenQuadratic(p0, p1, p2):
+    deviation = np.hypot(*(p0 - 2 * p1 + p2).T)
+    numSteps = _numFlattenSteps(deviation * 0.25)
+    t0, t1, curveIndices = _stepParameters(numSteps)
+    p0, p1, p2 = p0[curveIndices], p1[curveIndices], p2[curveIndices]
+
+    def evaluate(t):
+        t = t[:, None]
+        mt = 1 - t
+        return mt * mt * p0 + 2 * mt * t * p1 + t * t * p2
+
+    return np.concatenate([evaluate(t0), evaluate(t1)], axis=1)
+
+
+def _flattenCubic(p0, p1, p2, p3):
+    deviation = np.maximum(
+        np.hypot(*(p0 - 2 * p1 + p2).T), np.hypot(*(p1 - 2 * p2 + p3).T)
+    )
+    numSteps = _numFlattenSteps(deviation * 0.75)
+    t0, t1, curveIndices = _stepParameters(numSteps)
+    p0, p1, p2, p3 = (p[curveIndices] for p in (p0, p1, p2, p3))
+
+    def evaluate(t):
+        t = t[:, None]
+        mt = 1 - t
+        return (
+            mt * mt * mt * p0
+            + 3 * mt * mt * t * p1
+            + 3 * mt * t * t * p2
+            + t * t * t * p3
+        )
+
+    return np.concatenate([evaluate(t0), evaluate(t1)], axis=1)
+
+
+def _numFlattenSteps(scaledDeviation):
+    # Wang's formula
+    numSteps = np.ceil(np.sqrt(scaledDeviation / FLATTEN_TOLERANCE))
+    return np.clip(numSteps, 1, 256).astype(np.intp)
+
+
+def _stepParameters(numSteps):
+    curveIndices = np.repeat(np.arange(len(numSteps)), numSteps)
+    firstStep = np.cumsum(numSteps) - numSteps
+    stepIndices = np.arange(len(curveIndices)) - firstStep[curveIndices]
+    stepSize = 1 / numSteps[curveIndices]
+    return stepIndices * stepSize, (stepIndices + 1) * stepSize, curveIndices
+
+
+def buildColorLUT(colorLine, size=COLOR_LUT_SIZE):
+    """Build a premultiplied RGBA color lookup table of 'size' entries from
+    a color line. Colors are interpolated unpremultiplied.
+    """
+    colorLine = sorted(colorLine, key=lambda item: item[0])
+    stops = np.array([stop for stop, color in colorLine], dtype=np.float64)
+    colors = np.array([color for stop, color in colorLine], dtype=np.float64)
+    positions = np.linspace(0, 1, size)
+    lut = np.empty((size, 4), dtype=np.float32)
+    for channel in range(4):
+        lut[:, channel] = np.interp(positions, stops, colors[:, channel])
+    return _premultiply(lut)
+
+
+def _twoPointConicalParameter(x, y, startCenter, startRadius, endCenter, endRadius):
+    # Find the largest t for which the point lies on the circle interpolated
+    # between the start and end circles, with a non-negative radius.
+    cdx = endCenter[0] - startCenter[0]
+    cdy = endCenter[1] - startCenter[1]
+    dr = endRadius - startRadius
+    pdx = x - startCenter[0]
+    pdy = y - startCenter[1]
+    a = cdx * cdx + cdy * cdy - dr * dr
+    b = pdx * cdx + pdy * cdy + startRadius * dr
+    c = pdx * pdx + pdy * pdy - startRadius * startRadius
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if abs(a) < 1e-9:
+            t = c / (2 * b)
+            valid = (startRadius + t * dr >= 0) & np.isfinite(t)
+        else:
+            discriminant = b * b - a * c
+            root = np.sqrt(np.maximum(discriminant, 0))
+            t1 = (b + root) / a
+            t2 = (b - root) / a
+            tMax = np.maximum(t1, t2)
+            tMin = np.minimum(t1, t2)
+            useMax = startRadius + tMax * dr >= 0
+            t = np.where(useMax, tMax, tMin)
+            valid = (discriminant >= 0) & (useMax | (startRadius + tMin * dr >= 0))
+    return np.where(valid, t, 0), valid
+
+
+def _extendPad(t):
+    return np.clip(t, 0, 1)
+
+
+def _extendRepeat(t):
+    return t - np.floor(t)
+
+
+def _extendReflect(t):
+    t = np.abs(t) % 2
+    return np.where(t > 1, 2 - t, t)
+
+
+_extendFuncs = {
+    ExtendMode.PAD: _extendPad,
+    ExtendMode.REPEAT: _extendRepeat,
+    ExtendMode.REFLECT: _extendReflect,
+}
+
+
+def _premultiply(rgba):
+    rgba = np.array(rgba, dtype=np.float32)
+    rgba[..., :3] *= rgba[..., 3:]
+    return rgba
+
+
+def _unpremultiply(rgba):
+    alpha = rgba[..., 3:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rgb = np.where(alpha > 0, rgba[..., :3] / alpha, 0)
+    return np.clip(rgb, 0, 1), alpha
+
+
+# Compositing. All functions take premultiplied RGBA arrays.
+
+
+def _porterDuff(srcFactor, dstFactor):
+    # Return a blend function for result = src * srcFactor + dst * dstFactor,
+    # where the factors are functions of the source and destination alphas
+    def blend(src, dst):
+        sa = src[..., 3:]
+        da = dst[..., 3:]
+        return src * srcFactor(sa, da) + dst * dstFactor(sa, da)
+
+    return blend
+
+
+def _blendPlus(src, dst):
+    return np.minimum(src + dst, 1)
+
+
+def _separable(blendColor):
+    # Return a blend function for a W3C separable or non-separable blend mode,
+    # given the blend function B(Cs, Cb) operating on unpremultiplied colors
+    def blend(src, dst):
+        cs, sa = _unpremultiply(src)
+        cb, da = _unpremultiply(dst)
+        rgb = (1 - da) * src[..., :3] + (1 - sa) * dst[..., :3]
+        rgb += sa * da * blendColor(cs, cb)
+        alpha = sa + da - sa * da
+        return np.concatenate([rgb, alpha], axis=-1)
+
+    return blend
+
+
+def _hardLight(cs, cb):
+    return np.where(cs <= 0.5, cb * 2 * cs, _screen(cb, 2 * cs - 1))
+
+
+def _screen(cs, cb):
+    return cs + cb - cs * cb
+
+
+def _colorDodge(cs, cb):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.minimum(1, cb / (1 - cs))
+    return np.where(cb == 0, 0, np.where(cs >= 1, 1, result))
+
+
+def _colorBurn(cs, cb):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = 1 - np.minimum(1, (1 - cb) / cs)
+    return np.where(cb >= 1, 1, np.where(cs <= 0, 0, result))
+
+
+def _softLight(cs, cb):
+    d = np.where(cb <= 0.25, ((16 * cb - 12) * cb + 4) * cb, np.sqrt(cb))
+    return np.where(
+        cs <= 0.5,
+        cb - (1 - 2 * cs) * cb * (1 - cb),
+        cb + (2 * cs - 1) * (d - cb),
+    )
+
+
+def _lum(c):
+    return (0.3 * c[..., 0] + 0.59 * c[..., 1] + 0.11 * c[..., 2])[..., None]
+
+
+def _clipColor(c):
+    lum = _lum(c)
+    cMin = c.min(axis=-1, keepdims=True)
+    cMax = c.max(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c = np.where(cMin < 0, lum + (c - lum) * lum / (lum - cMin), c)
+        c = np.where(cMax > 1, lum + (c - lum) * (1 - lum) / (cMax - lum), c)
+    return c
+
+
+def _setLum(c, lum):
+    return _clipColor(c + (lum - _lum(c)))
+
+
+def _sat(c):
+    return c.max(axis=-1, keepdims=True) - c.min(axis=-1, keepdims=True)
+
+
+def _setSat(c, sat):
+    cMin = c.min(axis=-1, keepdims=True)
+    cRange = _sat(c)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(cRange > 0, (c - cMin) * sat / cRange, 0)
+
+
+_blendFuncs = {
+    CompositeMode.CLEAR: _porterDuff(lambda sa, da: 0, lambda sa, da: 0),
+    CompositeMode.SRC: _porterDuff(lambda sa, da: 1, lambda sa, da: 0),
+    CompositeMode.DEST: _porterDuff(lambda sa, da: 0, lambda sa, da: 1),
+    CompositeMode.SRC_OVER: _porterDuff(lambda sa, da: 1, lambda sa, da: 1 - sa),
+    CompositeMode.DEST_OVER: _porterDuff(lambda sa, da: 1 - da, lambda sa, da: 1),
+    CompositeMode.SRC_IN: _porterDuff(lambda sa, da: da, lambda sa, da: 0),
+    CompositeMode.DEST_IN: _porterDuff(lambda sa, da: 0, lambda sa, da: sa),
+    CompositeMode.SRC_OUT: _porterDuff(lambda sa, da: 1 - da, lambda sa, da: 0),
+    CompositeMode.DEST_OUT: _porterDuff(lambda sa, da: 0, lambda sa, da: 1 - sa),
+    CompositeMode.SRC_ATOP: _porterDuff(lambda sa, da: da, lambda sa, da: 1 - sa),
+    CompositeMode.DEST_ATOP: _porterDuff(lambda sa, da: 1 - da, lambda sa, da: sa),
+    CompositeMode.XOR: _porterDuff(lambda sa, da: 1 - da, lambda sa, da: 1 - sa),
+    CompositeMode.PLUS: _blendPlus,
+    CompositeMode.SCREEN: _separable(_screen),
+    CompositeMode.OVERLAY: _separable(lambda cs, cb: _hardLight(cb, cs)),
+    CompositeMode.DARKEN: _separable(np.minimum),
+    CompositeMode.LIGHTEN: _separable(np.maximum),
+    CompositeMode.COLOR_DODGE: _separable(_colorDodge),
+    CompositeMode.COLOR_BURN: _separable(_colorBurn),
+    CompositeMode.HARD_LIGHT: _separable(_hardLight),
+    CompositeMode.SOFT_LIGHT: _separable(_softLight),
+    CompositeMode.DIFFERENCE: _separable(lambda cs, cb: np.abs(cs - cb)),
+    CompositeMode.EXCLUSION: _separable(lambda cs, cb: cs + cb - 2 * cs * cb),
+    CompositeMode.MULTIPLY: _separable(lambda cs, cb: cs * cb),
+    CompositeMode.HSL_HUE: _separable(
+        lambda cs, cb: _setLum(_setSat(cs, _sat(cb)), _lum(cb))
+    ),
+    CompositeMode.HSL_SATURATION: _separable(
+        lambda cs, cb: _setLum(_setSat(cb, _sat(cs)), _lum(cb))
+    ),
+    CompositeMode.HSL_COLOR: _separable(lambda cs, cb: _setLum(cs, _lum(cb))),
+    CompositeMode.HSL_LUMINOSITY: _separable(lambda cs, cb: _setLum(cb, _lum(cs))),
+}
+
+
+class NumpyPixelSurface(Surface):
+    fileExtension = ".png"
+
+    def __init__(self):
+        self._image = None
+
+    @contextmanager
+    def canvas(self, boundingBox):
+        x, y, xMax, yMax = boundingBox
+        width = xMax - x
+        height = yMax - y
+        self._image = np.zeros((height, width, 4), dtype=np.float32)
+        transform = Transform(1, 0, 0, -1, -x, height + y)
+        yield NumpyCanvas(self._image, transform)
+
+    def getImageArray(self, premultiplied=False):
+        """Return the image as a uint8 array of shape (height, width, 4), in
+        RGBA order. The color channels are premultiplied with alpha if
+        'premultiplied' is True.
+        """
+        image = self._image
+        if premultiplied:
+            rgb = np.clip(image[..., :3], 0, 1)
+            alpha = np.clip(image[..., 3:], 0, 1)
+        else:
+            rgb, alpha = _unpremultiply(np.clip(image, 0, 1))
+        image = np.concatenate([rgb, alpha], axis=-1)
+        return np.rint(image * 255).astype(np.uint8)
+
+    def saveImage(self, path):
+        with open(os.fspath(path), "wb") as f:
+            f.write(self.encodeImage())
+
+    def encodeImage(self):
+        return encodePNG(self.getImageArray())
+
+
+def encodePNG(image):
+    """Encode a uint8 RGBA array of shape (height, width, 4) as PNG data."""
+    height, width, _ = image.shape
+    # Prefix each row with filter type 0 (None)
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    rows[:, 1:] = image.reshape((height, width * 4))
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"".join(
+        [
+            b"\x89PNG\r\n\x1a\n",
+            _pngChunk(b"IHDR", header),
+            _pngChunk(b"IDAT", zlib.compress(rows.tobytes())),
+            _pngChunk(b"IEND", b""),
+        ]
+    )
+
+
+def _pngChunk(chunkType, data):
+    crc = zlib.crc32(chunkType + data)
+    return struct.pack(">I", len(data)) + chunkType + data + struct.pack(">I", crc)
@@ -1,8 +1,9 @@
 from contextlib import contextmanager
-from fontTools.misc.arrayTools import calcBounds
 from fontTools.misc.transform import Identity
 from fontTools.pens.recordingPen import RecordingPen
 from fontTools.pens.transformPen import TransformPen
+import numpy as np
+from ..arrayPath import ArrayPath, pointsBounds, transformPoints
 from .base import Canvas
 
 
@@ -15,12 +16,15 @@ class PathCollectorCanvas(Canvas):
         self.currentTransform = Identity
 
     def _addPath(self, path):
+        if path is None:
+            # unbounded fill, there is no geometry to collect
+            return
         if self.currentTransform != Identity:
             path = transformPath(path, self.currentTransform)
         self.paths.append(path)
 
     def newPath(self):
-        return RecordingPen()
+        return ArrayPath()
 
     @contextmanager
     def savedState(self):
@@ -72,48 +76,34 @@ class PathCollectorCanvas(Canvas):
         self._addPath(path)
 
 
-class PointCollector:
-    def __init__(self):
-        self.points = []
-
-    def moveTo(self, pt):
-        self.points.append(pt)
-
-    def lineTo(self, pt):
-        self.points.append(pt)
-
-    def curveTo(self, *pts):
-        self.points.extend(pts)
-
-    qCurveTo = curveTo
-
-    def closePath(self):
-        pass
-
-    def endPath(self):
-        pass
-
-
 class BoundsCanvas(PathCollectorCanvas):
     def init(self):
-        self.points = []
+        self.pathBounds = []
         self.currentTransform = Identity
 
     @property
     def bounds(self):
-        return calcBounds(self.points)
+        if not self.pathBounds:
+            return (0, 0, 0, 0)
+        pathBounds = np.array(self.pathBounds)
+        xMin, yMin = pathBounds[:, :2].min(axis=0).tolist()
+        xMax, yMax = pathBounds[:, 2:].max(axis=0).tolist()
+        return xMin, yMin, xMax, yMax
 
     def _addPath(self, path):
+        if path is None:
+            return
         points = path.points
+        if not len(points):
+            return
         if self.currentTransform != Identity:
-            points = self.currentTransform.transformPoints(points)
-        self.points.extend(points)
-
-    def newPath(self):
-        return PointCollector()
+            points = transformPoints(points, self.currentTransform)
+        self.pathBounds.append(pointsBounds(points))
 
 
 def transformPath(path, transform):
+    if isinstance(path, ArrayPath):
+        return path.transformed(transform)
     transformedPath = RecordingPen()
     tpen = TransformPen(transformedPath, transform)
     path.replay(tpen)
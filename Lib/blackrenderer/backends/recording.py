@@ -0,0 +1,419 @@
+from contextlib import ExitStack, contextmanager
+import struct
+from fontTools.misc.transform import Transform
+from fontTools.ttLib.tables.otTables import CompositeMode, ExtendMode
+import numpy as np
+from ..arrayPath import ArrayPath
+from .base import Canvas
+
+
+# Op codes
+SAVE = 0
+RESTORE = 1
+BEGIN_COMPOSITE = 2
+END_COMPOSITE = 3
+TRANSFORM = 4
+CLIP = 5
+DRAW_SOLID = 6
+DRAW_LINEAR_GRADIENT = 7
+DRAW_RADIAL_GRADIENT = 8
+DRAW_SWEEP_GRADIENT = 9
+
+_drawMethodNames = {
+    DRAW_SOLID: "drawPathSolid",
+    DRAW_LINEAR_GRADIENT: "drawPathLinearGradient",
+    DRAW_RADIAL_GRADIENT: "drawPathRadialGradient",
+    DRAW_SWEEP_GRADIENT: "drawPathSweepGradient",
+}
+
+
+class RecordingCanvas(Canvas):
+    """A Canvas that records all drawing operations in a backend-neutral
+    form, so they can be replayed into one or more other canvases.
+
+    The operations are stored in the 'ops' list as (opCode, *arguments)
+    tuples. Paths are stored as ArrayPath objects in the 'paths' list, and
+    are referenced by index from the ops. Paths that are used multiple times
+    are only stored once.
+    """
+
+    def __init__(self):
+        self.ops = []
+        self.paths = []
+        self._pathIndices = {}
+
+    @staticmethod
+    def newPath():
+        return ArrayPath()
+
+    @contextmanager
+    def savedState(self):
+        self.ops.append((SAVE,))
+        try:
+            yield
+        finally:
+            self.ops.append((RESTORE,))
+
+    @contextmanager
+    def compositeMode(self, compositeMode):
+        self.ops.append((BEGIN_COMPOSITE, compositeMode))
+        try:
+            yield
+        finally:
+            self.ops.append((END_COMPOSITE,))
+
+    def transform(self, transform):
+        self.ops.append((TRANSFORM, tuple(transform)))
+
+    def clipPath(self, path):
+        self.ops.append((CLIP, self._addPath(path)))
+
+    def drawPathSolid(self, path, color):
+        self.ops.append((DRAW_SOLID, self._addPath(path), color))
+
+    def drawPathLinearGradient(
+        self, path, colorLine, pt1, pt2, extendMode, gradientTransform
+    ):
+        self.ops.append(
+            (
+                DRAW_LINEAR_GRADIENT,
+                self._addPath(path),
+                colorLine,
+                pt1,
+                pt2,
+                extendMode,
+                gradientTransform,
+            )
+        )
+
+    def drawPathRadialGradient(
+        self,
+        path,
+        colorLine,
+        startCenter,
+        startRadius,
+        endCenter,
+        endRadius,
+        extendMode,
+        gradientTransform,
+    ):
+        self.ops.append(
+            (
+                DRAW_RADIAL_GRADIENT,
+                self._addPath(path),
+                colorLine,
+                startCenter,
+                startRadius,
+                endCenter,
+                endRadius,
+                extendMode,
+                gradientTransform,
+            )
+        )
+
+    def drawPathSweepGradient(
+        self,
+        path,
+        colorLine,
+        center,
+        startAngle,
+        endAngle,
+        extendMode,
+        gradientTransform,
+    ):
+        self.ops.append(
+            (
+                DRAW_SWEEP_GRADIENT,
+                self._addPath(path),
+                colorLine,
+                center,
+                startAngle,
+                endAngle,
+                extendMode,
+                gradientTransform,
+            )
+        )
+
+    def _addPath(self, path):
+        if path is None:
+            # unbounded source
+            return None
+        pathIndex = self._pathIndices.get(id(path))
+        if pathIndex is None:
+            pathIndex = len(self.paths)
+            self.paths.append(path)
+            self._pathIndices[id(path)] = pathIndex
+        return pathIndex
+
+    def toBytes(self):
+        """Serialize the recording to a compact binary representation."""
+        return _encodeRecording(self)
+
+    @classmethod
+    def fromBytes(cls, data):
+        """Construct a RecordingCanvas from data returned by toBytes(). Raises
+        ValueError if the data is invalid.
+        """
+        try:
+            return _decodeRecording(cls(), data)
+        except (struct.error, KeyError, IndexError) as e:
+            raise ValueError(f"invalid recording data: {e!r}") from e
+
+    def replay(self, *canvases):
+        """Replay the recorded operations into each of 'canvases'."""
+        for canvas in canvases:
+            self._replay(canvas)
+
+    def _replay(self, canvas):
+        targetPaths = [None] * len(self.paths)
+
+        def getPath(pathIndex):
+            if pathIndex is None:
+                return None
+            path = targetPaths[pathIndex]
+            if path is None:
+                path = convertPath(self.paths[pathIndex], canvas)
+                targetPaths[pathIndex] = path
+            return path
+
+        contextStack = []
+        try:
+            for opCode, *args in self.ops:
+                if opCode in _drawMethodNames:
+                    drawMethod = getattr(canvas, _drawMethodNames[opCode])
+                    drawMethod(getPath(args[0]), *args[1:])
+                elif opCode == TRANSFORM:
+                    canvas.transform(args[0])
+                elif opCode == CLIP:
+                    canvas.clipPath(getPath(args[0]))
+                elif opCode == SAVE or opCode == BEGIN_COMPOSITE:
+                    if opCode == SAVE:
+                        context = canvas.savedState()
+                    else:
+                        context = canvas.compositeMode(args[0])
+                    context.__enter__()
+                    contextStack.append(context)
+                elif opCode == RESTORE or opCode == END_COMPOSITE:
+                    contextStack.pop().__exit__(None, None, None)
+                else:
+                    raise ValueError(f"unknown op code: {opCode}")
+        finally:
+            while contextStack:
+                contextStack.pop().__exit__(None, None, None)
+
+
+# Binary format: a header, followed by all paths, followed by all ops. All
+# numbers are little endian. Op arguments are encoded according to the
+# argument types listed in _opArgTypes.
+
+_magic = b"BRRC"
+_formatVersion = 1
+
+_opArgTypes = {
+    SAVE: (),
+    RESTORE: (),
+    BEGIN_COMPOSITE: ("compositeMode",),
+    END_COMPOSITE: (),
+    TRANSFORM: ("affine",),
+    CLIP: ("path",),
+    DRAW_SOLID: ("path", "color"),
+    DRAW_LINEAR_GRADIENT: (
+        "path",
+        "colorLine",
+        "point",
+        "point",
+        "extendMode",
+        "transform",
+    ),
+    DRAW_RADIAL_GRADIENT: (
+        "path",
+        "colorLine",
+        "point",
+        "float",
+        "point",
+        "float",
+        "extendMode",
+        "transform",
+    ),
+    DRAW_SWEEP_GRADIENT: (
+        "path",
+        "colorLine",
+        "point",
+        "float",
+        "float",
+        "extendMode",
+        "transform",
+    ),
+}
+
+_argFormats = {
+    "compositeMode": "<B",
+    "affine": "<6d",
+    "path": "<i",
+    "color": "<4d",
+    "point": "<2d",
+    "float": "<d",
+    "extendMode": "<B",
+    "transform": "<6d",
+}
+
+
+def _encodeRecording(recording):
+    data = [_magic, struct.pack("<HI", _formatVersion, len(recording.paths))]
+    for path in recording.paths:
+        verbs = path.verbs
+        points = path.points
+        data.append(struct.pack("<II", len(verbs), len(points)))
+        data.append(verbs.tobytes())
+        data.append(points.astype("<f8").tobytes())
+    data.append(struct.pack("<I", len(recording.ops)))
+    for opCode, *args in recording.ops:
+        data.append(struct.pack("<B", opCode))
+        for argType, arg in zip(_opArgTypes[opCode], args):
+            if argType == "colorLine":
+                data.append(struct.pack("<H", len(arg)))
+                for stop, color in arg:
+                    data.append(struct.pack("<5d", stop, *color))
+                continue
+            if argType == "path":
+                arg = (-1 if arg is None else arg,)
+            elif argType in {"compositeMode", "extendMode", "float"}:
+                arg = (arg,)
+            data.append(struct.pack(_argFormats[argType], *arg))
+    return b"".join(data)
+
+
+def _decodeRecording(recording, data):
+    if data[:4] != _magic:
+        raise ValueError("not a recording")
+    version, numPaths = struct.unpack_from("<HI", data, 4)
+    if version != _formatVersion:
+        raise ValueError(f"unsupported recording format version: {version}")
+    pos = 10
+    for i in range(numPaths):
+        numVerbs, numPoints = struct.unpack_from("<II", data, pos)
+        pos += 8
+        verbs = np.frombuffer(data, np.uint8, numVerbs, pos)
+        pos += numVerbs
+        points = np.frombuffer(data, "<f8", numPoints * 2, pos).reshape((-1, 2))
+        pos += numPoints * 16
+        recording.paths.append(ArrayPath(verbs, points))
+    (numOps,) = struct.unpack_from("<I", data, pos)
+    pos += 4
+    for i in range(numOps):
+        opCode = data[pos]
+        pos += 1
+        op = [opCode]
+        for argType in _opArgTypes[opCode]:
+            if argType == "colorLine":
+                (numStops,) = struct.unpack_from("<H", data, pos)
+                pos += 2
+                colorLine = []
+                for j in range(numStops):
+                    stop, *color = struct.unpack_from("<5d", data, pos)
+                    pos += 40
+                    colorLine.append((stop, tuple(color)))
+                op.append(colorLine)
+                continue
+            argFormat = _argFormats[argType]
+            arg = struct.unpack_from(argFormat, data, pos)
+            pos += struct.calcsize(argFormat)
+            if argType == "path":
+                arg = None if arg[0] == -1 else arg[0]
+                if arg is not None and arg >= numPaths:
+                    raise IndexError(arg)
+            elif argType == "compositeMode":
+                arg = CompositeMode(arg[0])
+            elif argType == "extendMode":
+                arg = ExtendMode(arg[0])
+            elif argType == "float":
+                arg = arg[0]
+            elif argType == "transform":
+                arg = Transform(*arg)
+            op.append(arg)
+        recording.ops.append(tuple(op))
+    if pos != len(data):
+        raise ValueError("trailing data")
+    return recording
+
+
+class FanOutCanvas(Canvas):
+    """A Canvas that forwards all drawing operations to multiple canvases,
+    so a single font traversal can render to multiple backends.
+    """
+
+    def __init__(self, *canvases):
+        self.canvases = canvases
+
+    @staticmethod
+    def newPath():
+        return _FanOutPath()
+
+    @contextmanager
+    def savedState(self):
+        with ExitStack() as stack:
+            for canvas in self.canvases:
+                stack.enter_context(canvas.savedState())
+            yield
+
+    @contextmanager
+    def compositeMode(self, compositeMode):
+        with ExitStack() as stack:
+            for canvas in self.canvases:
+                stack.enter_context(canvas.compositeMode(compositeMode))
+            yield
+
+    def transform(self, transform):
+        for canvas in self.canvases:
+            canvas.transform(transform)
+
+    def clipPath(self, path):
+        for i, canvas in enumerate(self.canvases):
+            canvas.clipPath(self._getPath(path, i))
+
+    def drawPathSolid(self, path, color):
+        for i, canvas in enumerate(self.canvases):
+            canvas.drawPathSolid(self._getPath(path, i), color)
+
+    def drawPathLinearGradient(self, path, *args):
+        for i, canvas in enumerate(self.canvases):
+            canvas.drawPathLinearGradient(self._getPath(path, i), *args)
+
+    def drawPathRadialGradient(self, path, *args):
+        for i, canvas in enumerate(self.canvases):
+            canvas.drawPathRadialGradient(self._getPath(path, i), *args)
+
+    def drawPathSweepGradient(self, path, *args):
+        for i, canvas in enumerate(self.canvases):
+            canvas.drawPathSweepGradient(self._getPath(path, i), *args)
+
+    def _getPath(self, path, canvasIndex):
+        if path is None:
+            return None
+        if path.targetPaths is None:
+            path.targetPaths = [None] * len(self.canvases)
+        targetPath = path.targetPaths[canvasIndex]
+        if targetPath is None:
+            targetPath = convertPath(path, self.canvases[canvasIndex])
+            path.targetPaths[canvasIndex] = targetPath
+        return targetPath
+
+
+class _FanOutPath(ArrayPath):
+    def __init__(self):
+        super().__init__()
+        self.targetPaths = None
+
+
+def convertPath(path, canvas):
+    """Convert an ArrayPath to a path object for 'canvas'."""
+    targetPath = canvas.newPath()
+    if type(targetPath) is ArrayPath:
+        # ArrayPath objects are not modified after drawing, we can share them
+        return path
+    appendOutline = getattr(targetPath, "appendOutline", None)
+    if appendOutline is not None:
+        appendOutline(path.verbs.tolist(), path.points.ravel().tolist())
+    else:
+        path.replay(targetPath)
+    return targetPath
@@ -1,8 +1,10 @@
 from contextlib import contextmanager
 import os
+import struct
 from fontTools.pens.basePen import BasePen
 from fontTools.ttLib.tables.otTables import CompositeMode, ExtendMode
 import skia
+from ..arrayPath import replayOutline
 from .base import Canvas, Surface
 
 
@@ -38,6 +40,10 @@ _compositeModeMap = {
 }
 
 
+# SkPath::kCurrent_Version
+_pathSerializationVersion = 5
+
+
 _extendModeMap = {
     ExtendMode.PAD: skia.TileMode.kClamp,
     ExtendMode.REPEAT: skia.TileMode.kRepeat,
@@ -65,6 +71,32 @@ class SkiaPath(BasePen):
     def _closePath(self):
         self.path.close()
 
+    def appendOutline(self, verbs, coords):
+        # Our verb values are Skia's, so the outline can be passed to Skia in
+        # one call, in SkPath's serialization format: a header with the
+        # version and fill type, and the point, conic weight and verb counts,
+        # then the points as floats, and the verbs as bytes, padded to 4
+        numVerbs = len(verbs)
+        data = (
+            struct.pack(
+                f"<4i{len(coords)}f",
+                _pathSerializationVersion,
+                len(coords) // 2,
+                0,
+                numVerbs,
+                *coords,
+            )
+            + bytes(verbs)
+            + bytes(-numVerbs % 4)
+        )
+        path = self.path if self.path.isEmpty() else skia.Path()
+        if not path.readFromMemory(data) or path.countVerbs() != numVerbs:
+            # Skia rejected the data, for example because of END verbs
+            path.reset()
+            replayOutline(verbs, coords, self)
+        elif path is not self.path:
+            self.path.addPath(path)
+
 
 class SkiaCanvas(Canvas):
     def __init__(self, canvas):
@@ -223,9 +255,25 @@ class SkiaPixelSurface(_SkiaBaseSurface):
     def _finalizeCanvas(self, surface):
         self._image = surface.makeImageSnapshot()
 
+    def getImageArray(self, premultiplied=False):
+        """Return the image as a uint8 array of shape (height, width, 4), in
+        RGBA order. The color channels are premultiplied with alpha if
+        'premultiplied' is True.
+        """
+        if premultiplied:
+            alphaType = skia.kPremul_AlphaType
+        else:
+            alphaType = skia.kUnpremul_AlphaType
+        return self._image.toarray(
+            colorType=skia.kRGBA_8888_ColorType, alphaType=alphaType
+        )
+
     def saveImage(self, path, format=skia.kPNG):
         self._image.save(os.fspath(path), format)
 
+    def encodeImage(self):
+        return bytes(self._image.encodeToData())
+
 
 class SkiaPDFSurface(_SkiaBaseSurface):
     fileExtension = ".pdf"
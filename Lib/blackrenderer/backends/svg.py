@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+import io
 import logging
 from typing import NamedTuple
 from fontTools.misc.transform import Transform
@@ -139,7 +140,7 @@ class SVGCanvas(Canvas):
             if len(self.clipStack) > 1:
                 # FIXME: intersect clip paths with pathops
                 self._warn(
-                    "nested_clip"
+                    "nested_clip",
                     "SVG canvas does not support more than two nested clip paths"
                 )
             if clipTransform is not None:
@@ -260,6 +261,11 @@ class SVGSurface(Surface):
         with open(path, "wb") as f:
             writeSVGElements(self._svgElements, self._viewBox, f)
 
+    def encodeImage(self):
+        stream = io.BytesIO()
+        writeSVGElements(self._svgElements, self._viewBox, stream)
+        return stream.getvalue()
+
 
 def writeSVGElements(elements, viewBox, stream):
     clipPaths = {}
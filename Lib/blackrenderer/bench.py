@@ -0,0 +1,352 @@
+"""Store benchmark results as baselines, and compare new results against them.
+
+Benchmark results are JSON files as written by benchmarks/benchmarkRender.py.
+Typical usage:
+
+    $ python benchmarks/benchmarkRender.py --output before.json
+    $ python -m blackrenderer.bench store baseline.json before.json
+    ...upgrade or change things...
+    $ python benchmarks/benchmarkRender.py --output after.json
+    $ python -m blackrenderer.bench compare baseline.json after.json
+
+Multiple result files can be passed to both commands; their samples are
+combined, which reduces noise. Baselines are stored per environment (Python
+implementation and version, platform and machine), and 'compare' uses the
+baseline for the environment of the new results. Package versions are not
+part of the environment, so that a baseline can be compared against after an
+upgrade; 'compare' warns about the packages whose versions differ.
+"""
+
+import argparse
+from collections import defaultdict
+import hashlib
+import json
+import math
+import os
+import sys
+from typing import NamedTuple
+
+
+baselineFormatVersion = 1
+
+# The environment fields that identify a baseline
+environmentKeyFields = ["implementation", "python", "platform", "machine"]
+
+REGRESSION = "regression"
+IMPROVEMENT = "improvement"
+UNCHANGED = "unchanged"
+
+
+class Comparison(NamedTuple):
+    name: str
+    stage: str
+    backend: str
+    paintFormats: list
+    baselineMedian: float
+    median: float
+    ratio: float  # median / baselineMedian
+    status: str
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m blackrenderer.bench", description=__doc__.split("\n")[0]
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    storeParser = subparsers.add_parser(
+        "store", help="Store benchmark results as the baseline for their environment"
+    )
+    storeParser.add_argument("baseline", help="The baseline JSON file to update")
+    storeParser.add_argument("results", nargs="+", help="Benchmark result files")
+
+    compareParser = subparsers.add_parser(
+        "compare",
+        help="Compare benchmark results against a baseline. Exits with status 1 "
+        "if there are regressions.",
+    )
+    compareParser.add_argument("baseline", help="The baseline JSON file")
+    compareParser.add_argument("results", nargs="+", help="Benchmark result files")
+    compareParser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The relative slowdown above which a benchmark counts as a "
+        "regression (default: 0.1, meaning 10%%)",
+    )
+    compareParser.add_argument(
+        "--any-environment",
+        action="store_true",
+        help="Compare against the most recently stored baseline if there is "
+        "none for the current environment",
+    )
+    compareParser.add_argument(
+        "--verbose",
+        "-v",
+        action="store_true",
+        help="List all benchmarks, not only the changed ones",
+    )
+    args = parser.parse_args(args)
+
+    environment, benchmarks = loadResults(args.results)
+    if args.command == "store":
+        environmentKey = storeBaseline(args.baseline, environment, benchmarks)
+        print(f"stored {len(benchmarks)} benchmarks for environment {environmentKey}")
+        return 0
+
+    baseline = loadBaseline(args.baseline)
+    baselineEntry = baseline["environments"].get(getEnvironmentKey(environment))
+    if baselineEntry is None:
+        if not args.any_environment or not baseline["environments"]:
+            parser.exit(
+                2,
+                "no baseline found for this environment; "
+                "use --any-environment to compare anyway\n",
+            )
+        baselineEntry = list(baseline["environments"].values())[-1]
+        print("warning: comparing against a baseline from a different environment")
+        _printEnvironmentDifferences(baselineEntry["environment"], environment)
+    elif baselineEntry["environment"].get("versions") != environment.get("versions"):
+        print("warning: package versions differ from the baseline")
+        _printEnvironmentDifferences(baselineEntry["environment"], environment)
+
+    comparisons = compareResults(
+        baselineEntry["benchmarks"], benchmarks, args.threshold
+    )
+    printReport(comparisons, verbose=args.verbose)
+    regressions = [c for c in comparisons if c.status == REGRESSION]
+    return 1 if regressions else 0
+
+
+def loadResults(paths):
+    """Load one or more benchmark result files, and return (environment,
+    benchmarks), where 'benchmarks' is a dict mapping benchmark names to
+    benchmark records. The samples of benchmarks that occur in multiple files
+    are combined.
+    """
+    environment = None
+    benchmarks = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            results = json.load(f)
+        if environment is None:
+            environment = results["environment"]
+        elif getEnvironmentKey(results["environment"]) != getEnvironmentKey(
+            environment
+        ):
+            raise ValueError(f"results from different environments: {path}")
+        for benchmark in results["benchmarks"]:
+            existing = benchmarks.get(benchmark["name"])
+            if existing is None:
+                benchmarks[benchmark["name"]] = dict(benchmark)
+            else:
+                existing["samples"] = existing["samples"] + benchmark["samples"]
+    return environment, benchmarks
+
+
+def getEnvironmentKey(environment):
+    """Return a short string identifying an environment, from the fields in
+    'environmentKeyFields'.
+    """
+    keyFields = {name: environment.get(name) for name in environmentKeyFields}
+    environmentJSON = json.dumps(keyFields, sort_keys=True)
+    digest = hashlib.sha256(environmentJSON.encode("utf-8")).hexdigest()[:12]
+    return "-".join(
+        [
+            environment.get("implementation", "Python"),
+            environment.get("python", "?"),
+            environment.get("machine", "?"),
+            digest,
+        ]
+    )
+
+
+def loadBaseline(path):
+    if not os.path.exists(path):
+        return dict(formatVersion=baselineFormatVersion, environments={})
+    with open(path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("formatVersion") != baselineFormatVersion:
+        raise ValueError(f"unsupported baseline format: {path}")
+    # Older baselines were keyed on package versions as well; later entries
+    # replace earlier ones with the same key
+    baseline["environments"] = {
+        getEnvironmentKey(entry["environment"]): entry
+        for entry in baseline["environments"].values()
+    }
+    return baseline
+
+
+def storeBaseline(path, environment, benchmarks):
+    """Store benchmark results as the baseline for 'environment', replacing
+    a previously stored baseline for the same environment. Return the
+    environment key.
+    """
+    baseline = loadBaseline(path)
+    environmentKey = getEnvironmentKey(environment)
+    # Re-insert, so the most recently stored baseline is last
+    baseline["environments"].pop(environmentKey, None)
+    baseline["environments"][environmentKey] = dict(
+        environment=environment, benchmarks=benchmarks
+    )
+    tmpPath = f"{path}.tmp"
+    with open(tmpPath, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, indent=1, sort_keys=True)
+        f.write("\n")
+    os.replace(tmpPath, path)
+    return environmentKey
+
+
+def compareResults(baselineBenchmarks, benchmarks, threshold):
+    """Compare benchmarks against baseline benchmarks, and return a list of
+    Comparison tuples, for all benchmarks that occur in both.
+
+    A benchmark counts as a regression if its median is more than
+    'threshold' (relative) slower than the baseline median, and the
+    interquartile ranges of both sample sets don't overlap. Improvements are
+    determined the same way.
+    """
+    comparisons = []
+    for name, benchmark in benchmarks.items():
+        baselineBenchmark = baselineBenchmarks.get(name)
+        if baselineBenchmark is None:
+            continue
+        baseQ1, baseMedian, baseQ3 = calcQuartiles(baselineBenchmark["samples"])
+        q1, median, q3 = calcQuartiles(benchmark["samples"])
+        ratio = median / baseMedian if baseMedian else math.inf
+        if ratio > 1 + threshold and q1 > baseQ3:
+            status = REGRESSION
+        elif ratio < 1 / (1 + threshold) and q3 < baseQ1:
+            status = IMPROVEMENT
+        else:
+            status = UNCHANGED
+        comparisons.append(
+            Comparison(
+                name,
+                benchmark.get("stage"),
+                benchmark.get("backend"),
+                benchmark.get("paintFormats") or [],
+                baseMedian,
+                median,
+                ratio,
+                status,
+            )
+        )
+    return comparisons
+
+
+def calcQuartiles(samples):
+    """Return the first quartile, median and third quartile of 'samples'."""
+    samples = sorted(samples)
+    return (
+        _percentile(samples, 0.25),
+        _percentile(samples, 0.5),
+        _percentile(samples, 0.75),
+    )
+
+
+def _percentile(sortedValues, fraction):
+    # Linear interpolation between the closest ranks
+    position = (len(sortedValues) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    weight = position - lower
+    return sortedValues[lower] * (1 - weight) + sortedValues[upper] * weight
+
+
+def summarizeByPaintFormat(comparisons):
+    """Return a dict mapping Paint format names to (geometricMeanRatio,
+    count) tuples, summarizing the changes for all benchmarks of glyphs that
+    use that Paint format.
+    """
+    logRatios = defaultdict(list)
+    for comparison in comparisons:
+        if not comparison.paintFormats or not math.isfinite(comparison.ratio):
+            continue
+        for paintFormat in comparison.paintFormats:
+            logRatios[paintFormat].append(math.log(comparison.ratio))
+    return {
+        paintFormat: (math.exp(sum(values) / len(values)), len(values))
+        for paintFormat, values in sorted(logRatios.items())
+    }
+
+
+def summarizeByStage(comparisons):
+    """Like summarizeByPaintFormat(), but per (stage, backend)."""
+    logRatios = defaultdict(list)
+    for comparison in comparisons:
+        if math.isfinite(comparison.ratio):
+            key = comparison.stage, comparison.backend
+            logRatios[key].append(math.log(comparison.ratio))
+    return {
+        key: (math.exp(sum(values) / len(values)), len(values))
+        for key, values in sorted(logRatios.items(), key=lambda item: str(item[0]))
+    }
+
+
+def printReport(comparisons, verbose=False, file=None):
+    if file is None:
+        file = sys.stdout
+    for comparison in sorted(comparisons, key=lambda c: c.ratio, reverse=True):
+        if comparison.status == UNCHANGED and not verbose:
+            continue
+        print(
+            f"{comparison.status:>12} {_formatDelta(comparison.ratio)} "
+            f"{_formatTime(comparison.baselineMedian)} -> "
+            f"{_formatTime(comparison.median)}  {comparison.name}",
+            file=file,
+        )
+
+    print("\nPer stage and backend:", file=file)
+    for (stage, backend), (ratio, count) in summarizeByStage(comparisons).items():
+        label = stage if backend is None else f"{stage}/{backend}"
+        print(f"  {_formatDelta(ratio)}  {label} ({count})", file=file)
+
+    print("\nPer Paint format:", file=file)
+    for paintFormat, (ratio, count) in summarizeByPaintFormat(comparisons).items():
+        print(f"  {_formatDelta(ratio)}  {paintFormat} ({count})", file=file)
+
+    statusCounts = defaultdict(int)
+    for comparison in comparisons:
+        statusCounts[comparison.status] += 1
+    print(
+        f"\n{len(comparisons)} benchmarks compared: "
+        f"{statusCounts[REGRESSION]} regressions, "
+        f"{statusCounts[IMPROVEMENT]} improvements",
+        file=file,
+    )
+
+
+def _printEnvironmentDifferences(baselineEnvironment, environment):
+    baselineEnvironment = _flattenEnvironment(baselineEnvironment)
+    environment = _flattenEnvironment(environment)
+    keys = sorted(set(baselineEnvironment) | set(environment))
+    for key in keys:
+        if baselineEnvironment.get(key) != environment.get(key):
+            print(f"  {key}: {baselineEnvironment.get(key)} -> {environment.get(key)}")
+
+
+def _flattenEnvironment(environment):
+    # List package versions as "versions.<package>" fields
+    flattened = {key: value for key, value in environment.items() if key != "versions"}
+    for name, version in environment.get("versions", {}).items():
+        flattened[f"versions.{name}"] = version
+    return flattened
+
+
+def _formatDelta(ratio):
+    if not math.isfinite(ratio):
+        return "     n/a"
+    return f"{(ratio - 1) * 100:+7.1f}%"
+
+
+def _formatTime(seconds):
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    elif seconds >= 0.001:
+        return f"{seconds * 1000:.3f} ms"
+    return f"{seconds * 1_000_000:.1f} µs"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,508 @@
+"""A lightweight reader for the COLR and CPAL tables, that reads straight from
+the font data with the struct module, instead of decompiling the tables with
+fontTools.
+
+Paint tables are decoded lazily, when they are reached, and only weakly
+cached, so memory use doesn't grow with the part of the paint graph that has
+been traversed. The decoded tables have the same attributes as their fontTools
+counterparts, as far as BlackRendererFont and its helpers need them.
+
+Use it with BlackRendererFont(path, colrReader="lazy").
+"""
+
+import re
+import struct
+import weakref
+from collections.abc import Mapping, Sequence
+from typing import NamedTuple
+from fontTools.ttLib.tables import otTables
+from fontTools.ttLib.tables.otBase import OTTableReader, getVariableAttrs
+from fontTools.ttLib.tables.otConverters import Angle, F2Dot14, Fixed
+from fontTools.ttLib.tables.otData import otData
+from fontTools.ttLib.tables.otTables import CompositeMode, ExtendMode
+
+try:
+    from fontTools.ttLib.tables.otConverters import BiasedAngle
+except ImportError:
+    # fontTools < 4.37 has no biased angles in otData
+    BiasedAngle = None
+
+
+# Field kinds
+VALUE = 0
+CONVERTED = 1
+ENUM = 2
+GLYPH = 3
+OFFSET = 4
+ARRAY = 5
+
+# {typeName: (structFormat, kind, converter)}
+_fieldTypes = {
+    "uint8": ("B", VALUE, None),
+    "uint16": ("H", VALUE, None),
+    "uint32": ("L", VALUE, None),
+    "int16": ("h", VALUE, None),
+    "VarIndex": ("L", VALUE, None),
+    "F2Dot14": ("h", CONVERTED, F2Dot14),
+    "Fixed": ("l", CONVERTED, Fixed),
+    "Angle": ("h", CONVERTED, Angle),
+    "ExtendMode": ("B", ENUM, ExtendMode),
+    "CompositeMode": ("B", ENUM, CompositeMode),
+    "GlyphID": ("H", GLYPH, None),
+    # Offset24 is read as a uint8 and a uint16
+    "Offset24": ("BH", OFFSET, None),
+}
+if BiasedAngle is not None:
+    _fieldTypes["BiasedAngle"] = ("h", CONVERTED, BiasedAngle)
+
+_offsetToPattern = re.compile(r"LOffset24To\((\w+)\)$")
+
+
+class _TableLayout:
+    def __init__(self, tableName, fields, otTableClass, tableFormat=None):
+        self.tableName = tableName
+        self.fields = []  # (kind, arg) tuples
+        self.fieldIndices = {}
+        self.converters = {}
+        structFormat = ">"
+        for typeName, name, count, *_ in fields:
+            if name == "PaintFormat":
+                name = "Format"
+            self.fieldIndices[name] = len(self.fields)
+            if count is not None:
+                # An array of records, following the count field
+                self.fields.append((ARRAY, (typeName, count)))
+                continue
+            m = _offsetToPattern.match(typeName)
+            if m is not None:
+                typeName, childType = "Offset24", m.group(1)
+            else:
+                childType = name
+            fieldFormat, kind, converter = _fieldTypes[typeName]
+            structFormat += fieldFormat
+            if kind == OFFSET:
+                self.fields.append((OFFSET, childType))
+            else:
+                self.fields.append((kind, converter))
+                if kind == CONVERTED:
+                    self.converters[name] = converter
+        self.struct = struct.Struct(structFormat)
+        self.size = self.struct.size
+        self.varAttrs = tuple(getVariableAttrs(otTableClass, tableFormat))
+
+    def unpack(self, reader, offset):
+        rawValues = iter(self.struct.unpack_from(reader.data, offset))
+        values = []
+        for kind, arg in self.fields:
+            if kind == ARRAY:
+                # (offset, count), the count was the previous value
+                values.append((offset + self.size, values[-1]))
+                continue
+            value = next(rawValues)
+            if kind == CONVERTED:
+                value = arg.fromInt(value)
+            elif kind == ENUM:
+                value = arg(value)
+            elif kind == GLYPH:
+                value = reader.glyphOrder[value]
+            elif kind == OFFSET:
+                value = (value << 16) | next(rawValues)
+                # Offsets are relative to the start of the table
+                value = offset + value if value else None
+            values.append(value)
+        return values
+
+
+def _buildLayouts():
+    otDataDict = dict(otData)
+    layouts = {}
+    for tableName in [
+        "ColorLine",
+        "VarColorLine",
+        "ColorStop",
+        "VarColorStop",
+        "Affine2x3",
+        "VarAffine2x3",
+    ]:
+        otTableClass = getattr(otTables, tableName)
+        layouts[tableName] = _TableLayout(
+            tableName, otDataDict[tableName], otTableClass
+        )
+    formattedLayouts = {}
+    for tableName, maxFormat in [("Paint", 32), ("ClipBox", 2)]:
+        otTableClass = getattr(otTables, tableName)
+        formattedLayouts[tableName] = {
+            tableFormat: _TableLayout(
+                tableName,
+                otDataDict[f"{tableName}Format{tableFormat}"],
+                otTableClass,
+                tableFormat,
+            )
+            for tableFormat in range(1, maxFormat + 1)
+        }
+    return layouts, formattedLayouts
+
+
+_layouts, _formattedLayouts = _buildLayouts()
+
+
+class LazyTable:
+    """A COLR subtable, decoded from the font data. Offsets to other tables
+    are followed when the attribute is accessed.
+    """
+
+    __slots__ = ("_reader", "_layout", "_values", "__weakref__")
+
+    def __init__(self, reader, layout, offset):
+        self._reader = reader
+        self._layout = layout
+        self._values = layout.unpack(reader, offset)
+
+    def __getattr__(self, attrName):
+        index = self._layout.fieldIndices.get(attrName)
+        if index is None:
+            raise AttributeError(
+                f"'{self._layout.tableName}' table has no attribute '{attrName}'"
+            )
+        kind, arg = self._layout.fields[index]
+        value = self._values[index]
+        if kind == OFFSET:
+            if value is not None:
+                value = self._reader.getTable(arg, value)
+        elif kind == ARRAY:
+            recordType, _ = arg
+            layout = _layouts[recordType]
+            offset, count = value
+            value = [
+                LazyTable(self._reader, layout, offset + i * layout.size)
+                for i in range(count)
+            ]
+        return value
+
+    def __repr__(self):
+        return f"<{self._layout.tableName} {self._values}>"
+
+    @property
+    def tableName(self):
+        return self._layout.tableName
+
+    def getVariableAttrs(self):
+        return self._layout.varAttrs
+
+    def getConverterByName(self, attrName):
+        # For VarTableWrapper: deltas for converted fields need conversion, too
+        return self._layout.converters.get(attrName)
+
+
+class BaseGlyphPaintRecord(NamedTuple):
+    BaseGlyph: str
+    Paint: LazyTable
+
+
+class LayerRecord(NamedTuple):
+    name: str
+    colorID: int
+
+
+class COLRReader:
+    """Reads a COLR table from 'data', a bytes-like object. 'data' is not
+    copied: pass a memoryview into the font data to avoid that altogether.
+    """
+
+    def __init__(self, data, glyphOrder, getGlyphID):
+        self.data = data
+        self.glyphOrder = glyphOrder
+        self._getGlyphID = getGlyphID
+        self._tables = weakref.WeakValueDictionary()
+
+        (
+            self.version,
+            numBaseGlyphRecords,
+            baseGlyphRecordsOffset,
+            layerRecordsOffset,
+            numLayerRecords,
+        ) = struct.unpack_from(">HHLLH", data)
+        self.colorLayersV0 = _ColorLayersV0(
+            self, baseGlyphRecordsOffset, numBaseGlyphRecords, layerRecordsOffset
+        )
+        self.baseGlyphPaintRecords = {}
+        self.layerList = None
+        self.clipBoxes = None
+        self._varIndexMapOffset = self._varStoreOffset = 0
+        if self.version >= 1:
+            (
+                baseGlyphListOffset,
+                layerListOffset,
+                clipListOffset,
+                self._varIndexMapOffset,
+                self._varStoreOffset,
+            ) = struct.unpack_from(">LLLLL", data, 14)
+            if baseGlyphListOffset:
+                self.baseGlyphPaintRecords = _BaseGlyphPaintRecords(
+                    self, baseGlyphListOffset
+                )
+            if layerListOffset:
+                self.layerList = _LayerList(self, layerListOffset)
+            if clipListOffset:
+                self.clipBoxes = _ClipBoxes(self, clipListOffset)
+
+    def getGlyphID(self, glyphName):
+        try:
+            return self._getGlyphID(glyphName)
+        except KeyError:
+            return None
+
+    def getTable(self, tableType, offset):
+        table = self._tables.get(offset)
+        if table is None:
+            if tableType in _formattedLayouts:
+                tableFormat = self.data[offset]
+                layout = _formattedLayouts[tableType].get(tableFormat)
+                if layout is None:
+                    return _UnknownFormatTable(tableFormat)
+            else:
+                layout = _layouts[tableType]
+            table = LazyTable(self, layout, offset)
+            self._tables[offset] = table
+        return table
+
+    def getVarStore(self, ttFont):
+        # The VarStore is needed as a whole for instancing, so let fontTools
+        # decompile it
+        if not self._varStoreOffset:
+            return None
+        varStore = otTables.VarStore()
+        varStore.decompile(self._getOTTableReader(self._varStoreOffset), ttFont)
+        return varStore
+
+    def getVarIndexMap(self, ttFont):
+        if not self._varIndexMapOffset:
+            return None
+        varIndexMap = otTables.DeltaSetIndexMap()
+        varIndexMap.decompile(self._getOTTableReader(self._varIndexMapOffset), ttFont)
+        return varIndexMap.mapping
+
+    def _getOTTableReader(self, offset):
+        # fontTools reads arrays with array.array(), which needs bytes, not a
+        # memoryview
+        return OTTableReader(bytes(self.data[offset:]))
+
+
+class _UnknownFormatTable(NamedTuple):
+    Format: int
+
+
+def _bisectGlyphRecords(data, offset, count, recordSize, glyphID):
+    # Return the index of the record for 'glyphID' in an array of records
+    # sorted by glyph ID, or None
+    lo, hi = 0, count
+    while lo < hi:
+        mid = (lo + hi) // 2
+        (midGlyphID,) = struct.unpack_from(">H", data, offset + mid * recordSize)
+        if midGlyphID < glyphID:
+            lo = mid + 1
+        elif midGlyphID > glyphID:
+            hi = mid
+        else:
+            return mid
+    return None
+
+
+class _BaseGlyphPaintRecords(Mapping):
+    # Maps base glyph names to BaseGlyphPaintRecord tuples
+    recordSize = 6
+
+    def __init__(self, reader, offset):
+        self._reader = reader
+        self._offset = offset
+        (self._count,) = struct.unpack_from(">L", reader.data, offset)
+
+    def _findRecord(self, glyphName):
+        glyphID = self._reader.getGlyphID(glyphName)
+        if glyphID is None:
+            return None
+        index = _bisectGlyphRecords(
+            self._reader.data, self._offset + 4, self._count, self.recordSize, glyphID
+        )
+        if index is None:
+            return None
+        return self._offset + 4 + index * self.recordSize
+
+    def __getitem__(self, glyphName):
+        recordOffset = self._findRecord(glyphName)
+        if recordOffset is None:
+            raise KeyError(glyphName)
+        (paintOffset,) = struct.unpack_from(">L", self._reader.data, recordOffset + 2)
+        paint = self._reader.getTable("Paint", self._offset + paintOffset)
+        return BaseGlyphPaintRecord(glyphName, paint)
+
+    def __contains__(self, glyphName):
+        return self._findRecord(glyphName) is not None
+
+    def __iter__(self):
+        data = self._reader.data
+        glyphOrder = self._reader.glyphOrder
+        for i in range(self._count):
+            offset = self._offset + 4 + i * self.recordSize
+            (glyphID,) = struct.unpack_from(">H", data, offset)
+            yield glyphOrder[glyphID]
+
+    def __len__(self):
+        return self._count
+
+
+class _LayerList:
+    def __init__(self, reader, offset):
+        self.Paint = _LayerPaints(reader, offset)
+
+
+class _LayerPaints(Sequence):
+    def __init__(self, reader, offset):
+        self._reader = reader
+        self._offset = offset
+        (self._count,) = struct.unpack_from(">L", reader.data, offset)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("layer index out of range")
+        offset = self._offset + 4 + index * 4
+        (paintOffset,) = struct.unpack_from(">L", self._reader.data, offset)
+        return self._reader.getTable("Paint", self._offset + paintOffset)
+
+    def __len__(self):
+        return self._count
+
+
+class _ClipBoxes(Mapping):
+    # Maps glyph names to ClipBox tables
+    recordSize = 7
+
+    def __init__(self, reader, offset):
+        self._reader = reader
+        self._offset = offset
+        (self._count,) = struct.unpack_from(">L", reader.data, offset + 1)
+
+    def _iterRecords(self):
+        data = self._reader.data
+        for i in range(self._count):
+            offset = self._offset + 5 + i * self.recordSize
+            yield struct.unpack_from(">HHBH", data, offset)
+
+    def _findClipBoxOffset(self, glyphName):
+        glyphID = self._reader.getGlyphID(glyphName)
+        if glyphID is None:
+            return None
+        data = self._reader.data
+        # The clip records are sorted and their glyph ranges don't overlap
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = self._offset + 5 + mid * self.recordSize
+            start, end, offsetHi, offsetLo = struct.unpack_from(">HHBH", data, offset)
+            if end < glyphID:
+                lo = mid + 1
+            elif start > glyphID:
+                hi = mid
+            else:
+                return self._offset + ((offsetHi << 16) | offsetLo)
+        return None
+
+    def __getitem__(self, glyphName):
+        clipBoxOffset = self._findClipBoxOffset(glyphName)
+        if clipBoxOffset is None:
+            raise KeyError(glyphName)
+        return self._reader.getTable("ClipBox", clipBoxOffset)
+
+    def __contains__(self, glyphName):
+        return self._findClipBoxOffset(glyphName) is not None
+
+    def __iter__(self):
+        glyphOrder = self._reader.glyphOrder
+        for start, end, _, _ in self._iterRecords():
+            for glyphID in range(start, end + 1):
+                yield glyphOrder[glyphID]
+
+    def __len__(self):
+        return sum(end - start + 1 for start, end, _, _ in self._iterRecords())
+
+
+class _ColorLayersV0(Mapping):
+    # Maps base glyph names to lists of LayerRecord tuples
+    recordSize = 6
+
+    def __init__(self, reader, offset, count, layerRecordsOffset):
+        self._reader = reader
+        self._offset = offset
+        self._count = count if offset else 0
+        self._layerRecordsOffset = layerRecordsOffset
+
+    def _findRecord(self, glyphName):
+        if not self._count:
+            return None
+        glyphID = self._reader.getGlyphID(glyphName)
+        if glyphID is None:
+            return None
+        index = _bisectGlyphRecords(
+            self._reader.data, self._offset, self._count, self.recordSize, glyphID
+        )
+        if index is None:
+            return None
+        return self._offset + index * self.recordSize
+
+    def __getitem__(self, glyphName):
+        recordOffset = self._findRecord(glyphName)
+        if recordOffset is None:
+            raise KeyError(glyphName)
+        data = self._reader.data
+        glyphOrder = self._reader.glyphOrder
+        _, firstLayerIndex, numLayers = struct.unpack_from(">HHH", data, recordOffset)
+        layers = []
+        for i in range(firstLayerIndex, firstLayerIndex + numLayers):
+            offset = self._layerRecordsOffset + i * 4
+            glyphID, paletteIndex = struct.unpack_from(">HH", data, offset)
+            layers.append(LayerRecord(glyphOrder[glyphID], paletteIndex))
+        return layers
+
+    def __contains__(self, glyphName):
+        return self._findRecord(glyphName) is not None
+
+    def __iter__(self):
+        data = self._reader.data
+        glyphOrder = self._reader.glyphOrder
+        for i in range(self._count):
+            offset = self._offset + i * self.recordSize
+            (glyphID,) = struct.unpack_from(">H", data, offset)
+            yield glyphOrder[glyphID]
+
+    def __len__(self):
+        return self._count
+
+
+def readCPALPalettes(data):
+    """Read the palettes of a CPAL table from 'data', a bytes-like object.
+    Return a list of palettes, each a list of (r, g, b, a) tuples with values
+    between 0 and 1.
+    """
+    (
+        _,
+        numPaletteEntries,
+        numPalettes,
+        _,
+        colorRecordsOffset,
+    ) = struct.unpack_from(">HHHHL", data)
+    colorRecordIndices = struct.unpack_from(f">{numPalettes}H", data, 12)
+    palettes = []
+    for colorRecordIndex in colorRecordIndices:
+        offset = colorRecordsOffset + colorRecordIndex * 4
+        colors = struct.unpack_from(f">{numPaletteEntries * 4}B", data, offset)
+        palettes.append(
+            [
+                (red / 255, green / 255, blue / 255, alpha / 255)
+                for blue, green, red, alpha in zip(*[iter(colors)] * 4)
+            ]
+        )
+    return palettes
@@ -0,0 +1,120 @@
+import logging
+import os
+import tempfile
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class DiskCache:
+    """A size-capped directory of cache entries, that can be shared by
+    multiple processes.
+
+    Entries are stored as files in subdirectories of 'cacheDir', and are
+    addressed by (subDir, fileName) keys. Writes are atomic, so readers never
+    see partially written entries. When the total size exceeds 'maxSize'
+    bytes, the least recently used entries are removed. Temporary files of
+    writes in progress are left alone, unless they are older than
+    'tmpGracePeriod' seconds, and were abandoned by a crashed writer.
+    """
+
+    tmpGracePeriod = 3600
+
+    def __init__(self, cacheDir, maxSize):
+        self.cacheDir = os.fspath(cacheDir)
+        self.maxSize = maxSize
+        os.makedirs(self.cacheDir, exist_ok=True)
+        self._currentSize = None  # an estimate, other processes may write, too
+
+    def getPath(self, key):
+        subDir, fileName = key
+        return os.path.join(self.cacheDir, subDir, fileName)
+
+    def read(self, key):
+        """Return the data for 'key', or None if there is no such entry."""
+        entryPath = self.getPath(key)
+        try:
+            with open(entryPath, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            # Mark the entry as recently used
+            os.utime(entryPath)
+        except OSError:
+            pass
+        return data
+
+    def write(self, key, data):
+        # Write to a temporary file first, then atomically move it into place.
+        # Cache writes are best effort: errors are logged and otherwise ignored.
+        entryPath = self.getPath(key)
+        entryDir = os.path.dirname(entryPath)
+        try:
+            os.makedirs(entryDir, exist_ok=True)
+            fd, tmpPath = tempfile.mkstemp(dir=entryDir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmpPath, entryPath)
+            except BaseException:
+                _removeFile(tmpPath)
+                raise
+        except OSError as e:
+            logger.warning("can't write cache entry %s: %s", entryPath, e)
+            return
+        if self._currentSize is None:
+            self._currentSize = self._calcSize()
+        else:
+            self._currentSize += len(data)
+        if self._currentSize > self.maxSize:
+            self.evict()
+
+    def remove(self, key):
+        _removeFile(self.getPath(key))
+
+    def _listEntries(self):
+        entries = []
+        tmpCutoff = time.time() - self.tmpGracePeriod
+        for dirEntry in os.scandir(self.cacheDir):
+            if not dirEntry.is_dir():
+                continue
+            for fileEntry in os.scandir(dirEntry.path):
+                try:
+                    stat = fileEntry.stat()
+                except OSError:
+                    continue  # removed by another process
+                if fileEntry.name.endswith(".tmp") and stat.st_mtime > tmpCutoff:
+                    continue  # another process may still be writing it
+                entries.append((stat.st_mtime, stat.st_size, fileEntry.path))
+        return entries
+
+    def _calcSize(self):
+        return sum(size for _, size, _ in self._listEntries())
+
+    def evict(self, targetSize=None):
+        """Remove the least recently used entries until the total size of the
+        cache is at most 'targetSize', which defaults to 75% of maxSize.
+        """
+        if targetSize is None:
+            targetSize = int(self.maxSize * 0.75)
+        entries = sorted(self._listEntries())
+        currentSize = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if currentSize <= targetSize:
+                break
+            _removeFile(path)
+            currentSize -= size
+        self._currentSize = currentSize
+
+    def clear(self):
+        """Remove all entries."""
+        self.evict(0)
+
+
+def _removeFile(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
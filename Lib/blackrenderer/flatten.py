@@ -0,0 +1,156 @@
+"""Flatten compiled glyphs into ordered lists of fills.
+
+flattenRecording() takes a RecordingCanvas, as filled by
+BlackRendererFont.drawGlyph(), and returns an equivalent RecordingCanvas
+without clips, transforms and saved states: every fill path is transformed,
+and intersected with all clips that apply to it, using skia-pathops. What
+remains is an ordered list of (path, paint) draw operations, which is cheap to
+replay, and easy to consume for other vector formats.
+
+Composite layers can't be flattened: they are kept, and the fills inside them
+are flattened. For the composite modes that clear the backdrop outside the
+layer's content, such as SRC_IN, the clip is kept as well, as a single
+pre-intersected clip path around the layer.
+
+This needs skia-pathops.
+"""
+
+from fontTools.misc.transform import Identity
+import pathops
+from .arrayPath import CLOSE, CUBIC, LINE, MOVE, QUAD, ArrayPath
+from .backends.recording import (
+    BEGIN_COMPOSITE,
+    CLIP,
+    DRAW_SOLID,
+    SAVE,
+    TRANSFORM,
+    RecordingCanvas,
+)
+from .paintOptimizer import (
+    _buildTree,
+    _clearingModes,
+    _drawNodes,
+    _Group,
+    _isSingular,
+    _transformGradient,
+)
+
+
+def flattenRecording(recording):
+    """Return a flattened copy of 'recording', see the module docstring."""
+    nodes = _buildTree(recording.ops, recording.paths)
+    nodes = _Flattener().flattenNodes(nodes, Identity, None)
+    flattened = RecordingCanvas()
+    _drawNodes(nodes, flattened)
+    return flattened
+
+
+class _Flattener:
+    def __init__(self):
+        # Paths that are used more than once are only converted once per
+        # transform
+        self._skPaths = {}
+
+    def flattenNodes(self, nodes, transform, clip):
+        # Return 'nodes' as a flat list of fills and composite groups, with
+        # 'transform' applied and 'clip' intersected, where 'clip' is a
+        # pathops.Path or None
+        result = []
+        for node in nodes:
+            if isinstance(node, _Group):
+                if node.opCode == SAVE:
+                    result.extend(self.flattenNodes(node.children, transform, clip))
+                elif clip is not None and node.compositeMode in _clearingModes:
+                    # The clip limits the area the layer is composited on
+                    group = _Group(SAVE, None)
+                    group.children = [
+                        (CLIP, _toArrayPath(clip)),
+                        _Group(BEGIN_COMPOSITE, node.compositeMode),
+                    ]
+                    group.children[1].children = self.flattenNodes(
+                        node.children, transform, None
+                    )
+                    result.append(group)
+                else:
+                    node.children = self.flattenNodes(node.children, transform, clip)
+                    result.append(node)
+            elif node[0] == TRANSFORM:
+                transform = transform.transform(node[1])
+            elif _isSingular(transform):
+                # Everything is collapsed onto a line, nothing gets drawn
+                continue
+            elif node[0] == CLIP:
+                clipPath = self.getSkPath(node[1], transform)
+                if clip is not None:
+                    clipPath = pathops.op(
+                        clip,
+                        clipPath,
+                        pathops.PathOp.INTERSECTION,
+                        keep_starting_points=False,
+                    )
+                clip = clipPath
+            else:
+                opCode, path, *args = node
+                if path is None:
+                    # An unbounded fill is limited by the clip only
+                    if clip is not None:
+                        path = _toArrayPath(clip)
+                elif clip is not None:
+                    path = _toArrayPath(
+                        pathops.op(
+                            self.getSkPath(path, transform),
+                            clip,
+                            pathops.PathOp.INTERSECTION,
+                            keep_starting_points=False,
+                        )
+                    )
+                elif transform != Identity:
+                    path = path.transformed(transform)
+                if path is not None and not len(path):
+                    continue
+                if opCode != DRAW_SOLID and transform != Identity:
+                    args = _transformGradient(opCode, args, transform)
+                result.append((opCode, path, *args))
+        return result
+
+    def getSkPath(self, path, transform):
+        key = id(path), tuple(transform)
+        skPath = self._skPaths.get(key)
+        if skPath is None:
+            skPath = _toSkPath(path.transformed(transform))
+            # Keep 'path' alive, so its id can't be reused
+            self._skPaths[key] = skPath, path
+        else:
+            skPath, _ = skPath
+        return skPath
+
+
+def _toSkPath(path):
+    skPath = pathops.Path()
+    points = path.points.tolist()
+    pointIndex = 0
+    for verb in path.verbs.tolist():
+        if verb == MOVE:
+            skPath.moveTo(*points[pointIndex])
+            pointIndex += 1
+        elif verb == LINE:
+            skPath.lineTo(*points[pointIndex])
+            pointIndex += 1
+        elif verb == QUAD:
+            skPath.quadTo(*points[pointIndex], *points[pointIndex + 1])
+            pointIndex += 2
+        elif verb == CUBIC:
+            skPath.cubicTo(
+                *points[pointIndex], *points[pointIndex + 1], *points[pointIndex + 2]
+            )
+            pointIndex += 3
+        elif verb == CLOSE:
+            skPath.close()
+        # END: open contours are filled as if they were closed
+    return skPath
+
+
+def _toArrayPath(skPath):
+    path = ArrayPath()
+    skPath.draw(path)
+    return path
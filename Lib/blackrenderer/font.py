@@ -1,10 +1,14 @@
 from collections import UserList
 from contextlib import contextmanager
+import hashlib
 from io import BytesIO
 import logging
 import math
+from fontTools.misc.roundTools import otRound
 from fontTools.misc.transform import Transform, Identity
 from fontTools.misc.arrayTools import unionRect
+from fontTools.misc.textTools import Tag
+from fontTools.pens.boundsPen import ControlBoundsPen
 from fontTools.ttLib import TTFont
 from fontTools.ttLib.tables.otTables import (
     BaseTable,
@@ -18,6 +22,8 @@ from fontTools.ttLib.tables.otTables import (
 )
 from fontTools.varLib.varStore import VarStoreInstancer
 import uharfbuzz as hb
+from .arrayPath import getGlyphOutline
+from .colrReader import COLRReader, LazyTable, readCPALPalettes
 
 
 logger = logging.getLogger(__name__)
@@ -33,7 +39,18 @@ PAINT_VAR_MAPPING = {
 
 
 class BlackRendererFont:
-    def __init__(self, path=None, *, fontNumber=0, lazy=True, ttFont=None, hbFont=None):
+    def __init__(
+        self,
+        path=None,
+        *,
+        fontNumber=0,
+        lazy=True,
+        ttFont=None,
+        hbFont=None,
+        traversalLimits=None,
+        engine="python",
+        colrReader="fonttools",
+    ):
         if path is not None:
             if ttFont is not None or hbFont is not None:
                 raise TypeError("either pass 'path', or both 'ttFont' and 'hbFont")
@@ -46,16 +63,35 @@ class BlackRendererFont:
             if ttFont is None or hbFont is None:
                 raise TypeError("either pass 'path', or both 'ttFont' and 'hbFont")
 
+            fontData = None
             self.ttFont = ttFont
             self.hbFont = hbFont
 
+        # The HarfBuzz face references the font data, so keeping it is free
+        self._fontData = fontData
+        self._fontNumber = fontNumber
+        self._contentHash = None
+
         self.textColor = (0, 0, 0, 1)
         self.colrV0Glyphs = {}
         self.colrV1Glyphs = {}
+        self.clipBoxes = None
         self.instancer = None
         self.varIndexMap = None
-
-        if "COLR" in self.ttFont:
+        self._paintBoundsCache = {}
+        self._paintBoundsCalculator = None
+        # Set to a PaintStats instance to collect drawing statistics
+        self.paintStats = None
+        # Set to an OutlineStore to take glyph outlines from it
+        self.outlineStore = None
+
+        if colrReader not in ("fonttools", "lazy"):
+            raise ValueError(f"unknown COLR reader: {colrReader!r}")
+        self.colrReader = colrReader
+
+        if "COLR" in self.ttFont and colrReader == "lazy":
+            self._readCOLRLazily()
+        elif "COLR" in self.ttFont:
             colrTable = self.ttFont["COLR"]
             if colrTable.version == 0:
                 self.colrV0Glyphs = colrTable.ColorLayers
@@ -67,10 +103,9 @@ class BlackRendererFont:
                     glyph.BaseGlyph: glyph
                     for glyph in colrTable.BaseGlyphList.BaseGlyphPaintRecord
                 }
-                if colrTable.ClipList is None:
-                    self.clipBoxes = None
-                else:
+                if colrTable.ClipList is not None:
                     self.clipBoxes = colrTable.ClipList.clips
+                    _unshareClipBoxReaders(self.clipBoxes)
                 self.colrLayersV1 = colrTable.LayerList
                 if colrTable.VarStore is not None:
                     if colrTable.VarIndexMap:
@@ -82,7 +117,10 @@ class BlackRendererFont:
                     self.instancer = None
 
         if "CPAL" in self.ttFont:
-            self.palettes = _unpackPalettes(self.ttFont["CPAL"].palettes)
+            if colrReader == "lazy":
+                self.palettes = readCPALPalettes(self._getTableData("CPAL"))
+            else:
+                self.palettes = _unpackPalettes(self.ttFont["CPAL"].palettes)
             self.currentPalette = self.palettes[0]
         else:
             self.palettes = None
@@ -93,6 +131,86 @@ class BlackRendererFont:
         else:
             self.axisTags = []
 
+        # The "harfbuzz" engine traverses paint graphs with HarfBuzz's
+        # paint API, see hbPaint.py
+        if engine == "python":
+            self._paintEngine = None
+        elif engine == "harfbuzz":
+            from .hbPaint import HarfBuzzPaintEngine
+
+            self._paintEngine = HarfBuzzPaintEngine(self)
+        else:
+            raise ValueError(f"unknown engine: {engine!r}")
+        self.engine = engine
+
+        self._traversalValidator = None
+        self.traversalLimits = traversalLimits
+        if traversalLimits is not None:
+            # Fail fast: reject fonts with over-budget glyphs before drawing
+            self._traversalValidator.validateFont()
+
+    def _readCOLRLazily(self):
+        # Read COLR with the lightweight reader from colrReader.py, which
+        # decodes paint tables on demand and doesn't keep them around
+        reader = COLRReader(
+            self._getTableData("COLR"),
+            self.ttFont.getGlyphOrder(),
+            self.ttFont.getGlyphID,
+        )
+        self.colrV0Glyphs = reader.colorLayersV0
+        if reader.version >= 1:
+            self.colrV1Glyphs = reader.baseGlyphPaintRecords
+            self.clipBoxes = reader.clipBoxes
+            self.colrLayersV1 = reader.layerList
+            varStore = reader.getVarStore(self.ttFont)
+            if varStore is not None:
+                self.varIndexMap = reader.getVarIndexMap(self.ttFont)
+                self.instancer = VarStoreInstancer(varStore, self.ttFont["fvar"].axes)
+
+    def _getTableData(self, tag):
+        # Without copying, if we have the data of an uncompressed font
+        reader = self.ttFont.reader
+        if self._fontData is not None and reader is not None and not reader.flavor:
+            entry = reader.tables[Tag(tag)]
+            start = entry.offset
+            end = start + entry.length
+            return memoryview(self._fontData)[start:end]
+        return self.ttFont.getTableData(tag)
+
+    @property
+    def traversalLimits(self):
+        """A TraversalLimits tuple, or None. When set, drawGlyph() and
+        getPaintBounds() raise TraversalBudgetError for glyphs that exceed
+        the limits, before doing any work.
+        """
+        return self._traversalLimits
+
+    @traversalLimits.setter
+    def traversalLimits(self, traversalLimits):
+        self._traversalLimits = traversalLimits
+        if traversalLimits is None:
+            self._traversalValidator = None
+        else:
+            from .traversalLimits import TraversalValidator
+
+            self._traversalValidator = TraversalValidator(self, traversalLimits)
+
+    @property
+    def contentHash(self):
+        """A SHA-256 hex digest of the font data, to identify the font in
+        persistent caches.
+        """
+        if self._contentHash is None:
+            fontData = self._fontData
+            if fontData is None:
+                f = BytesIO()
+                self.ttFont.save(f)
+                fontData = f.getvalue()
+            contentHash = hashlib.sha256(fontData)
+            contentHash.update(self._fontNumber.to_bytes(4, "little"))
+            self._contentHash = contentHash.hexdigest()
+        return self._contentHash
+
     @property
     def unitsPerEm(self):
         return self.hbFont.face.upem
@@ -129,16 +247,9 @@ class BlackRendererFont:
 
     def getGlyphBounds(self, glyphName):
         if glyphName in self.colrV1Glyphs:
-            bounds = self._getGlyphBounds(glyphName)
-            if self.clipBoxes is not None:
-                box = self.clipBoxes.get(glyphName)
-                if box is not None:
-                    if (
-                        box.Format == ClipBoxFormat.Variable
-                        and self.instancer is not None
-                    ):
-                        box = VarTableWrapper(box, self.instancer, self.varIndexMap)
-                    bounds = box.xMin, box.yMin, box.xMax, box.yMax
+            bounds = self._getClipBox(glyphName)
+            if bounds is None:
+                bounds = self._getGlyphBounds(glyphName)
         elif glyphName in self.colrV0Glyphs:
             # For COLRv0, we take the union of all layer bounds
             bounds = None
@@ -152,13 +263,89 @@ class BlackRendererFont:
             bounds = self._getGlyphBounds(glyphName)
         return bounds
 
+    def getPaintBounds(self, glyphName, location=None):
+        """Return the bounding box of the area actually painted by a glyph,
+        computed from its COLRv1 paint graph, without drawing it.
+
+        Clips are intersected and transforms are applied to the outlines, so
+        the result is usually much tighter than what getGlyphBounds() returns
+        for COLRv1 glyphs that have no ClipBox. If 'location' is given, the
+        bounds are computed for that location, else for the current location.
+        Results are cached per location. Returns None if the glyph paints
+        nothing. Glyphs that fill everything and have no ClipBox get the
+        bounds of their base glyph's outline, or None if it is empty.
+        """
+        from .paintBounds import PaintBoundsCalculator
+
+        with self._pushLocation(location):
+            locationKey = tuple(self.hbFont.get_var_coords_normalized())
+            cacheKey = glyphName, locationKey
+            if cacheKey in self._paintBoundsCache:
+                return self._paintBoundsCache[cacheKey]
+            if glyphName in self.colrV1Glyphs:
+                if self._traversalValidator is not None:
+                    self._traversalValidator.validateGlyph(glyphName)
+                if self._paintBoundsCalculator is None:
+                    self._paintBoundsCalculator = PaintBoundsCalculator(self)
+                bounds = self._paintBoundsCalculator.calcGlyphBounds(glyphName)
+            else:
+                bounds = self.getGlyphBounds(glyphName)
+                if bounds is not None and (
+                    bounds[0] >= bounds[2] or bounds[1] >= bounds[3]
+                ):
+                    # Empty glyph
+                    bounds = None
+        self._paintBoundsCache[cacheKey] = bounds
+        return bounds
+
     def drawGlyph(self, glyphName, canvas, *, palette=None, textColor=(0, 0, 0, 1)):
+        if self._traversalValidator is not None:
+            self._traversalValidator.validateGlyph(glyphName)
         if palette is None and self.palettes:
             palette = self.palettes[0]
         self.currentPalette = palette
         self.textColor = textColor
         self._recursionCheck = set()
 
+        if self.paintStats is None:
+            self._drawGlyph(glyphName, canvas)
+        else:
+            with self.paintStats.timeGlyph(glyphName, canvas) as statsCanvas:
+                self._drawGlyph(glyphName, statsCanvas)
+
+    def compileGlyph(
+        self,
+        glyphName,
+        *,
+        palette=None,
+        textColor=(0, 0, 0, 1),
+        optimize=True,
+        flatten=False,
+    ):
+        """Return a RecordingCanvas with the drawing operations for a glyph,
+        which can be replayed into any canvas. If 'optimize' is True, redundant
+        draw calls, state changes and composite layers are removed, see
+        blackrenderer.paintOptimizer. If 'flatten' is True, clips are applied
+        to the fill paths, so the result is a list of fills, see
+        blackrenderer.flatten. Flattening needs skia-pathops.
+        """
+        from .backends.recording import RecordingCanvas
+        from .paintOptimizer import optimizeRecording
+
+        recording = RecordingCanvas()
+        self.drawGlyph(glyphName, recording, palette=palette, textColor=textColor)
+        if flatten:
+            from .flatten import flattenRecording
+
+            recording = flattenRecording(recording)
+        if optimize:
+            recording = optimizeRecording(recording)
+        return recording
+
+    def _drawGlyph(self, glyphName, canvas):
+        if self._paintEngine is not None:
+            self._paintEngine.drawGlyph(glyphName, canvas)
+            return
         glyph = self.colrV1Glyphs.get(glyphName)
         if glyph is not None:
             self.currentTransform = Identity
@@ -195,20 +382,34 @@ class BlackRendererFont:
     # COLRv1 Paint dispatch
 
     def _drawPaint(self, paint, canvas):
+        paintName, paint = self._resolvePaint(paint)
+        if paintName is None:
+            return
+        drawHandler = getattr(self, "_draw" + paintName)
+        if self.paintStats is None:
+            drawHandler(paint, canvas)
+        else:
+            self.paintStats.beginPaint(PAINT_NAMES[paint.Format])
+            try:
+                drawHandler(paint, canvas)
+            finally:
+                self.paintStats.endPaint()
+
+    def _resolvePaint(self, paint):
+        # Return a (paintName, paint) tuple, where paintName is None for
+        # unknown Paint formats.
         nonVarFormat = PAINT_VAR_MAPPING.get(paint.Format)
         if nonVarFormat is None:
             # "regular" Paint
             paintName = PAINT_NAMES.get(paint.Format)
             if paintName is None:
                 logger.warning(f"Ignoring unknown COLRv1 Paint format: {paint.Format}")
-                return
         else:
             # PaintVar -- we map to its non-var counterpart and use a wrapper
             # that takes care of instantiating values
             paintName = PAINT_NAMES[nonVarFormat]
             paint = VarTableWrapper(paint, self.instancer, self.varIndexMap)
-        drawHandler = getattr(self, "_draw" + paintName)
-        drawHandler(paint, canvas)
+        return paintName, paint
 
     def _drawPaintColrLayers(self, paint, canvas):
         n = paint.NumLayers
@@ -286,64 +487,43 @@ class BlackRendererFont:
             self._drawGlyphCOLRv1(self.colrV1Glyphs[paint.Glyph], canvas)
 
     def _drawPaintTransform(self, paint, canvas):
-        t = paint.Transform
-        transform = (t.xx, t.yx, t.xy, t.yy, t.dx, t.dy)
+        transform = _transformPaintTransform(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintTranslate(self, paint, canvas):
-        transform = (1, 0, 0, 1, paint.dx, paint.dy)
+        transform = _transformPaintTranslate(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintRotate(self, paint, canvas):
-        transform = Transform()
-        transform = transform.rotate(math.radians(paint.angle))
+        transform = _transformPaintRotate(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintRotateAroundCenter(self, paint, canvas):
-        transform = Transform()
-        transform = transform.translate(paint.centerX, paint.centerY)
-        transform = transform.rotate(math.radians(paint.angle))
-        transform = transform.translate(-paint.centerX, -paint.centerY)
+        transform = _transformPaintRotateAroundCenter(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintSkew(self, paint, canvas):
-        transform = Transform()
-        transform = transform.skew(
-            -math.radians(paint.xSkewAngle), math.radians(paint.ySkewAngle)
-        )
+        transform = _transformPaintSkew(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintSkewAroundCenter(self, paint, canvas):
-        transform = Transform()
-        transform = transform.translate(paint.centerX, paint.centerY)
-        transform = transform.skew(
-            -math.radians(paint.xSkewAngle), math.radians(paint.ySkewAngle)
-        )
-        transform = transform.translate(-paint.centerX, -paint.centerY)
+        transform = _transformPaintSkewAroundCenter(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintScale(self, paint, canvas):
-        transform = Transform()
-        transform = transform.scale(paint.scaleX, paint.scaleY)
+        transform = _transformPaintScale(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintScaleAroundCenter(self, paint, canvas):
-        transform = Transform()
-        transform = transform.translate(paint.centerX, paint.centerY)
-        transform = transform.scale(paint.scaleX, paint.scaleY)
-        transform = transform.translate(-paint.centerX, -paint.centerY)
+        transform = _transformPaintScaleAroundCenter(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintScaleUniform(self, paint, canvas):
-        transform = Transform()
-        transform = transform.scale(paint.scale, paint.scale)
+        transform = _transformPaintScaleUniform(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintScaleUniformAroundCenter(self, paint, canvas):
-        transform = Transform()
-        transform = transform.translate(paint.centerX, paint.centerY)
-        transform = transform.scale(paint.scale, paint.scale)
-        transform = transform.translate(-paint.centerX, -paint.centerY)
+        transform = _transformPaintScaleUniformAroundCenter(paint)
         self._applyTransform(transform, paint.Paint, canvas)
 
     def _drawPaintComposite(self, paint, canvas):
@@ -395,6 +575,21 @@ class BlackRendererFont:
             yield
         self.hbFont.set_var_coords_normalized(savedAxisValues)
 
+    @contextmanager
+    def _pushLocation(self, location):
+        if location is None:
+            yield
+            return
+        savedAxisValues = self.hbFont.get_var_coords_normalized()
+        savedLocation = None if self.instancer is None else self.instancer.location
+        self.setLocation(location)
+        try:
+            yield
+        finally:
+            self.hbFont.set_var_coords_normalized(savedAxisValues)
+            if self.instancer is not None:
+                self.instancer.setLocation(savedLocation)
+
     @contextmanager
     def _ensureClipAndPushPath(self, canvas, path):
         currentPath = self.currentPath
@@ -422,11 +617,47 @@ class BlackRendererFont:
 
     def _drawGlyphOutline(self, glyphName, path):
         gid = self.ttFont.getGlyphID(glyphName)
-        self.hbFont.draw_glyph_with_pen(gid, path)
+        self._drawGlyphIDOutline(gid, path)
+
+    def _drawGlyphIDOutline(self, gid, path):
+        outlineStore = self.outlineStore
+        if (
+            outlineStore is not None
+            and outlineStore.normalizedCoords
+            == tuple(self.hbFont.get_var_coords_normalized())
+            and outlineStore.drawOutline(gid, path)
+        ):
+            return
+        # Paths with an appendOutline() method take the outline in bulk
+        appendOutline = getattr(path, "appendOutline", None)
+        if appendOutline is not None:
+            appendOutline(*getGlyphOutline(self.hbFont, gid))
+        else:
+            self.hbFont.draw_glyph_with_pen(gid, path)
+
+    def _getClipBox(self, glyphName):
+        if self.clipBoxes is None:
+            return None
+        box = self.clipBoxes.get(glyphName)
+        if box is None:
+            return None
+        if box.Format == ClipBoxFormat.Variable and self.instancer is not None:
+            box = VarTableWrapper(box, self.instancer, self.varIndexMap)
+        return box.xMin, box.yMin, box.xMax, box.yMax
 
     def _getGlyphBounds(self, glyphName):
         gid = self.ttFont.getGlyphID(glyphName)
         assert gid is not None, glyphName
+        if glyphName in self.colrV1Glyphs:
+            # HarfBuzz >= 7 returns the bounds of the paint graph for COLRv1
+            # glyphs; use the base glyph's outline, like older versions do,
+            # or the ClipBox, or an empty box if the outline is empty
+            pen = ControlBoundsPen(None)
+            self._drawGlyphIDOutline(gid, pen)
+            if pen.bounds is not None:
+                return tuple(otRound(v) for v in pen.bounds)
+            clipBox = self._getClipBox(glyphName)
+            return clipBox if clipBox is not None else (0, 0, 0, 0)
         x, y, w, h = self.hbFont.get_glyph_extents(gid)
         # convert from HB's x/y_bearing + extents to xMin, yMin, xMax, yMax
         y += h
@@ -456,6 +687,82 @@ class BlackRendererFont:
         )
 
 
+def _transformPaintTransform(paint):
+    t = paint.Transform
+    return (t.xx, t.yx, t.xy, t.yy, t.dx, t.dy)
+
+
+def _transformPaintTranslate(paint):
+    return (1, 0, 0, 1, paint.dx, paint.dy)
+
+
+def _transformPaintRotate(paint):
+    transform = Transform()
+    return transform.rotate(math.radians(paint.angle))
+
+
+def _transformPaintRotateAroundCenter(paint):
+    transform = Transform()
+    transform = transform.translate(paint.centerX, paint.centerY)
+    transform = transform.rotate(math.radians(paint.angle))
+    return transform.translate(-paint.centerX, -paint.centerY)
+
+
+def _transformPaintSkew(paint):
+    transform = Transform()
+    return transform.skew(
+        -math.radians(paint.xSkewAngle), math.radians(paint.ySkewAngle)
+    )
+
+
+def _transformPaintSkewAroundCenter(paint):
+    transform = Transform()
+    transform = transform.translate(paint.centerX, paint.centerY)
+    transform = transform.skew(
+        -math.radians(paint.xSkewAngle), math.radians(paint.ySkewAngle)
+    )
+    return transform.translate(-paint.centerX, -paint.centerY)
+
+
+def _transformPaintScale(paint):
+    transform = Transform()
+    return transform.scale(paint.scaleX, paint.scaleY)
+
+
+def _transformPaintScaleAroundCenter(paint):
+    transform = Transform()
+    transform = transform.translate(paint.centerX, paint.centerY)
+    transform = transform.scale(paint.scaleX, paint.scaleY)
+    return transform.translate(-paint.centerX, -paint.centerY)
+
+
+def _transformPaintScaleUniform(paint):
+    transform = Transform()
+    return transform.scale(paint.scale, paint.scale)
+
+
+def _transformPaintScaleUniformAroundCenter(paint):
+    transform = Transform()
+    transform = transform.translate(paint.centerX, paint.centerY)
+    transform = transform.scale(paint.scale, paint.scale)
+    return transform.translate(-paint.centerX, -paint.centerY)
+
+
+# Map transforming Paint names to functions returning the Paint's transform
+PAINT_TRANSFORMS = {
+    "PaintTransform": _transformPaintTransform,
+    "PaintTranslate": _transformPaintTranslate,
+    "PaintRotate": _transformPaintRotate,
+    "PaintRotateAroundCenter": _transformPaintRotateAroundCenter,
+    "PaintSkew": _transformPaintSkew,
+    "PaintSkewAroundCenter": _transformPaintSkewAroundCenter,
+    "PaintScale": _transformPaintScale,
+    "PaintScaleAroundCenter": _transformPaintScaleAroundCenter,
+    "PaintScaleUniform": _transformPaintScaleUniform,
+    "PaintScaleUniformAroundCenter": _transformPaintScaleUniformAroundCenter,
+}
+
+
 def _reduceThreeAnchorsToTwo(p):
     # FIXME: make sure the 3 points are not in degenerate position [see COLRv1 spec].
     x02 = p.x2 - p.x0
@@ -508,6 +815,16 @@ def _interpolatePoints(pt1, pt2, f):
     return (x1 + f * (x2 - x1), y1 + f * (y2 - y1))
 
 
+def _unshareClipBoxReaders(clipBoxes):
+    # Older fontTools versions copy a lazily loaded ClipBox for each glyph
+    # that uses it, but the copies share one reader, so only the first copy
+    # to be decompiled reads the right data
+    for box in clipBoxes.values():
+        reader = box.__dict__.get("reader")
+        if reader is not None:
+            box.reader = reader.copy()
+
+
 def _unpackPalettes(palettes):
     return [
         [(c.red / 255, c.green / 255, c.blue / 255, c.alpha / 255) for c in p]
@@ -572,12 +889,21 @@ class VarTableWrapper:
         if varIdx is not None:
             if varIdx < 0xFFFFFFFF:
                 value += self._getDeltaForAttr(attrName, varIdx)
-        elif isinstance(value, (VarAffine2x3, VarColorLine)):
+        elif isinstance(value, (VarAffine2x3, VarColorLine)) or (
+            isinstance(value, LazyTable)
+            and value.tableName in ("VarAffine2x3", "VarColorLine")
+        ):
             value = VarTableWrapper(value, self._instancer, self._varIndexMap)
         elif (
             isinstance(value, (list, UserList))
             and value
-            and isinstance(value[0], VarColorStop)
+            and (
+                isinstance(value[0], VarColorStop)
+                or (
+                    isinstance(value[0], LazyTable)
+                    and value[0].tableName == "VarColorStop"
+                )
+            )
         ):
             value = [
                 VarTableWrapper(item, self._instancer, self._varIndexMap)
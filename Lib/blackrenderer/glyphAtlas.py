@@ -0,0 +1,357 @@
+"""A raster glyph cache for drawing text at fixed pixel sizes.
+
+A GlyphAtlas rasterizes each glyph once per font, size, location, palette,
+text color and subpixel phase, through one of the pixel backends, and keeps
+the result in a cell of a texture-like page. Text runs are then composited by
+blitting cells, instead of traversing and rasterizing the glyphs again:
+
+    atlas = GlyphAtlas()
+    glyphLine = buildGlyphLine(infos, positions, font.glyphNames)
+    image, bounds = atlas.renderGlyphLine(font, glyphLine, fontSize=32)
+
+Memory is bounded: the atlas has at most 'maxPages' pages of 'pageSize' ×
+'pageSize' pixels. When all pages are full, the least recently used page is
+cleared, and its glyphs are rasterized again when they are needed again.
+
+Images are uint8 arrays of shape (height, width, 4), with premultiplied RGBA
+pixels, rows from top to bottom.
+"""
+
+import itertools
+import math
+from typing import NamedTuple
+from fontTools.misc.arrayTools import (
+    insetRect,
+    intRect,
+    offsetRect,
+    scaleRect,
+    unionRect,
+)
+import numpy as np
+from .backends import getSurfaceClass
+
+
+class AtlasCell(NamedTuple):
+    # A premultiplied RGBA image, usually a view into an atlas page
+    image: np.ndarray
+    # Position of the image's left and top edges in pixels, relative to the
+    # pen position, with y going up
+    xMin: int
+    yMax: int
+    # Index of the atlas page holding the image, or None if the image didn't
+    # fit in any page
+    pageIndex: int
+
+
+class GlyphAtlas:
+    def __init__(self, *, pageSize=1024, maxPages=8, backendName="numpy"):
+        surfaceClass = getSurfaceClass(backendName, ".png")
+        if surfaceClass is None:
+            raise ImportError(f"backend {backendName!r} is not available")
+        if not hasattr(surfaceClass, "getImageArray"):
+            raise ValueError(f"backend {backendName!r} can't return pixel arrays")
+        self.backendName = backendName
+        self.surfaceClass = surfaceClass
+        self.pageSize = pageSize
+        self.maxPages = maxPages
+        self.pages = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cells = {}
+        self._clock = itertools.count()
+        # Pages used since this time can't be evicted, see renderGlyphLine()
+        self._pinnedSince = None
+
+    @property
+    def memoryUsage(self):
+        """The number of bytes used by the atlas pages."""
+        return sum(page.image.nbytes for page in self.pages)
+
+    def getCell(
+        self,
+        font,
+        glyphName,
+        fontSize,
+        *,
+        palette=None,
+        textColor=(0, 0, 0, 1),
+        phase=(0, 0),
+    ):
+        """Return the AtlasCell for a glyph at the font's current location,
+        rasterizing the glyph if needed. 'phase' is an (x, y) offset in
+        pixels, to rasterize the glyph at a subpixel position.
+        """
+        if palette is None and font.palettes:
+            palette = font.palettes[0]
+        key = (
+            font.contentHash,
+            glyphName,
+            fontSize,
+            tuple(font.hbFont.get_var_coords_normalized()),
+            None if palette is None else tuple(palette),
+            tuple(textColor),
+            tuple(phase),
+        )
+        cell = self._cells.get(key)
+        if cell is not None:
+            self.hits += 1
+            self.pages[cell.pageIndex].lastUsed = next(self._clock)
+            return cell
+        self.misses += 1
+        image, xMin, cellYMax = rasterizeGlyph(
+            self.surfaceClass,
+            font,
+            glyphName,
+            fontSize,
+            palette=palette,
+            textColor=textColor,
+            phase=phase,
+        )
+        height, width, _ = image.shape
+        pageIndex, x, y = self._allocate(width, height)
+        if pageIndex is None:
+            return AtlasCell(image, xMin, cellYMax, None)
+        page = self.pages[pageIndex]
+        yMax = y + height
+        xMax = x + width
+        cellImage = page.image[y:yMax, x:xMax]
+        cellImage[:] = image
+        cell = AtlasCell(cellImage, xMin, cellYMax, pageIndex)
+        self._cells[key] = cell
+        page.keys.append(key)
+        return cell
+
+    def renderGlyphLine(
+        self,
+        font,
+        glyphLine,
+        fontSize,
+        *,
+        palette=None,
+        textColor=(0, 0, 0, 1),
+        subpixelPhases=(1, 1),
+        margin=0,
+        bounds=None,
+    ):
+        """Composite a glyph line, as returned by render.buildGlyphLine(), from
+        atlas cells. Returns an (image, bounds) tuple, where 'bounds' is the
+        (xMin, yMin, xMax, yMax) pixel box of the image, relative to the start
+        of the line, with y going up. If 'bounds' is given, the image covers
+        that box, otherwise it covers all glyphs plus 'margin'.
+
+        Glyph positions are rounded to the nearest 1/xPhases and 1/yPhases of
+        a pixel, for a 'subpixelPhases' of (xPhases, yPhases), and a glyph is
+        rasterized once per phase. The default places glyphs at whole pixels.
+        """
+        scaleFactor = fontSize / font.unitsPerEm
+        xPhases, yPhases = subpixelPhases
+        placements = []
+        self._pinnedSince = next(self._clock)
+        try:
+            x = y = 0
+            for glyph in glyphLine:
+                originX, phaseX = quantizePosition(
+                    (x + glyph.xOffset) * scaleFactor, xPhases
+                )
+                originY, phaseY = quantizePosition(
+                    (y + glyph.yOffset) * scaleFactor, yPhases
+                )
+                cell = self.getCell(
+                    font,
+                    glyph.name,
+                    fontSize,
+                    palette=palette,
+                    textColor=textColor,
+                    phase=(phaseX, phaseY),
+                )
+                placements.append((cell, originX, originY))
+                x += glyph.xAdvance
+                y += glyph.yAdvance
+        finally:
+            self._pinnedSince = None
+        return compositeCells(placements, margin, bounds)
+
+    def clear(self):
+        """Remove all glyphs and pages."""
+        self.pages = []
+        self._cells = {}
+
+    def _allocate(self, width, height):
+        # Return a (pageIndex, x, y) tuple for a free area of the given size,
+        # or (None, None, None) if there is none
+        if width > self.pageSize or height > self.pageSize:
+            return None, None, None
+        for pageIndex, page in enumerate(self.pages):
+            position = page.allocate(width, height)
+            if position is not None:
+                page.lastUsed = next(self._clock)
+                return (pageIndex, *position)
+        if len(self.pages) < self.maxPages:
+            pageIndex = len(self.pages)
+            self.pages.append(_AtlasPage(self.pageSize))
+        else:
+            pageIndex = self._evictPage()
+            if pageIndex is None:
+                return None, None, None
+        page = self.pages[pageIndex]
+        page.lastUsed = next(self._clock)
+        return (pageIndex, *page.allocate(width, height))
+
+    def _evictPage(self):
+        # Clear the least recently used page, and return its index
+        candidates = [
+            (page.lastUsed, pageIndex)
+            for pageIndex, page in enumerate(self.pages)
+            if self._pinnedSince is None or page.lastUsed < self._pinnedSince
+        ]
+        if not candidates:
+            return None
+        _, pageIndex = min(candidates)
+        page = self.pages[pageIndex]
+        for key in page.keys:
+            del self._cells[key]
+        page.reset()
+        self.evictions += 1
+        return pageIndex
+
+
+class _AtlasPage:
+    # A page of cells, packed in shelves: rows of cells, each as high as its
+    # highest cell
+
+    def __init__(self, size):
+        self.size = size
+        self.image = np.zeros((size, size, 4), dtype=np.uint8)
+        self.lastUsed = 0
+        self.reset()
+
+    def reset(self):
+        self.keys = []
+        # [y, height, x] lists, x being the next free position on the shelf
+        self.shelves = []
+        self.nextY = 0
+
+    def allocate(self, width, height):
+        # Return the (x, y) position of a free area of the given size, or
+        # None if the page is full. Cells are separated by one pixel.
+        width += 1
+        height += 1
+        bestShelf = None
+        for shelf in self.shelves:
+            shelfY, shelfHeight, shelfX = shelf
+            if height <= shelfHeight and shelfX + width <= self.size:
+                if bestShelf is None or shelfHeight < bestShelf[1]:
+                    bestShelf = shelf
+        if bestShelf is None:
+            if self.nextY + height > self.size:
+                return None
+            bestShelf = [self.nextY, height, 0]
+            self.shelves.append(bestShelf)
+            self.nextY += height
+        x = bestShelf[2]
+        bestShelf[2] += width
+        return x, bestShelf[0]
+
+
+def rasterizeGlyph(
+    surfaceClass,
+    font,
+    glyphName,
+    fontSize,
+    *,
+    palette=None,
+    textColor=(0, 0, 0, 1),
+    phase=(0, 0),
+):
+    """Draw a glyph with a pixel backend's Surface class, offset by 'phase'
+    pixels. Return an (image, xMin, yMax) tuple, see AtlasCell. The image
+    covers the painted area of the glyph, see font.getPaintBounds().
+    """
+    scaleFactor = fontSize / font.unitsPerEm
+    bounds = font.getPaintBounds(glyphName)
+    if bounds is None or bounds[0] >= bounds[2] or bounds[1] >= bounds[3]:
+        return np.zeros((0, 0, 4), dtype=np.uint8), 0, 0
+    phaseX, phaseY = phase
+    bounds = scaleRect(bounds, scaleFactor, scaleFactor)
+    bounds = offsetRect(bounds, phaseX, phaseY)
+    # Leave room for antialiasing
+    bounds = intRect(insetRect(bounds, -1, -1))
+    surface = surfaceClass()
+    with surface.canvas(bounds) as canvas:
+        canvas.translate(phaseX, phaseY)
+        canvas.scale(scaleFactor)
+        font.drawGlyph(glyphName, canvas, palette=palette, textColor=textColor)
+    return surface.getImageArray(premultiplied=True), bounds[0], bounds[3]
+
+
+def quantizePosition(position, numPhases):
+    """Round a position in pixels to the nearest multiple of 1 / numPhases.
+    Return a (whole, phase) tuple, with 'whole' an int and 'phase' a fraction
+    in the range [0, 1), so that whole + phase is the rounded position.
+    """
+    whole, step = divmod(math.floor(position * numPhases + 0.5), numPhases)
+    return whole, step / numPhases
+
+
+def compositeCells(placements, margin=0, bounds=None):
+    """Composite (cell, x, y) placements into a new image. Returns an (image,
+    bounds) tuple, see GlyphAtlas.renderGlyphLine().
+    """
+    if bounds is None:
+        bounds = _calcPlacementBounds(placements)
+        bounds = insetRect(bounds, -margin, -margin)
+    imageXMin, imageYMin, imageXMax, imageYMax = bounds
+    imageWidth = imageXMax - imageXMin
+    imageHeight = imageYMax - imageYMin
+    image = np.zeros((imageHeight, imageWidth, 4), np.uint8)
+    for cell, x, y in placements:
+        height, width, _ = cell.image.shape
+        left = x + cell.xMin - imageXMin
+        top = imageYMax - (y + cell.yMax)
+        # Clip the cell to the image
+        cellLeft = max(0, -left)
+        cellTop = max(0, -top)
+        cellRight = min(width, imageWidth - left)
+        cellBottom = min(height, imageHeight - top)
+        if cellLeft >= cellRight or cellTop >= cellBottom:
+            continue
+        source = cell.image[cellTop:cellBottom, cellLeft:cellRight]
+        source = source.astype(np.uint16)
+        regionLeft = left + cellLeft
+        regionTop = top + cellTop
+        regionRight = left + cellRight
+        regionBottom = top + cellBottom
+        region = image[regionTop:regionBottom, regionLeft:regionRight]
+        # Source over, with premultiplied colors
+        inverseAlpha = 255 - source[..., 3:]
+        region[:] = source + (region * inverseAlpha + 127) // 255
+    return image, bounds
+
+
+def unpremultiplyImage(image):
+    """Convert a premultiplied RGBA image to straight alpha, as PNG files
+    need it.
+    """
+    alpha = image[..., 3:].astype(np.uint32)
+    rgb = image[..., :3].astype(np.uint32) * 255 + alpha // 2
+    rgb = np.where(alpha, rgb // np.maximum(alpha, 1), 0)
+    return np.concatenate([np.minimum(rgb, 255), alpha], axis=-1).astype(np.uint8)
+
+
+def _calcPlacementBounds(placements):
+    bounds = None
+    for cell, x, y in placements:
+        height, width, _ = cell.image.shape
+        if not width or not height:
+            continue
+        xMin = x + cell.xMin
+        yMax = y + cell.yMax
+        cellBounds = (xMin, yMax - height, xMin + width, yMax)
+        if bounds is None:
+            bounds = cellBounds
+        else:
+            bounds = unionRect(bounds, cellBounds)
+    if bounds is None:
+        bounds = (0, 0, 0, 0)
+    return bounds
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import struct
+from .backends.recording import RecordingCanvas
+from .diskCache import DiskCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class GlyphCache:
+    """A persistent cache of compiled glyphs, shared between processes.
+
+    For each glyph, the result of BlackRendererFont.drawGlyph() is stored as
+    a binary RecordingCanvas display list, which includes the glyph outlines,
+    resolved colors and normalized color lines. Entries are keyed by the font
+    content hash, the glyph ID, the normalized location, the palette and the
+    text color.
+
+    Writes are atomic, so many processes can safely share one cache
+    directory. When the total size of the cache exceeds 'maxSize' bytes, the
+    least recently used entries are removed.
+
+    If 'optimize' is True, display lists are optimized before they are
+    stored, see BlackRendererFont.compileGlyph().
+    """
+
+    def __init__(self, cacheDir, maxSize=256 * 1024 * 1024, *, optimize=False):
+        self.diskCache = DiskCache(cacheDir, maxSize)
+        self.optimize = optimize
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def maxSize(self):
+        return self.diskCache.maxSize
+
+    def drawGlyph(self, font, glyphName, canvas, *, palette=None, textColor=None):
+        """Draw a glyph like BlackRendererFont.drawGlyph() does, but use the
+        cached display list if available.
+        """
+        recording = self.getRecording(
+            font, glyphName, palette=palette, textColor=textColor
+        )
+        recording.replay(canvas)
+
+    def getRecording(self, font, glyphName, *, palette=None, textColor=None):
+        """Return a RecordingCanvas with the drawing operations for the glyph,
+        from the cache if possible.
+        """
+        if palette is None and font.palettes:
+            palette = font.palettes[0]
+        if textColor is None:
+            textColor = (0, 0, 0, 1)
+        key = self._getKey(font, glyphName, palette, textColor)
+
+        recording = self._readEntry(key)
+        if recording is not None:
+            self.hits += 1
+            return recording
+
+        self.misses += 1
+        recording = font.compileGlyph(
+            glyphName, palette=palette, textColor=textColor, optimize=self.optimize
+        )
+        self.diskCache.write(key, recording.toBytes())
+        return recording
+
+    def getOutlineStore(self, font, glyphNames=None):
+        """Return an OutlineStore with the outlines of 'glyphNames' (or of all
+        glyphs) at the font's current location, from the cache if possible.
+        Assign it to font.outlineStore to draw cache misses from it.
+        """
+        from .outlineStore import OutlineStore
+
+        if glyphNames is None:
+            glyphIDs = range(len(font.glyphNames))
+        else:
+            glyphIDs = sorted({font.ttFont.getGlyphID(name) for name in glyphNames})
+        coords = font.hbFont.get_var_coords_normalized()
+        key = hashlib.sha256()
+        key.update(struct.pack(f"<{len(coords)}d", *coords))
+        key.update(struct.pack(f"<{len(glyphIDs)}I", *glyphIDs))
+        key = font.contentHash, f"outlines-{key.hexdigest()[:32]}.bros"
+
+        data = self.diskCache.read(key)
+        if data is not None:
+            try:
+                outlineStore = OutlineStore.fromBytes(data)
+            except ValueError as e:
+                logger.warning("removing invalid glyph cache entry %s: %s", key, e)
+                self.diskCache.remove(key)
+            else:
+                self.hits += 1
+                return outlineStore
+
+        self.misses += 1
+        outlineStore = OutlineStore.fromFont(font, glyphNames)
+        self.diskCache.write(key, outlineStore.toBytes())
+        return outlineStore
+
+    def _getKey(self, font, glyphName, palette, textColor):
+        glyphID = font.ttFont.getGlyphID(glyphName)
+        coords = font.hbFont.get_var_coords_normalized()
+        key = hashlib.sha256()
+        key.update(struct.pack(f"<I{len(coords)}d", glyphID, *coords))
+        if palette is not None:
+            for color in palette:
+                key.update(struct.pack("<4d", *color))
+        key.update(struct.pack("<4d", *textColor))
+        if self.optimize:
+            key.update(b"optimized")
+        return font.contentHash, f"{glyphID}-{key.hexdigest()[:32]}.brrc"
+
+    def _readEntry(self, key):
+        data = self.diskCache.read(key)
+        if data is None:
+            return None
+        try:
+            return RecordingCanvas.fromBytes(data)
+        except ValueError as e:
+            logger.warning("removing invalid glyph cache entry %s: %s", key, e)
+            self.diskCache.remove(key)
+            return None
+
+    def evict(self, targetSize=None):
+        """Remove the least recently used entries until the total size of the
+        cache is at most 'targetSize', which defaults to 75% of maxSize.
+        """
+        self.diskCache.evict(targetSize)
+
+    def clear(self):
+        """Remove all entries."""
+        self.diskCache.clear()
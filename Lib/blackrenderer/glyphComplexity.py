@@ -0,0 +1,381 @@
+"""Analyze the complexity of the color glyphs of a font, without rendering
+them, and predict their render cost.
+
+    $ python -m blackrenderer.glyphComplexity report font.ttf
+
+The cost model that 'report' uses can be calibrated from benchmark results,
+as written by benchmarks/benchmarkRender.py or benchmarks/benchmarkScaling.py:
+
+    $ python benchmarks/benchmarkScaling.py --output scaling.json
+    $ python -m blackrenderer.glyphComplexity calibrate model.json scaling.json
+    $ python -m blackrenderer.glyphComplexity report font.ttf --model model.json
+"""
+
+import argparse
+from collections import defaultdict
+import json
+import math
+import sys
+from typing import NamedTuple
+from .font import PAINT_VAR_MAPPING, BlackRendererFont
+from .paintGraph import PaintGraphWalker
+
+
+costFeatures = [
+    "nodeCount",
+    "outlinePoints",
+    "fillArea",
+    "compositeCount",
+    "gradientCount",
+    "isVariable",
+]
+
+gradientPaintNames = {
+    "PaintLinearGradient",
+    "PaintRadialGradient",
+    "PaintSweepGradient",
+}
+
+
+class GlyphComplexity(NamedTuple):
+    glyphName: str
+    # The number of Paint nodes visited when drawing the glyph; shared
+    # subgraphs count once for each time they are reached. For COLRv0 glyphs,
+    # the number of layers.
+    nodeCount: int
+    maxDepth: int
+    # The total number of points of the outlines drawn by PaintGlyph
+    outlinePoints: int
+    # The total bounding box area of those outlines, in square font units,
+    # ignoring transforms
+    fillArea: int
+    compositeCount: int
+    gradientCount: int
+    isVariable: bool
+
+
+class CostModel(NamedTuple):
+    """A linear model of the render cost of a glyph, in seconds."""
+
+    stages: list
+    backend: str
+    intercept: float
+    coefficients: dict
+
+    def predict(self, complexity):
+        return self.intercept + sum(
+            coefficient * float(getattr(complexity, featureName))
+            for featureName, coefficient in self.coefficients.items()
+        )
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self._asdict(), f, indent=1)
+            f.write("\n")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+
+# Calibrated with benchmarks/benchmarkScaling.py and benchmarkRender.py on an
+# x86-64 Linux machine, rendering at a quarter of the font's units per em.
+# Expect predictions within a factor of two; recalibrate for other machines.
+defaultCostModel = CostModel(
+    stages=["traverse", "rasterize"],
+    backend="skia",
+    intercept=1.8e-4,
+    coefficients=dict(
+        nodeCount=0.0,
+        outlinePoints=1.3e-6,
+        fillArea=1.7e-10,
+        compositeCount=4.0e-4,
+        gradientCount=2.9e-4,
+        isVariable=0.0,
+    ),
+)
+
+
+class ComplexityAnalyzer(PaintGraphWalker):
+    """Computes GlyphComplexity tuples for the color glyphs of a
+    BlackRendererFont, by walking the paint graphs of COLRv1 glyphs. Results
+    for shared subgraphs are memoized, so analyzing a glyph takes time
+    proportional to the size of its paint graph, not to the number of nodes
+    visited when drawing it.
+    """
+
+    def __init__(self, font):
+        super().__init__(font)
+        self._outlineInfoCache = {}
+
+    def analyzeGlyph(self, glyphName):
+        if glyphName in self.font.colrV1Glyphs:
+            return GlyphComplexity(glyphName, *self.walkGlyph(glyphName))
+        # Each COLRv0 layer is a solid filled outline, and counts as one node
+        layers = self.font.colrV0Glyphs[glyphName]
+        outlineInfos = [self._getOutlineInfo(layer.name) for layer in layers]
+        return GlyphComplexity(
+            glyphName,
+            nodeCount=len(layers),
+            maxDepth=1,
+            outlinePoints=sum(numPoints for numPoints, _ in outlineInfos),
+            fillArea=sum(area for _, area in outlineInfos),
+            compositeCount=0,
+            gradientCount=0,
+            isVariable=False,
+        )
+
+    def visitPaint(self, paint, paintName):
+        nodeCount = 1
+        childDepth = 0
+        outlinePoints = fillArea = 0
+        compositeCount = int(paintName == "PaintComposite")
+        gradientCount = int(paintName in gradientPaintNames)
+        isVariable = paint.Format in PAINT_VAR_MAPPING
+        if paintName == "PaintGlyph":
+            outlinePoints, fillArea = self._getOutlineInfo(paint.Glyph)
+        for child in self.iterChildren(paint, paintName):
+            childResult = self.walkChild(child)
+            nodeCount += childResult[0]
+            childDepth = max(childDepth, childResult[1])
+            outlinePoints += childResult[2]
+            fillArea += childResult[3]
+            compositeCount += childResult[4]
+            gradientCount += childResult[5]
+            isVariable = isVariable or childResult[6]
+        return (
+            nodeCount,
+            childDepth + 1,
+            outlinePoints,
+            fillArea,
+            compositeCount,
+            gradientCount,
+            isVariable,
+        )
+
+    def _getOutlineInfo(self, glyphName):
+        # Return (numPoints, boundingBoxArea)
+        outlineInfo = self._outlineInfoCache.get(glyphName)
+        if outlineInfo is None:
+            pen = PointCountPen()
+            self.font._drawGlyphOutline(glyphName, pen)
+            xMin, yMin, xMax, yMax = self.font._getGlyphBounds(glyphName)
+            area = max(0, xMax - xMin) * max(0, yMax - yMin)
+            outlineInfo = pen.numPoints, area
+            self._outlineInfoCache[glyphName] = outlineInfo
+        return outlineInfo
+
+
+class PointCountPen:
+    def __init__(self):
+        self.numPoints = 0
+
+    def moveTo(self, pt):
+        self.numPoints += 1
+
+    def lineTo(self, pt):
+        self.numPoints += 1
+
+    def curveTo(self, *points):
+        self.numPoints += len(points)
+
+    def qCurveTo(self, *points):
+        self.numPoints += len(points)
+
+    def closePath(self):
+        pass
+
+    def endPath(self):
+        pass
+
+
+def analyzeFont(font, glyphNames=None):
+    """Return a list of GlyphComplexity tuples for the COLRv1 and COLRv0 glyphs
+    of a BlackRendererFont, or for the color glyphs among 'glyphNames'.
+    """
+    analyzer = ComplexityAnalyzer(font)
+    if glyphNames is None:
+        # A glyph that is in both is drawn, and analyzed, as COLRv1
+        glyphNames = dict.fromkeys(font.colrV1GlyphNames)
+        glyphNames.update(dict.fromkeys(font.colrV0GlyphNames))
+    return [
+        analyzer.analyzeGlyph(glyphName)
+        for glyphName in glyphNames
+        if glyphName in font.colrV1Glyphs or glyphName in font.colrV0Glyphs
+    ]
+
+
+def calibrateCostModel(benchmarks, stages=("traverse", "rasterize"), backend="skia"):
+    """Fit a CostModel to benchmark records that have a 'complexity' field.
+    The cost of a glyph is the sum of the median times of 'stages'; the
+    rasterization stage is taken from 'backend'. Coefficients are constrained
+    to be non-negative.
+    """
+    costs = defaultdict(dict)
+    complexities = {}
+    for benchmark in benchmarks:
+        complexity = benchmark.get("complexity")
+        stage = benchmark["stage"]
+        if complexity is None or stage not in stages:
+            continue
+        if benchmark.get("backend") not in (None, backend):
+            continue
+        glyphKey = json.dumps(
+            [
+                benchmark.get(key)
+                for key in ["font", "glyph", "location", "paletteIndex", "parameter"]
+            ]
+            + [benchmark.get("value")],
+            sort_keys=True,
+        )
+        samples = sorted(benchmark["samples"])
+        costs[glyphKey][stage] = samples[len(samples) // 2]
+        complexities[glyphKey] = complexity
+    rows = []
+    targets = []
+    for glyphKey, stageCosts in costs.items():
+        if len(stageCosts) != len(stages):
+            continue
+        complexity = complexities[glyphKey]
+        rows.append([float(complexity[name]) for name in costFeatures])
+        targets.append(sum(stageCosts.values()))
+    if len(rows) <= len(costFeatures):
+        raise ValueError(
+            f"not enough benchmarks to calibrate the cost model: {len(rows)}"
+        )
+    intercept, coefficients = _fitNonNegative(rows, targets)
+    return CostModel(
+        stages=list(stages),
+        backend=backend,
+        intercept=intercept,
+        coefficients=dict(zip(costFeatures, coefficients)),
+    )
+
+
+def _fitNonNegative(rows, targets):
+    # Least squares with an intercept, minimizing the relative error, since
+    # costs span orders of magnitude. Features whose coefficient comes out
+    # negative are dropped, and the remaining ones refitted.
+    import numpy
+
+    weights = 1 / numpy.array(targets)
+    active = list(range(len(costFeatures)))
+    while True:
+        matrix = numpy.array([[1.0] + [row[i] for i in active] for row in rows])
+        solution = numpy.linalg.lstsq(
+            matrix * weights[:, None], numpy.ones(len(targets)), rcond=None
+        )[0]
+        negative = [i for i, c in zip(active, solution[1:]) if c < 0]
+        if not negative:
+            break
+        active = [i for i in active if i not in negative]
+    coefficients = [0.0] * len(costFeatures)
+    for i, c in zip(active, solution[1:]):
+        coefficients[i] = float(c)
+    return max(0.0, float(solution[0])), coefficients
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m blackrenderer.glyphComplexity",
+        description=__doc__.split("\n")[0],
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    reportParser = subparsers.add_parser(
+        "report", help="Report the complexity and predicted cost of color glyphs"
+    )
+    reportParser.add_argument("font", help="The font file")
+    reportParser.add_argument(
+        "glyphs", nargs="*", help="Glyph names to analyze (default: all)"
+    )
+    reportParser.add_argument("--model", help="A calibrated cost model JSON file")
+    reportParser.add_argument(
+        "--sort",
+        choices=["cost", "name"] + list(GlyphComplexity._fields[1:]),
+        default="cost",
+        help="The column to sort by, descending (default: cost)",
+    )
+    reportParser.add_argument(
+        "--top", type=int, help="Only report the N most expensive glyphs"
+    )
+    reportParser.add_argument("--json", action="store_true", help="Output JSON")
+
+    calibrateParser = subparsers.add_parser(
+        "calibrate", help="Calibrate a cost model from benchmark results"
+    )
+    calibrateParser.add_argument("model", help="The cost model JSON file to write")
+    calibrateParser.add_argument("results", nargs="+", help="Benchmark result files")
+    calibrateParser.add_argument(
+        "--stages", nargs="+", default=["traverse", "rasterize"]
+    )
+    calibrateParser.add_argument("--backend", default="skia")
+    args = parser.parse_args(args)
+
+    if args.command == "calibrate":
+        benchmarks = []
+        for path in args.results:
+            with open(path, encoding="utf-8") as f:
+                benchmarks.extend(json.load(f)["benchmarks"])
+        model = calibrateCostModel(benchmarks, args.stages, args.backend)
+        model.save(args.model)
+        for name, coefficient in model.coefficients.items():
+            print(f"{name}: {coefficient:.3g} s")
+        print(f"intercept: {model.intercept:.3g} s")
+        return 0
+
+    model = defaultCostModel if args.model is None else CostModel.load(args.model)
+    font = BlackRendererFont(args.font)
+    complexities = analyzeFont(font, args.glyphs or None)
+    rows = [(c, model.predict(c)) for c in complexities]
+    if args.sort == "cost":
+        rows.sort(key=lambda row: row[1], reverse=True)
+    elif args.sort == "name":
+        rows.sort(key=lambda row: row[0].glyphName)
+    else:
+        rows.sort(key=lambda row: getattr(row[0], args.sort), reverse=True)
+    if args.top is not None:
+        rows = rows[: args.top]
+    if args.json:
+        report = [dict(c._asdict(), predictedCost=cost) for c, cost in rows]
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        printReport(rows)
+    return 0
+
+
+def printReport(rows, file=None):
+    if file is None:
+        file = sys.stdout
+    nameWidth = max([len(c.glyphName) for c, _ in rows] + [5])
+    print(
+        f"{'glyph':<{nameWidth}} {'nodes':>7} {'depth':>5} {'points':>8} "
+        f"{'area':>10} {'comp':>5} {'grad':>5} {'var':>3} {'cost':>11}",
+        file=file,
+    )
+    for c, cost in rows:
+        print(
+            f"{c.glyphName:<{nameWidth}} {c.nodeCount:>7} {c.maxDepth:>5} "
+            f"{c.outlinePoints:>8} {c.fillArea:>10} {c.compositeCount:>5} "
+            f"{c.gradientCount:>5} "
+            f"{'yes' if c.isVariable else 'no':>3} {_formatTime(cost):>11}",
+            file=file,
+        )
+    totalCost = sum(cost for _, cost in rows)
+    print(f"\n{len(rows)} glyphs, {_formatTime(totalCost)} predicted total", file=file)
+
+
+def _formatTime(seconds):
+    if not math.isfinite(seconds):
+        return "n/a"
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    elif seconds >= 0.001:
+        return f"{seconds * 1000:.3f} ms"
+    return f"{seconds * 1_000_000:.1f} µs"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""A traversal engine for BlackRendererFont that uses HarfBuzz's paint API
+instead of walking the COLR table in Python. HarfBuzz instantiates variations
+and resolves PaintColrLayers and PaintColrGlyph natively, and reports the
+resulting paint operations through callbacks, which are translated to the
+same Canvas calls as the Python engine makes.
+
+This requires uharfbuzz 0.39 or later, for the paint API (uharfbuzz.PaintFuncs).
+Use it with BlackRendererFont(path, engine="harfbuzz").
+"""
+
+import math
+from typing import NamedTuple
+from fontTools.misc.transform import Identity, Transform
+from fontTools.ttLib.tables.otTables import CompositeMode, ExtendMode
+import uharfbuzz as hb
+from .font import (
+    _interpolate,
+    _interpolatePoints,
+    _normalizeColorLine,
+    _reduceThreeAnchorsToTwo,
+)
+
+
+hasPaintAPI = hasattr(hb, "PaintFuncs")
+
+# Paint tree node kinds
+TRANSFORM = 0
+CLIP_GLYPH = 1
+CLIP_RECTANGLE = 2
+GROUP = 3
+SOLID = 4
+LINEAR_GRADIENT = 5
+RADIAL_GRADIENT = 6
+SWEEP_GRADIENT = 7
+
+scopeKinds = {TRANSFORM, CLIP_GLYPH, CLIP_RECTANGLE, GROUP}
+
+
+class HarfBuzzPaintEngine:
+    def __init__(self, font):
+        if not hasPaintAPI:
+            raise ImportError(
+                f"the 'harfbuzz' engine needs a uharfbuzz version with the paint "
+                f"API; uharfbuzz {hb.__version__} does not have it"
+            )
+        self.font = font
+        self._paintFuncs = _getPaintFuncs()
+        # Color glyphs are painted with the font's colors, the foreground
+        # color is substituted when the paint tree is built
+        self._foreground = hb.Color(0, 0, 0, 255)
+
+    def drawGlyph(self, glyphName, canvas):
+        font = self.font
+        builder = _PaintTreeBuilder(font.currentPalette, font.textColor)
+        paletteIndex = 0
+        if font.palettes:
+            for paletteIndex, palette in enumerate(font.palettes):
+                if palette is font.currentPalette:
+                    break
+            else:
+                # Not one of the font's palettes: override all colors
+                builder.useCustomPalette = True
+                paletteIndex = 0
+        gid = font.ttFont.getGlyphID(glyphName)
+        font.hbFont.paint_glyph(
+            gid, self._paintFuncs, builder, paletteIndex, self._foreground
+        )
+        _PaintTreeDrawer(font, canvas).drawNodes(builder.root[2])
+
+
+class _Anchors(NamedTuple):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+
+
+class _PaintTreeBuilder:
+    # Collects the paint callbacks into a tree of [kind, arg, children]
+    # nodes. The tree is needed because a group's composite mode is only
+    # known when the group is popped, and because a clip glyph followed by
+    # a single fill is drawn as one Canvas call.
+
+    def __init__(self, palette, textColor):
+        self.palette = palette
+        self.textColor = textColor
+        self.useCustomPalette = False
+        self.root = [None, None, []]
+        self.stack = [self.root]
+
+    def push(self, kind, arg):
+        node = [kind, arg, []]
+        self.stack[-1][2].append(node)
+        self.stack.append(node)
+
+    def pop(self):
+        return self.stack.pop()
+
+    def add(self, kind, arg):
+        self.stack[-1][2].append((kind, arg, None))
+
+    def getColor(self, isForeground, color):
+        alpha = color.alpha / 255
+        if isForeground:
+            r, g, b, a = self.textColor
+            return r, g, b, a * alpha
+        return color.red / 255, color.green / 255, color.blue / 255, alpha
+
+    def getColorLine(self, colorLine):
+        colorStops = [
+            (stop.offset, self.getColor(stop.is_foreground, stop.color))
+            for stop in colorLine.color_stops
+        ]
+        return colorStops, ExtendMode(int(colorLine.extend))
+
+    def getCustomPaletteColor(self, colorIndex):
+        if not self.useCustomPalette:
+            return None
+        if self.palette is None or colorIndex >= len(self.palette):
+            r, g, b, a = self.textColor
+        else:
+            r, g, b, a = self.palette[colorIndex]
+        return hb.Color(*(round(v * 255) for v in (r, g, b, a)))
+
+
+def _pushTransform(xx, yx, xy, yy, dx, dy, builder):
+    # HarfBuzz pushes many identity transforms, store those as None
+    transform = (xx, yx, xy, yy, dx, dy)
+    builder.push(TRANSFORM, None if transform == Identity else Transform(*transform))
+
+
+def _popScope(builder):
+    builder.pop()
+
+
+def _pushClipGlyph(gid, builder):
+    builder.push(CLIP_GLYPH, gid)
+
+
+def _pushClipRectangle(xMin, yMin, xMax, yMax, builder):
+    builder.push(CLIP_RECTANGLE, (xMin, yMin, xMax, yMax))
+
+
+def _pushGroup(builder):
+    builder.push(GROUP, None)
+
+
+def _popGroup(mode, builder):
+    builder.pop()[1] = CompositeMode(int(mode))
+
+
+def _paintColor(color, isForeground, builder):
+    builder.add(SOLID, builder.getColor(isForeground, color))
+
+
+def _paintLinearGradient(colorLine, x0, y0, x1, y1, x2, y2, builder):
+    anchors = _Anchors(x0, y0, x1, y1, x2, y2)
+    builder.add(LINEAR_GRADIENT, (*builder.getColorLine(colorLine), anchors))
+
+
+def _paintRadialGradient(colorLine, x0, y0, r0, x1, y1, r1, builder):
+    circles = ((x0, y0), r0, (x1, y1), r1)
+    builder.add(RADIAL_GRADIENT, (*builder.getColorLine(colorLine), circles))
+
+
+def _paintSweepGradient(colorLine, centerX, centerY, startAngle, endAngle, builder):
+    angles = ((centerX, centerY), math.degrees(startAngle), math.degrees(endAngle))
+    builder.add(SWEEP_GRADIENT, (*builder.getColorLine(colorLine), angles))
+
+
+def _paintColorGlyph(gid, builder):
+    # Let HarfBuzz paint nested color glyphs itself
+    return False
+
+
+def _getCustomPaletteColor(colorIndex, builder):
+    return builder.getCustomPaletteColor(colorIndex)
+
+
+_paintFuncs = None
+
+
+def _getPaintFuncs():
+    global _paintFuncs
+    if _paintFuncs is None:
+        funcs = hb.PaintFuncs()
+        funcs.set_push_transform_func(_pushTransform)
+        funcs.set_pop_transform_func(_popScope)
+        funcs.set_push_clip_glyph_func(_pushClipGlyph)
+        funcs.set_push_clip_rectangle_func(_pushClipRectangle)
+        funcs.set_pop_clip_func(_popScope)
+        funcs.set_push_group_func(_pushGroup)
+        funcs.set_pop_group_func(_popGroup)
+        funcs.set_color_func(_paintColor)
+        funcs.set_linear_gradient_func(_paintLinearGradient)
+        funcs.set_radial_gradient_func(_paintRadialGradient)
+        funcs.set_sweep_gradient_func(_paintSweepGradient)
+        funcs.set_color_glyph_func(_paintColorGlyph)
+        funcs.set_custom_palette_color_func(_getCustomPaletteColor)
+        _paintFuncs = funcs
+    return _paintFuncs
+
+
+class _PaintTreeDrawer:
+    def __init__(self, font, canvas):
+        self.font = font
+        self.canvas = canvas
+
+    def drawNodes(self, nodes):
+        canvas = self.canvas
+        for kind, arg, children in nodes:
+            if kind == TRANSFORM:
+                if arg is None:
+                    self.drawNodes(children)
+                    continue
+                with canvas.savedState():
+                    canvas.transform(arg)
+                    self.drawNodes(children)
+            elif kind == CLIP_RECTANGLE:
+                # Like the Python engine, only use ClipBoxes for bounds
+                self.drawNodes(children)
+            elif kind == CLIP_GLYPH:
+                path = canvas.newPath()
+                self.font._drawGlyphIDOutline(arg, path)
+                fill = _getSingleFill(children)
+                if fill is not None:
+                    # Fill the clip path directly, like the Python engine
+                    fillKind, fillArg, transform = fill
+                    self.drawFill(fillKind, fillArg, path, transform)
+                else:
+                    with canvas.savedState():
+                        canvas.clipPath(path)
+                        self.drawNodes(children)
+            elif kind == GROUP:
+                with canvas.compositeMode(arg):
+                    self.drawNodes(children)
+            else:
+                # An unbounded fill, limited by the current clip only
+                self.drawFill(kind, arg, None, Identity)
+
+    def drawFill(self, kind, arg, path, transform):
+        canvas = self.canvas
+        if kind == SOLID:
+            canvas.drawPathSolid(path, arg)
+        elif kind == LINEAR_GRADIENT:
+            colorLine, extend, anchors = arg
+            minStop, maxStop, colorLine = _normalizeColorLine(colorLine)
+            pt1, pt2 = _reduceThreeAnchorsToTwo(anchors)
+            pt1, pt2 = (
+                _interpolatePoints(pt1, pt2, minStop),
+                _interpolatePoints(pt1, pt2, maxStop),
+            )
+            canvas.drawPathLinearGradient(path, colorLine, pt1, pt2, extend, transform)
+        elif kind == RADIAL_GRADIENT:
+            colorLine, extend, (startCenter, r0, endCenter, r1) = arg
+            minStop, maxStop, colorLine = _normalizeColorLine(colorLine)
+            startCenter, endCenter = (
+                _interpolatePoints(startCenter, endCenter, minStop),
+                _interpolatePoints(startCenter, endCenter, maxStop),
+            )
+            startRadius = _interpolate(r0, r1, minStop)
+            endRadius = _interpolate(r0, r1, maxStop)
+            canvas.drawPathRadialGradient(
+                path,
+                colorLine,
+                startCenter,
+                startRadius,
+                endCenter,
+                endRadius,
+                extend,
+                transform,
+            )
+        elif kind == SWEEP_GRADIENT:
+            colorLine, extend, (center, startAngle, endAngle) = arg
+            minStop, maxStop, colorLine = _normalizeColorLine(colorLine)
+            startAngle, endAngle = (
+                _interpolate(startAngle, endAngle, minStop),
+                _interpolate(startAngle, endAngle, maxStop),
+            )
+            canvas.drawPathSweepGradient(
+                path, colorLine, center, startAngle, endAngle, extend, transform
+            )
+
+
+def _getSingleFill(nodes):
+    # If 'nodes' consists of nested transforms around a single fill, return
+    # a (kind, arg, transform) tuple for that fill, else return None
+    transform = Identity
+    while len(nodes) == 1:
+        kind, arg, children = nodes[0]
+        if kind == TRANSFORM:
+            if arg is not None:
+                transform = transform.transform(arg)
+            nodes = children
+        elif kind == CLIP_RECTANGLE:
+            nodes = children
+        elif kind in scopeKinds:
+            return None
+        else:
+            return kind, arg, transform
+    return None
@@ -0,0 +1,255 @@
+"""Ahead-of-time outline extraction for a whole font.
+
+An OutlineStore holds the outlines of many glyphs of a font, at one location,
+packed into a single verbs array and a single points array, with per-glyph
+offsets into both. It is built in one go with OutlineStore.fromFont(), and can
+be serialized with toBytes() and fromBytes(), or save() and load().
+
+Assign a store to BlackRendererFont.outlineStore to have drawGlyph(),
+getPaintBounds() and GlyphCache take outlines from it instead of from
+HarfBuzz. Glyphs that are not in the store, and locations other than the
+store's, still go through HarfBuzz.
+"""
+
+import struct
+import numpy as np
+from .arrayPath import ArrayPath, getGlyphOutline, pointsBounds, replayOutline
+from .font import PAINT_NAMES
+
+
+class OutlineStore:
+    def __init__(self, glyphIDs, verbOffsets, pointOffsets, verbs, points, coords):
+        """'glyphIDs' is a sorted array of the glyph IDs in the store.
+        'verbOffsets' and 'pointOffsets' have one more item than 'glyphIDs':
+        the outline of glyphIDs[i] is verbs[verbOffsets[i]:verbOffsets[i + 1]],
+        and similarly for points. 'coords' is the normalized location of the
+        outlines, as returned by hbFont.get_var_coords_normalized().
+        """
+        self.glyphIDs = glyphIDs
+        self.verbOffsets = verbOffsets
+        self.pointOffsets = pointOffsets
+        self.verbs = verbs
+        self.points = points
+        self.normalizedCoords = tuple(coords)
+        # The arrays are shared with all ArrayPath objects we hand out
+        for array in (verbs, points):
+            if array.flags.writeable:
+                array.flags.writeable = False
+        self._indices = {glyphID: i for i, glyphID in enumerate(glyphIDs.tolist())}
+
+    @classmethod
+    def fromFont(cls, font, glyphNames=None, *, location=None):
+        """Extract the outlines of 'glyphNames' from a BlackRendererFont, or
+        of all glyphs if 'glyphNames' is None. If 'location' is given, the
+        outlines are extracted at that location, else at the current location.
+        """
+        if glyphNames is None:
+            glyphIDs = list(range(len(font.glyphNames)))
+        else:
+            glyphIDs = sorted({font.ttFont.getGlyphID(name) for name in glyphNames})
+        verbs = []
+        coords = []
+        verbOffsets = [0]
+        pointOffsets = [0]
+        with font._pushLocation(location):
+            hbFont = font.hbFont
+            for glyphID in glyphIDs:
+                glyphVerbs, glyphCoords = getGlyphOutline(hbFont, glyphID)
+                verbs += glyphVerbs
+                coords += glyphCoords
+                verbOffsets.append(len(verbs))
+                pointOffsets.append(len(coords) // 2)
+            normalizedCoords = hbFont.get_var_coords_normalized()
+        return cls(
+            np.array(glyphIDs, dtype=np.uint32),
+            np.array(verbOffsets, dtype=np.uint32),
+            np.array(pointOffsets, dtype=np.uint32),
+            np.array(verbs, dtype=np.uint8),
+            np.array(coords, dtype=np.float64).reshape((-1, 2)),
+            normalizedCoords,
+        )
+
+    def __repr__(self):
+        return (
+            f"OutlineStore(<{len(self.glyphIDs)} glyphs, {len(self.verbs)} verbs, "
+            f"{len(self.points)} points>)"
+        )
+
+    def __len__(self):
+        return len(self.glyphIDs)
+
+    def __contains__(self, glyphID):
+        return glyphID in self._indices
+
+    def getArrays(self, glyphID):
+        """Return a (verbs, points) tuple of array views for the glyph, or
+        None if the glyph is not in the store.
+        """
+        index = self._indices.get(glyphID)
+        if index is None:
+            return None
+        verbOffsets = self.verbOffsets
+        pointOffsets = self.pointOffsets
+        verbStart = verbOffsets[index]
+        verbEnd = verbOffsets[index + 1]
+        pointStart = pointOffsets[index]
+        pointEnd = pointOffsets[index + 1]
+        return self.verbs[verbStart:verbEnd], self.points[pointStart:pointEnd]
+
+    def getPath(self, glyphID):
+        """Return the outline of the glyph as an ArrayPath, without copying,
+        or None if the glyph is not in the store.
+        """
+        arrays = self.getArrays(glyphID)
+        if arrays is None:
+            return None
+        return ArrayPath(*arrays)
+
+    def getBounds(self, glyphID):
+        """Return the bounding box of all points of the glyph, including
+        off-curve points. Returns None for empty glyphs, or if the glyph is
+        not in the store.
+        """
+        arrays = self.getArrays(glyphID)
+        if arrays is None:
+            return None
+        return pointsBounds(arrays[1])
+
+    def drawOutline(self, glyphID, path):
+        """Append the outline of the glyph to 'path', which can be an
+        ArrayPath, a backend path with an appendOutline() method, or any pen.
+        Returns False if the glyph is not in the store.
+        """
+        arrays = self.getArrays(glyphID)
+        if arrays is None:
+            return False
+        verbs, points = arrays
+        appendArrays = getattr(path, "appendArrays", None)
+        if appendArrays is not None:
+            appendArrays(verbs, points)
+            return True
+        verbs = verbs.tolist()
+        coords = points.ravel().tolist()
+        appendOutline = getattr(path, "appendOutline", None)
+        if appendOutline is not None:
+            appendOutline(verbs, coords)
+        else:
+            replayOutline(verbs, coords, path)
+        return True
+
+    def toBytes(self):
+        """Return the store in a compact binary form, see fromBytes()."""
+        return _encodeStore(self)
+
+    @classmethod
+    def fromBytes(cls, data):
+        """Construct a store from the result of toBytes(). The arrays refer
+        to 'data' without copying.
+        """
+        return _decodeStore(cls, data)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.toBytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            return cls.fromBytes(f.read())
+
+
+def getCOLRLayerGlyphNames(font):
+    """Return the set of names of all glyphs that a BlackRendererFont uses as
+    outlines in its COLR table: the COLRv0 layer glyphs, and the glyphs of all
+    PaintGlyph tables.
+    """
+    glyphNames = set()
+    for layers in font.colrV0Glyphs.values():
+        for layer in layers:
+            glyphNames.add(layer.name)
+    if not font.colrV1Glyphs:
+        return glyphNames
+    stack = [font.colrV1Glyphs[name].Paint for name in font.colrV1GlyphNames]
+    # Keep the visited paints alive, so their ids can't be reused
+    visited = {}
+    while stack:
+        paint = stack.pop()
+        if id(paint) in visited:
+            continue
+        visited[id(paint)] = paint
+        paintName = PAINT_NAMES[paint.Format]
+        if paintName == "PaintColrLayers":
+            firstIndex = paint.FirstLayerIndex
+            lastIndex = firstIndex + paint.NumLayers
+            stack.extend(font.colrLayersV1.Paint[firstIndex:lastIndex])
+        elif paintName == "PaintComposite":
+            stack.append(paint.SourcePaint)
+            stack.append(paint.BackdropPaint)
+        elif paintName != "PaintColrGlyph":
+            if paintName == "PaintGlyph":
+                glyphNames.add(paint.Glyph)
+            childPaint = getattr(paint, "Paint", None)
+            if childPaint is not None:
+                stack.append(childPaint)
+    return glyphNames
+
+
+# Binary format: a header, followed by the normalized location, the glyph IDs,
+# the verb and point offsets, the points and the verbs. All numbers are little
+# endian.
+
+_magic = b"BROS"
+_formatVersion = 1
+_headerFormat = "<4sHHIII"
+_headerSize = struct.calcsize(_headerFormat)
+
+
+def _encodeStore(store):
+    numGlyphs = len(store.glyphIDs)
+    coords = store.normalizedCoords
+    return b"".join(
+        [
+            struct.pack(
+                _headerFormat,
+                _magic,
+                _formatVersion,
+                len(coords),
+                numGlyphs,
+                len(store.verbs),
+                len(store.points),
+            ),
+            struct.pack(f"<{len(coords)}d", *coords),
+            store.glyphIDs.astype("<u4").tobytes(),
+            store.verbOffsets.astype("<u4").tobytes(),
+            store.pointOffsets.astype("<u4").tobytes(),
+            store.points.astype("<f8").tobytes(),
+            store.verbs.tobytes(),
+        ]
+    )
+
+
+def _decodeStore(cls, data):
+    if len(data) < _headerSize or data[:4] != _magic:
+        raise ValueError("not an outline store")
+    _, version, numCoords, numGlyphs, numVerbs, numPoints = struct.unpack_from(
+        _headerFormat, data
+    )
+    if version != _formatVersion:
+        raise ValueError(f"unsupported outline store format version: {version}")
+    size = _headerSize + 8 * numCoords + 4 * (3 * numGlyphs + 2)
+    size += 16 * numPoints + numVerbs
+    if len(data) != size:
+        raise ValueError("outline store data has the wrong size")
+    pos = _headerSize
+    coords = struct.unpack_from(f"<{numCoords}d", data, pos)
+    pos += 8 * numCoords
+    glyphIDs = np.frombuffer(data, "<u4", numGlyphs, pos)
+    pos += 4 * numGlyphs
+    verbOffsets = np.frombuffer(data, "<u4", numGlyphs + 1, pos)
+    pos += 4 * (numGlyphs + 1)
+    pointOffsets = np.frombuffer(data, "<u4", numGlyphs + 1, pos)
+    pos += 4 * (numGlyphs + 1)
+    points = np.frombuffer(data, "<f8", 2 * numPoints, pos).reshape((-1, 2))
+    pos += 16 * numPoints
+    verbs = np.frombuffer(data, np.uint8, numVerbs, pos)
+    return cls(glyphIDs, verbOffsets, pointOffsets, verbs, points, coords)
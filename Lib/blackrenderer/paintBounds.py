@@ -0,0 +1,198 @@
+from fontTools.misc.arrayTools import calcBounds
+from fontTools.misc.transform import Identity
+from fontTools.ttLib.tables.otTables import CompositeMode
+from .arrayPath import ArrayPath, pointsBounds, transformPoints
+from .font import PAINT_TRANSFORMS
+
+
+# Bounds are either None (nothing is painted), a (xMin, yMin, xMax, yMax)
+# tuple, or UNBOUNDED, for paints that fill whatever the current clip is.
+inf = float("inf")
+UNBOUNDED = (-inf, -inf, inf, inf)
+
+
+def _sourceBounds(sourceBounds, backdropBounds):
+    return sourceBounds
+
+
+def _backdropBounds(sourceBounds, backdropBounds):
+    return backdropBounds
+
+
+def _emptyBounds(sourceBounds, backdropBounds):
+    return None
+
+
+# How the bounds of a PaintComposite relate to its source and backdrop bounds.
+# Modes not listed here produce the union of both.
+_compositeBoundsFuncs = {
+    CompositeMode.CLEAR: _emptyBounds,
+    CompositeMode.SRC: _sourceBounds,
+    CompositeMode.DEST: _backdropBounds,
+    CompositeMode.SRC_IN: lambda s, b: sectBounds(s, b),
+    CompositeMode.DEST_IN: lambda s, b: sectBounds(s, b),
+    CompositeMode.SRC_OUT: _sourceBounds,
+    CompositeMode.DEST_OUT: _backdropBounds,
+    CompositeMode.SRC_ATOP: _backdropBounds,
+    CompositeMode.DEST_ATOP: _sourceBounds,
+}
+
+
+class PaintBoundsCalculator:
+    """Compute tight bounds for COLRv1 glyphs from their paint graph.
+
+    Bounds are computed in glyph space: transforms are applied to the glyph
+    outlines rather than to their bounding boxes. Intermediate results are
+    memoized per paint node, transform and location, so shared subgraphs
+    (PaintColrGlyph, reused layers) are only evaluated once.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self._recursionCheck = set()
+        self._paintCache = {}
+        self._outlineCache = {}
+
+    def calcGlyphBounds(self, glyphName):
+        self._locationKey = tuple(self.font.hbFont.get_var_coords_normalized())
+        bounds = self._calcColrGlyphBounds(glyphName, Identity)
+        if bounds == UNBOUNDED:
+            # The glyph fills everything, and has no ClipBox, else the bounds
+            # would have been clipped; fall back to the base glyph's outline
+            bounds = pointsBounds(self._getOutline(glyphName).points)
+        return bounds
+
+    def _calcColrGlyphBounds(self, glyphName, transform):
+        if glyphName in self._recursionCheck:
+            raise RecursionError(f"Glyph '{glyphName}' references itself")
+        glyph = self.font.colrV1Glyphs[glyphName]
+        self._recursionCheck.add(glyphName)
+        try:
+            bounds = self._calcPaintBounds(glyph.Paint, transform)
+        finally:
+            self._recursionCheck.remove(glyphName)
+        clipBox = self.font._getClipBox(glyphName)
+        if clipBox is not None and bounds is not None:
+            bounds = sectBounds(bounds, transformBounds(clipBox, transform))
+        return bounds
+
+    def _calcPaintBounds(self, paint, transform):
+        cacheKey = id(paint), tuple(transform), self._locationKey
+        cached = self._paintCache.get(cacheKey)
+        if cached is not None:
+            bounds = cached[1]
+        else:
+            paintName, resolvedPaint = self.font._resolvePaint(paint)
+            if paintName is None:
+                bounds = None
+            elif paintName in PAINT_TRANSFORMS:
+                paintTransform = PAINT_TRANSFORMS[paintName](resolvedPaint)
+                bounds = self._calcPaintBounds(
+                    resolvedPaint.Paint, transform.transform(paintTransform)
+                )
+            else:
+                boundsHandler = getattr(self, "_bounds" + paintName)
+                bounds = boundsHandler(resolvedPaint, transform)
+            # Keep a reference to the paint, so its id can't be reused
+            self._paintCache[cacheKey] = paint, bounds
+        return bounds
+
+    def _boundsPaintColrLayers(self, paint, transform):
+        layers = self.font.colrLayersV1.Paint
+        s = paint.FirstLayerIndex
+        bounds = None
+        for i in range(s, s + paint.NumLayers):
+            bounds = unionBounds(bounds, self._calcPaintBounds(layers[i], transform))
+        return bounds
+
+    def _boundsPaintSolid(self, paint, transform):
+        return UNBOUNDED
+
+    _boundsPaintLinearGradient = _boundsPaintSolid
+    _boundsPaintRadialGradient = _boundsPaintSolid
+    _boundsPaintSweepGradient = _boundsPaintSolid
+
+    def _boundsPaintGlyph(self, paint, transform):
+        bounds = self._calcPaintBounds(paint.Paint, transform)
+        if bounds is None:
+            return None
+        points = self._getOutline(paint.Glyph).points
+        if transform != Identity:
+            points = transformPoints(points, transform)
+        return sectBounds(bounds, pointsBounds(points))
+
+    def _boundsPaintColrGlyph(self, paint, transform):
+        return self._calcColrGlyphBounds(paint.Glyph, transform)
+
+    def _boundsPaintComposite(self, paint, transform):
+        sourceBounds = self._calcPaintBounds(paint.SourcePaint, transform)
+        backdropBounds = self._calcPaintBounds(paint.BackdropPaint, transform)
+        boundsFunc = _compositeBoundsFuncs.get(paint.CompositeMode, unionBounds)
+        return boundsFunc(sourceBounds, backdropBounds)
+
+    def _boundsPaintLocation(self, paint, transform):
+        numAxes = len(self.font.axisTags)
+        location = {
+            self.font.axisTags[coord.AxisIndex]: coord.AxisValue
+            for coord in paint.Coordinate
+            if coord.AxisIndex < numAxes
+        }
+        savedLocationKey = self._locationKey
+        with self.font._pushNormalizedLocation(location):
+            self._locationKey = tuple(self.font.hbFont.get_var_coords_normalized())
+            bounds = self._calcPaintBounds(paint.Paint, transform)
+        self._locationKey = savedLocationKey
+        return bounds
+
+    def _getOutline(self, glyphName):
+        outlineStore = self.font.outlineStore
+        if (
+            outlineStore is not None
+            and outlineStore.normalizedCoords == self._locationKey
+        ):
+            path = outlineStore.getPath(self.font.ttFont.getGlyphID(glyphName))
+            if path is not None:
+                return path
+        cacheKey = glyphName, self._locationKey
+        path = self._outlineCache.get(cacheKey)
+        if path is None:
+            path = ArrayPath()
+            self.font._drawGlyphOutline(glyphName, path)
+            self._outlineCache[cacheKey] = path
+        return path
+
+
+def sectBounds(bounds1, bounds2):
+    if bounds1 is None or bounds2 is None:
+        return None
+    xMin = max(bounds1[0], bounds2[0])
+    yMin = max(bounds1[1], bounds2[1])
+    xMax = min(bounds1[2], bounds2[2])
+    yMax = min(bounds1[3], bounds2[3])
+    if xMin > xMax or yMin > yMax:
+        return None
+    return xMin, yMin, xMax, yMax
+
+
+def unionBounds(bounds1, bounds2):
+    if bounds1 is None:
+        return bounds2
+    if bounds2 is None:
+        return bounds1
+    return (
+        min(bounds1[0], bounds2[0]),
+        min(bounds1[1], bounds2[1]),
+        max(bounds1[2], bounds2[2]),
+        max(bounds1[3], bounds2[3]),
+    )
+
+
+def transformBounds(bounds, transform):
+    if transform == Identity:
+        return bounds
+    xMin, yMin, xMax, yMax = bounds
+    return calcBounds(
+        transform.transformPoints(
+            [(xMin, yMin), (xMin, yMax), (xMax, yMin), (xMax, yMax)]
+        )
+    )
@@ -0,0 +1,106 @@
+from .font import PAINT_NAMES, PAINT_VAR_MAPPING
+
+
+class PaintGraphWalker:
+    """Base class for analyses that compute a result per node of the COLRv1
+    paint graphs of a BlackRendererFont, from the results of its children,
+    without drawing anything.
+
+    Paints are shared between glyphs and layers, so results are memoized per
+    Paint (by identity) and per glyph: walking a glyph takes time proportional
+    to the size of its paint graph, not to the number of nodes visited when
+    drawing it. Paints and glyphs that (indirectly) contain themselves raise
+    RecursionError.
+
+    Subclasses implement visitPaint(), and call walkChild() from it for the
+    children that iterChildren() yields. Extra arguments to walkGlyph() and
+    walkPaint() are passed on to visitPaint() and reuseResult(), but they
+    must not affect the result, or the memoized results would be wrong.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self._paintCache = {}
+        self._glyphCache = {}
+        self._activePaints = set()
+        self._activeGlyphs = set()
+
+    def walkGlyph(self, glyphName, *args):
+        result = self._glyphCache.get(glyphName)
+        if result is not None:
+            self.reuseResult(result, *args)
+            return result
+        if glyphName in self._activeGlyphs:
+            raise RecursionError(f"Glyph '{glyphName}' references itself")
+        self._activeGlyphs.add(glyphName)
+        try:
+            result = self.walkPaint(self.font.colrV1Glyphs[glyphName].Paint, *args)
+        finally:
+            self._activeGlyphs.remove(glyphName)
+        self._glyphCache[glyphName] = result
+        return result
+
+    def walkPaint(self, paint, *args):
+        paintID = id(paint)
+        cached = self._paintCache.get(paintID)
+        if cached is not None:
+            result = cached[1]
+            self.reuseResult(result, *args)
+            return result
+        paintName = getPaintName(paint)
+        if paintID in self._activePaints:
+            raise RecursionError(f"{paintName} table references itself")
+        self._activePaints.add(paintID)
+        try:
+            result = self.visitPaint(paint, paintName, *args)
+        finally:
+            self._activePaints.remove(paintID)
+        # Keep a reference to the paint, so its id can't be reused
+        self._paintCache[paintID] = paint, result
+        return result
+
+    def walkChild(self, child, *args):
+        # 'child' is a Paint or a glyph name, as yielded by iterChildren()
+        if isinstance(child, str):
+            return self.walkGlyph(child, *args)
+        return self.walkPaint(child, *args)
+
+    def iterChildren(self, paint, paintName):
+        """Yield the child Paints of 'paint', or the glyph name for
+        PaintColrGlyph.
+        """
+        if paintName == "PaintColrLayers":
+            layers = self.font.colrLayersV1.Paint
+            start = paint.FirstLayerIndex
+            end = start + paint.NumLayers
+            yield from layers[start:end]
+        elif paintName == "PaintColrGlyph":
+            yield paint.Glyph
+        elif paintName == "PaintComposite":
+            yield paint.BackdropPaint
+            yield paint.SourcePaint
+        elif paintName is not None and hasattr(paint, "Paint"):
+            yield paint.Paint
+
+    def visitPaint(self, paint, paintName, *args):
+        """Return the result for 'paint'. 'paintName' is the name of its
+        non-variable format, or None for unknown formats.
+        """
+        raise NotImplementedError()
+
+    def reuseResult(self, result, *args):
+        """Called when a memoized result is used again, with the arguments of
+        that use.
+        """
+        pass
+
+
+def getPaintName(paint):
+    """Return the name of the non-variable format of 'paint', for example
+    "PaintGlyph" for PaintGlyph and "PaintSolid" for PaintVarSolid, or None for
+    unknown formats.
+    """
+    paintFormat = paint.Format
+    if paintFormat in PAINT_VAR_MAPPING:
+        paintFormat = PAINT_VAR_MAPPING[paintFormat].value
+    return PAINT_NAMES.get(paintFormat)
@@ -0,0 +1,356 @@
+"""An optimization pass over compiled glyphs.
+
+optimizeRecording() takes a RecordingCanvas, as filled by
+BlackRendererFont.drawGlyph(), and returns an equivalent RecordingCanvas with
+fewer draw calls, state changes and offscreen layers:
+
+- Gradients whose color stops all have the same color become solid fills
+- Fills that are fully transparent are removed
+- Composite layers in SRC_OVER mode are drawn without an offscreen layer,
+  unless they contain other composite layers; layers in DEST mode are removed
+- Saved states that don't change the state, or that end together with their
+  enclosing state, are merged into it; saved states that draw nothing are
+  removed
+- Consecutive transforms are folded into one matrix, and transforms and clips
+  that aren't followed by any drawing are removed
+- Consecutive solid fills with the same color are merged into one fill, if
+  their bounds don't overlap
+
+With 'foldTransforms' (the default), transforms are applied to the paths at
+compile time as well, so the backends receive positioned paths and no
+transforms at all. The transforms are merged into the gradient transforms of
+gradient fills; for gradients, the geometry itself is transformed when
+possible, leaving an identity gradient transform. A recording is made at a
+single location, so all its transforms are static.
+
+The result draws the same pixels as the original, except that merged fills
+can differ by antialiasing rounding where they share a pixel.
+"""
+
+import math
+from fontTools.misc.transform import Identity, Transform
+from fontTools.ttLib.tables.otTables import CompositeMode
+from .arrayPath import ArrayPath
+from .backends.recording import (
+    BEGIN_COMPOSITE,
+    CLIP,
+    DRAW_LINEAR_GRADIENT,
+    DRAW_RADIAL_GRADIENT,
+    DRAW_SOLID,
+    DRAW_SWEEP_GRADIENT,
+    END_COMPOSITE,
+    RESTORE,
+    SAVE,
+    TRANSFORM,
+    RecordingCanvas,
+    _drawMethodNames,
+)
+
+
+_stateOps = {TRANSFORM, CLIP}
+
+# Composite modes for which compositing an empty layer changes the backdrop
+_clearingModes = {
+    CompositeMode.CLEAR,
+    CompositeMode.SRC,
+    CompositeMode.SRC_IN,
+    CompositeMode.DEST_IN,
+    CompositeMode.SRC_OUT,
+    CompositeMode.DEST_ATOP,
+}
+
+
+def optimizeRecording(recording, *, foldTransforms=True):
+    """Return an optimized copy of 'recording', see the module docstring."""
+    nodes = _buildTree(recording.ops, recording.paths)
+    if foldTransforms:
+        nodes = _TransformFolder().foldNodes(nodes, Identity)
+    nodes = _optimizeNodes(nodes, False)
+    optimized = RecordingCanvas()
+    _drawNodes(nodes, optimized)
+    return optimized
+
+
+class _Group:
+    # A SAVE/RESTORE or BEGIN_COMPOSITE/END_COMPOSITE pair and its content
+    __slots__ = ("opCode", "compositeMode", "children")
+
+    def __init__(self, opCode, compositeMode):
+        self.opCode = opCode
+        self.compositeMode = compositeMode
+        self.children = []
+
+
+def _buildTree(ops, paths):
+    # Return the ops as a list of nodes: _Group objects, and op tuples that
+    # contain the paths themselves rather than path indices
+    root = []
+    stack = [root]
+    for op in ops:
+        opCode = op[0]
+        if opCode == SAVE or opCode == BEGIN_COMPOSITE:
+            group = _Group(opCode, op[1] if opCode == BEGIN_COMPOSITE else None)
+            stack[-1].append(group)
+            stack.append(group.children)
+        elif opCode == RESTORE or opCode == END_COMPOSITE:
+            stack.pop()
+        elif opCode == TRANSFORM:
+            stack[-1].append(op)
+        else:
+            pathIndex = op[1]
+            path = None if pathIndex is None else paths[pathIndex]
+            stack[-1].append((opCode, path, *op[2:]))
+    return root
+
+
+def _drawNodes(nodes, canvas):
+    for node in nodes:
+        if isinstance(node, _Group):
+            if node.opCode == SAVE:
+                context = canvas.savedState()
+            else:
+                context = canvas.compositeMode(node.compositeMode)
+            with context:
+                _drawNodes(node.children, canvas)
+        elif node[0] == TRANSFORM:
+            canvas.transform(node[1])
+        elif node[0] == CLIP:
+            canvas.clipPath(node[1])
+        else:
+            opCode, *args = node
+            getattr(canvas, _drawMethodNames[opCode])(*args)
+
+
+class _TransformFolder:
+    def __init__(self):
+        # Paths that are used more than once are only transformed once per
+        # transform, so they stay shared
+        self._paths = {}
+
+    def foldNodes(self, nodes, transform):
+        # Return 'nodes' with 'transform' applied to all paths and gradients
+        result = []
+        for node in nodes:
+            if isinstance(node, _Group):
+                node.children = self.foldNodes(node.children, transform)
+                result.append(node)
+            elif node[0] == TRANSFORM:
+                transform = transform.transform(node[1])
+                if _isSingular(transform):
+                    # Can't be applied to gradients: let the backend do it
+                    result.append((TRANSFORM, tuple(transform)))
+                    transform = Identity
+            elif transform == Identity:
+                result.append(node)
+            elif node[0] == CLIP:
+                result.append((CLIP, self.transformPath(node[1], transform)))
+            else:
+                opCode, path, *args = node
+                path = self.transformPath(path, transform)
+                if opCode != DRAW_SOLID:
+                    args = _transformGradient(opCode, args, transform)
+                result.append((opCode, path, *args))
+        return result
+
+    def transformPath(self, path, transform):
+        if path is None:
+            return None
+        key = id(path), tuple(transform)
+        transformedPath = self._paths.get(key)
+        if transformedPath is None:
+            transformedPath = path.transformed(transform)
+            # Keep 'path' alive, so its id can't be reused
+            self._paths[key] = transformedPath, path
+        else:
+            transformedPath, _ = transformedPath
+        return transformedPath
+
+
+def _isSingular(transform):
+    xx, yx, xy, yy, dx, dy = transform
+    return xx * yy - xy * yx == 0
+
+
+def _transformGradient(opCode, args, transform):
+    *geometry, extendMode, gradientTransform = args
+    gradientTransform = transform.transform(gradientTransform)
+    xx, yx, xy, yy, dx, dy = gradientTransform
+    isTranslateScale = xx == yy and xx > 0 and yx == 0 and xy == 0
+    isSimilarity = (
+        isTranslateScale
+        or (math.isclose(xx, yy) and math.isclose(yx, -xy))
+        or (math.isclose(xx, -yy) and math.isclose(yx, xy))
+    )
+    if opCode == DRAW_LINEAR_GRADIENT and isSimilarity:
+        # Perpendicularity is preserved, so we can transform the points
+        colorLine, pt1, pt2 = geometry
+        pt1 = gradientTransform.transformPoint(pt1)
+        pt2 = gradientTransform.transformPoint(pt2)
+        geometry = colorLine, pt1, pt2
+        gradientTransform = Identity
+    elif opCode == DRAW_RADIAL_GRADIENT and isSimilarity:
+        # Circles stay circles
+        colorLine, startCenter, startRadius, endCenter, endRadius = geometry
+        scale = math.hypot(xx, yx)
+        geometry = (
+            colorLine,
+            gradientTransform.transformPoint(startCenter),
+            startRadius * scale,
+            gradientTransform.transformPoint(endCenter),
+            endRadius * scale,
+        )
+        gradientTransform = Identity
+    elif opCode == DRAW_SWEEP_GRADIENT and isTranslateScale:
+        # Angles are only preserved without rotation or reflection
+        colorLine, center, startAngle, endAngle = geometry
+        center = gradientTransform.transformPoint(center)
+        geometry = colorLine, center, startAngle, endAngle
+        gradientTransform = Identity
+    return (*geometry, extendMode, gradientTransform)
+
+
+def _optimizeNodes(nodes, endsScope):
+    # Optimize a list of sibling nodes. If 'endsScope' is True, the state is
+    # restored right after the last node. That is not the case at the end of
+    # a composite layer: not all backends restore the state when it ends.
+    result = []
+    for node in nodes:
+        if not isinstance(node, _Group):
+            if node[0] not in _stateOps:
+                node = _optimizeFill(node)
+                if node is None:
+                    continue
+            result.append(node)
+            continue
+        node.children = _optimizeNodes(node.children, node.opCode == SAVE)
+        if node.opCode == BEGIN_COMPOSITE:
+            compositeMode = node.compositeMode
+            if compositeMode == CompositeMode.DEST:
+                continue
+            if not _drawsAnything(node.children):
+                if compositeMode not in _clearingModes:
+                    continue
+            elif compositeMode == CompositeMode.SRC_OVER:
+                # Drawing into a SRC_OVER layer and compositing it onto the
+                # backdrop is the same as drawing onto the backdrop, as long
+                # as the layer doesn't contain other composite layers
+                if not _hasCompositeLayers(node.children):
+                    node.opCode = SAVE
+        if node.opCode == SAVE:
+            if not _drawsAnything(node.children):
+                continue
+            if not any(_isStateOp(child) for child in node.children):
+                result.extend(node.children)
+                continue
+        result.append(node)
+
+    if endsScope:
+        if result and isinstance(result[-1], _Group) and result[-1].opCode == SAVE:
+            result.extend(result.pop().children)
+        # State changes at the end of a scope have no effect
+        while result and _isStateOp(result[-1]):
+            result.pop()
+    return _mergeSolidFills(_foldTransforms(result))
+
+
+def _isStateOp(node):
+    return not isinstance(node, _Group) and node[0] in _stateOps
+
+
+def _drawsAnything(nodes):
+    # Groups that draw nothing have been removed already
+    return any(isinstance(node, _Group) or node[0] not in _stateOps for node in nodes)
+
+
+def _hasCompositeLayers(nodes):
+    for node in nodes:
+        if isinstance(node, _Group):
+            if node.opCode == BEGIN_COMPOSITE or _hasCompositeLayers(node.children):
+                return True
+    return False
+
+
+def _foldTransforms(nodes):
+    result = []
+    for node in nodes:
+        if not _isStateOp(node) or node[0] != TRANSFORM:
+            result.append(node)
+            continue
+        transform = Transform(*node[1])
+        if result and _isStateOp(result[-1]) and result[-1][0] == TRANSFORM:
+            transform = Transform(*result.pop()[1]).transform(transform)
+        if transform != Identity:
+            result.append((TRANSFORM, tuple(transform)))
+    return result
+
+
+def _mergeSolidFills(nodes):
+    result = []
+    runBounds = []
+    for node in nodes:
+        if isinstance(node, _Group) or node[0] != DRAW_SOLID or node[1] is None:
+            result.append(node)
+            runBounds = []
+            continue
+        bounds = node[1].bounds
+        previous = result[-1] if result else None
+        if (
+            runBounds
+            and previous[2] == node[2]
+            and not any(_boundsOverlap(bounds, b) for b in runBounds)
+        ):
+            # The paths don't overlap, so they can be filled in one go
+            result[-1] = (DRAW_SOLID, ArrayPath.concat([previous[1], node[1]]), node[2])
+            runBounds.append(bounds)
+        else:
+            result.append(node)
+            runBounds = [bounds]
+    return result
+
+
+def _boundsOverlap(bounds1, bounds2):
+    if bounds1 is None or bounds2 is None:
+        return False
+    xMin1, yMin1, xMax1, yMax1 = bounds1
+    xMin2, yMin2, xMax2, yMax2 = bounds2
+    return xMin1 <= xMax2 and xMin2 <= xMax1 and yMin1 <= yMax2 and yMin2 <= yMax1
+
+
+def _optimizeFill(op):
+    # Return an equivalent fill op, or None if 'op' doesn't draw anything
+    opCode = op[0]
+    if opCode != DRAW_SOLID:
+        color = _getUniformColor(op)
+        if color is None:
+            return op
+        op = (DRAW_SOLID, op[1], color)
+    if op[2][3] == 0:
+        return None
+    return op
+
+
+def _getUniformColor(op):
+    # If a gradient op fills its whole area with a single color, return that
+    # color, else return None
+    opCode, path, colorLine, *geometry, extendMode, gradientTransform = op
+    color = colorLine[0][1]
+    if any(stopColor != color for stop, stopColor in colorLine):
+        return None
+    xx, yx, xy, yy, dx, dy = gradientTransform
+    if xx * yy - xy * yx == 0:
+        return None
+    if opCode == DRAW_LINEAR_GRADIENT:
+        pt1, pt2 = geometry
+        if pt1 == pt2:
+            return None
+    elif opCode == DRAW_RADIAL_GRADIENT:
+        # Only if one circle contains the other is the whole plane covered
+        (x0, y0), r0, (x1, y1), r1 = geometry
+        distance = math.hypot(x1 - x0, y1 - y0)
+        if (distance == 0 and r0 == r1) or distance + min(r0, r1) > max(r0, r1):
+            return None
+    elif opCode == DRAW_SWEEP_GRADIENT:
+        center, startAngle, endAngle = geometry
+        if startAngle == endAngle:
+            return None
+    return color
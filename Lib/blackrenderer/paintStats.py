@@ -0,0 +1,246 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import sys
+import time
+from typing import NamedTuple
+from .backends.base import Canvas
+from .trace import TracingCanvas
+
+
+class PaintStatsEntry(NamedTuple):
+    count: int
+    selfTime: float
+    cumulativeTime: float
+
+
+class CallStatsEntry(NamedTuple):
+    count: int
+    time: float
+
+
+class PaintStats:
+    """Collects call counts and timings of BlackRendererFont.drawGlyph()
+    calls, per glyph, per Paint format and per Canvas method.
+
+    Instrumentation is opt-in: assign a PaintStats instance to a font's
+    'paintStats' attribute to enable it, and set it back to None to disable
+    it. Statistics accumulate until reset() is called.
+
+    The self time of a Paint excludes the time spent in its child Paints, but
+    includes the Canvas calls it makes. Its cumulative time includes
+    everything, but is only counted for the outermost Paint of a format when
+    Paints of the same format are nested. Canvas method times only include
+    the method itself: for savedState() and compositeMode(), entering and
+    leaving the context, but not the drawing done inside it. Canvas methods
+    are reported as "CanvasClass.methodName".
+
+    With the "harfbuzz" engine, HarfBuzz walks the paint graph, so there are
+    no Paint statistics; glyph and Canvas method statistics are collected.
+    """
+
+    def __init__(self, timer=time.perf_counter):
+        self.timer = timer
+        self.reset()
+
+    def reset(self):
+        # All keyed by (glyphName, name)
+        self._paintStats = defaultdict(lambda: [0, 0.0, 0.0])
+        self._canvasStats = defaultdict(lambda: [0, 0.0])
+        self._glyphStats = defaultdict(lambda: [0, 0.0])
+        self._currentGlyph = None
+        # A stack of [key, startTime, childTime] lists for the active Paints
+        self._paintStack = []
+        self._activePaints = defaultdict(int)
+
+    @contextmanager
+    def timeGlyph(self, glyphName, canvas):
+        """Time the drawing of a glyph. The context value is a wrapper
+        around 'canvas' that times all Canvas method calls.
+        """
+        savedGlyph = self._currentGlyph
+        self._currentGlyph = glyphName
+        start = self.timer()
+        try:
+            yield StatsCanvas(canvas, self)
+        finally:
+            entry = self._glyphStats[glyphName]
+            entry[0] += 1
+            entry[1] += self.timer() - start
+            self._currentGlyph = savedGlyph
+
+    def beginPaint(self, paintName):
+        key = self._currentGlyph, paintName
+        self._activePaints[key] += 1
+        self._paintStack.append([key, self.timer(), 0.0])
+
+    def endPaint(self):
+        key, start, childTime = self._paintStack.pop()
+        elapsed = self.timer() - start
+        if self._paintStack:
+            self._paintStack[-1][2] += elapsed
+        self._activePaints[key] -= 1
+        entry = self._paintStats[key]
+        entry[0] += 1
+        entry[1] += elapsed - childTime
+        if not self._activePaints[key]:
+            entry[2] += elapsed
+
+    def addCanvasCall(self, methodName, elapsed):
+        entry = self._canvasStats[self._currentGlyph, methodName]
+        entry[0] += 1
+        entry[1] += elapsed
+
+    @property
+    def glyphNames(self):
+        return list(self._glyphStats)
+
+    def getGlyphStats(self):
+        """Return a dict mapping glyph names to CallStatsEntry tuples, with
+        the number of times each glyph was drawn and the total time taken.
+        """
+        return {
+            glyphName: CallStatsEntry(*entry)
+            for glyphName, entry in self._glyphStats.items()
+        }
+
+    def getPaintStats(self, glyphName=None):
+        """Return a dict mapping Paint format names to PaintStatsEntry tuples,
+        for a single glyph, or summed over all glyphs if 'glyphName' is None.
+        """
+        return _sumEntries(self._paintStats, glyphName, PaintStatsEntry)
+
+    def getCanvasStats(self, glyphName=None):
+        """Return a dict mapping Canvas method names to CallStatsEntry tuples,
+        for a single glyph, or summed over all glyphs if 'glyphName' is None.
+        """
+        return _sumEntries(self._canvasStats, glyphName, CallStatsEntry)
+
+    def printReport(self, perGlyph=False, file=None):
+        if file is None:
+            file = sys.stdout
+        glyphStats = self.getGlyphStats()
+        totalTime = sum(entry.time for entry in glyphStats.values())
+        numDraws = sum(entry.count for entry in glyphStats.values())
+        print(f"{numDraws} glyphs drawn in {_formatTime(totalTime)}", file=file)
+        _printTables(self, None, file)
+        if perGlyph:
+            for glyphName, entry in sorted(
+                glyphStats.items(), key=lambda item: item[1].time, reverse=True
+            ):
+                print(
+                    f"\nGlyph {glyphName}: {entry.count} draws, "
+                    f"{_formatTime(entry.time)}",
+                    file=file,
+                )
+                _printTables(self, glyphName, file)
+
+
+class StatsCanvas(Canvas):
+    """A Canvas wrapper that times all calls to the wrapped canvas, and
+    reports them to a PaintStats instance.
+    """
+
+    def __init__(self, canvas, stats):
+        self.canvas = canvas
+        self.stats = stats
+        baseCanvas = canvas
+        while isinstance(baseCanvas, TracingCanvas):
+            baseCanvas = baseCanvas.canvas
+        self._prefix = type(baseCanvas).__name__ + "."
+
+    def newPath(self):
+        return self._timeCall("newPath")
+
+    @contextmanager
+    def savedState(self):
+        with self._timeContext("savedState", self.canvas.savedState()):
+            yield
+
+    @contextmanager
+    def compositeMode(self, compositeMode):
+        with self._timeContext(
+            "compositeMode", self.canvas.compositeMode(compositeMode)
+        ):
+            yield
+
+    def transform(self, transform):
+        self._timeCall("transform", transform)
+
+    def clipPath(self, path):
+        self._timeCall("clipPath", path)
+
+    def drawPathSolid(self, path, color):
+        self._timeCall("drawPathSolid", path, color)
+
+    def drawPathLinearGradient(self, path, *args):
+        self._timeCall("drawPathLinearGradient", path, *args)
+
+    def drawPathRadialGradient(self, path, *args):
+        self._timeCall("drawPathRadialGradient", path, *args)
+
+    def drawPathSweepGradient(self, path, *args):
+        self._timeCall("drawPathSweepGradient", path, *args)
+
+    def _timeCall(self, methodName, *args):
+        timer = self.stats.timer
+        start = timer()
+        result = getattr(self.canvas, methodName)(*args)
+        self.stats.addCanvasCall(self._prefix + methodName, timer() - start)
+        return result
+
+    @contextmanager
+    def _timeContext(self, methodName, context):
+        timer = self.stats.timer
+        start = timer()
+        with context:
+            elapsed = timer() - start
+            yield
+            start = timer()
+        elapsed += timer() - start
+        self.stats.addCanvasCall(self._prefix + methodName, elapsed)
+
+
+def _sumEntries(stats, glyphName, entryClass):
+    sums = {}
+    for (entryGlyphName, name), entry in stats.items():
+        if glyphName is not None and entryGlyphName != glyphName:
+            continue
+        total = sums.get(name)
+        sums[name] = entry if total is None else [a + b for a, b in zip(total, entry)]
+    return {name: entryClass(*entry) for name, entry in sorted(sums.items())}
+
+
+def _printTables(stats, glyphName, file):
+    paintStats = stats.getPaintStats(glyphName)
+    if paintStats:
+        print(
+            f"  {'Paint format':<36} {'count':>8} {'self':>12} {'cumulative':>12}",
+            file=file,
+        )
+        for paintName, entry in sorted(
+            paintStats.items(), key=lambda item: item[1].selfTime, reverse=True
+        ):
+            print(
+                f"  {paintName:<36} {entry.count:>8} "
+                f"{_formatTime(entry.selfTime):>12} "
+                f"{_formatTime(entry.cumulativeTime):>12}",
+                file=file,
+            )
+    canvasStats = stats.getCanvasStats(glyphName)
+    if canvasStats:
+        print(f"  {'Canvas method':<36} {'count':>8} {'time':>12}", file=file)
+        for methodName, entry in sorted(
+            canvasStats.items(), key=lambda item: item[1].time, reverse=True
+        ):
+            print(
+                f"  {methodName:<36} {entry.count:>8} {_formatTime(entry.time):>12}",
+                file=file,
+            )
+
+
+def _formatTime(seconds):
+    if seconds >= 1:
+        return f"{seconds:.3f} s"
+    elif seconds >= 0.001:
+        return f"{seconds * 1000:.3f} ms"
+    return f"{seconds * 1_000_000:.1f} µs"
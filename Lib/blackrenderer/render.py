@@ -1,5 +1,9 @@
+from functools import partial
+import itertools
 from typing import NamedTuple
 import os
+import tempfile
+import threading
 from fontTools.misc.arrayTools import (
     scaleRect,
     offsetRect,
@@ -9,13 +13,37 @@ from fontTools.misc.arrayTools import (
 )
 import uharfbuzz as hb
 from .font import BlackRendererFont
+from .glyphCache import GlyphCache
 from .backends import getSurfaceClass
+from .backends.numpy import encodePNG
+from .backends.recording import RecordingCanvas
+from .glyphAtlas import quantizePosition, unpremultiplyImage
+from .paintStats import PaintStats
+from .trace import Tracer, TracingCanvas, nullTracer
 
 
 class BackendUnavailableError(Exception):
     pass
 
 
+class RenderStats(NamedTuple):
+    # Seconds per phase: "loadFont", "shape", "bounds", "draw" (traversal and
+    # rasterization), "encode" and "total"
+    timings: dict
+    # The glyph and surface fields are None if all outputs came from the
+    # result cache
+    numGlyphs: int
+    numColorGlyphs: int
+    numNonColorGlyphs: int
+    # None with the "harfbuzz" engine, which doesn't visit Paints in Python
+    numPaints: int
+    numCompositeLayers: int
+    surfaceSize: tuple
+    numPixels: int
+    outputSizes: list
+    numCachedOutputs: int
+
+
 def renderText(
     fontPath,
     textString,
@@ -29,8 +57,235 @@ def renderText(
     backendName=None,
     lang=None,
     script=None,
+    autoCrop=False,
+    glyphCacheDir=None,
+    resultCache=None,
+    paintStats=None,
+    tracer=None,
+    returnStats=False,
+    traversalLimits=None,
+    engine="python",
+    subpixelPhases=None,
+    glyphAtlas=None,
+):
+    # If 'paintStats' is a PaintStats instance, drawing statistics are
+    # collected into it. If 'tracer' is a Tracer instance, the render phases
+    # are recorded as trace events. Nothing is drawn for results served by
+    # 'resultCache'. If 'returnStats' is True, a RenderStats tuple is
+    # returned. If 'traversalLimits' is a TraversalLimits tuple, the font is
+    # validated against it, and TraversalBudgetError is raised for fonts or
+    # images that exceed it. 'engine' selects the paint graph traversal
+    # engine, see BlackRendererFont. If 'subpixelPhases' is an (xPhases,
+    # yPhases) tuple, glyph positions are rounded to the nearest 1/xPhases
+    # and 1/yPhases of a pixel. If 'glyphAtlas' is a GlyphAtlas, PNG outputs
+    # are composited from glyphs rasterized by the atlas, which rounds glyph
+    # positions to whole pixels unless 'subpixelPhases' is given.
+    if isinstance(outputPath, (list, tuple)):
+        outputPaths = list(outputPath)
+    else:
+        outputPaths = [outputPath]
+    backends = [_resolveBackend(backendName, outputPath) for outputPath in outputPaths]
+    renderOptions = dict(
+        fontSize=fontSize,
+        margin=margin,
+        features=features,
+        variations=variations,
+        paletteIndex=paletteIndex,
+        lang=lang,
+        script=script,
+        autoCrop=autoCrop,
+        subpixelPhases=subpixelPhases,
+    )
+    statsCollector = None
+    if returnStats:
+        statsCollector = _RenderStatsCollector(tracer, paintStats, engine)
+        tracer = statsCollector.tracer
+        paintStats = statsCollector.paintStats
+    drawOptions = dict(
+        glyphCacheDir=glyphCacheDir,
+        paintStats=paintStats,
+        tracer=tracer,
+        traversalLimits=traversalLimits,
+        engine=engine,
+        glyphAtlas=glyphAtlas,
+    )
+    if tracer is None:
+        tracer = nullTracer
+    with tracer.span("renderText", text=textString):
+        if resultCache is None:
+            outputs = [
+                (outputPath, _getSurfaceClass(*backend))
+                for outputPath, backend in zip(outputPaths, backends)
+            ]
+            renderInfo = _renderText(
+                fontPath, textString, outputs, **drawOptions, **renderOptions
+            )
+            outputSizes = renderInfo.outputSizes
+            numCachedOutputs = 0
+        else:
+            results, renderInfo, numCachedOutputs = _renderCached(
+                fontPath, textString, backends, resultCache, drawOptions, renderOptions
+            )
+            for outputPath, data in zip(outputPaths, results):
+                _writeOutput(outputPath, data)
+            outputSizes = [len(data) for data in results]
+    if statsCollector is not None:
+        return statsCollector.getStats(renderInfo, outputSizes, numCachedOutputs)
+
+
+def renderTextToBytes(
+    fontPath,
+    textString,
+    fileExtension=".png",
+    *,
+    fontSize=250,
+    margin=20,
+    features=None,
+    variations=None,
+    paletteIndex=0,
+    backendName=None,
+    lang=None,
+    script=None,
+    autoCrop=False,
+    glyphCacheDir=None,
+    resultCache=None,
+    paintStats=None,
+    tracer=None,
+    returnStats=False,
+    traversalLimits=None,
+    engine="python",
+    subpixelPhases=None,
+    glyphAtlas=None,
+):
+    """Render a text string like renderText() does, but return the encoded
+    image data instead of writing it to a file. The image format is
+    determined by 'fileExtension'. If 'returnStats' is True, return a
+    (data, renderStats) tuple.
+    """
+    backends = [_resolveBackend(backendName, "output" + fileExtension)]
+    renderOptions = dict(
+        fontSize=fontSize,
+        margin=margin,
+        features=features,
+        variations=variations,
+        paletteIndex=paletteIndex,
+        lang=lang,
+        script=script,
+        autoCrop=autoCrop,
+        subpixelPhases=subpixelPhases,
+    )
+    statsCollector = None
+    if returnStats:
+        statsCollector = _RenderStatsCollector(tracer, paintStats, engine)
+        tracer = statsCollector.tracer
+        paintStats = statsCollector.paintStats
+    drawOptions = dict(
+        glyphCacheDir=glyphCacheDir,
+        paintStats=paintStats,
+        tracer=tracer,
+        traversalLimits=traversalLimits,
+        engine=engine,
+        glyphAtlas=glyphAtlas,
+    )
+    if tracer is None:
+        tracer = nullTracer
+    with tracer.span("renderTextToBytes", text=textString):
+        if resultCache is None:
+            results, renderInfo = _renderToBytes(
+                fontPath, textString, backends, drawOptions, renderOptions
+            )
+            numCachedOutputs = 0
+        else:
+            results, renderInfo, numCachedOutputs = _renderCached(
+                fontPath, textString, backends, resultCache, drawOptions, renderOptions
+            )
+    if statsCollector is not None:
+        outputSizes = [len(data) for data in results]
+        stats = statsCollector.getStats(renderInfo, outputSizes, numCachedOutputs)
+        return results[0], stats
+    return results[0]
+
+
+def _renderCached(
+    fontPath, textString, backends, resultCache, drawOptions, renderOptions
+):
+    # The engine can change the output, and the traversal limits whether the
+    # render succeeds at all
+    keyOptions = dict(
+        renderOptions,
+        engine=drawOptions["engine"],
+        traversalLimits=drawOptions["traversalLimits"],
+    )
+    glyphAtlas = drawOptions["glyphAtlas"]
+    if glyphAtlas is not None:
+        # PNG outputs are rasterized by the atlas backend
+        keyOptions["glyphAtlas"] = glyphAtlas.backendName
+    cacheKeys = [
+        resultCache.makeKey(fontPath, textString, backendName, suffix, keyOptions)
+        for backendName, suffix in backends
+    ]
+    results = [resultCache.get(cacheKey) for cacheKey in cacheKeys]
+    missing = [i for i, data in enumerate(results) if data is None]
+    renderInfo = None
+    if missing:
+        missingResults, renderInfo = _renderToBytes(
+            fontPath,
+            textString,
+            [backends[i] for i in missing],
+            drawOptions,
+            renderOptions,
+        )
+        for i, data in zip(missing, missingResults):
+            resultCache.put(cacheKeys[i], data)
+            results[i] = data
+    return results, renderInfo, len(results) - len(missing)
+
+
+def _renderToBytes(fontPath, textString, backends, drawOptions, renderOptions):
+    outputs = [
+        (None, _getSurfaceClass(backendName, suffix))
+        for backendName, suffix in backends
+    ]
+    renderInfo = _renderText(
+        fontPath,
+        textString,
+        outputs,
+        returnData=True,
+        **drawOptions,
+        **renderOptions,
+    )
+    return renderInfo.outputData, renderInfo
+
+
+def _renderText(
+    fontPath,
+    textString,
+    outputs,
+    *,
+    returnData=False,
+    glyphCacheDir,
+    paintStats,
+    tracer,
+    traversalLimits,
+    engine,
+    glyphAtlas,
+    fontSize,
+    margin,
+    features,
+    variations,
+    paletteIndex,
+    lang,
+    script,
+    autoCrop,
+    subpixelPhases,
 ):
-    font = BlackRendererFont(fontPath)
+    if tracer is None:
+        tracer = nullTracer
+    with tracer.span("loadFont", path=os.fspath(fontPath)):
+        font = BlackRendererFont(
+            fontPath, traversalLimits=traversalLimits, engine=engine
+        )
+    font.paintStats = paintStats
     glyphNames = font.glyphNames
 
     scaleFactor = fontSize / font.unitsPerEm
@@ -47,15 +302,212 @@ def renderText(
         font.setLocation(variations)
     palette = font.getPalette(paletteIndex)
 
-    hb.shape(font.hbFont, buf, features)
+    with tracer.span("hb.shape"):
+        hb.shape(font.hbFont, buf, features)
 
     infos = buf.glyph_infos
     positions = buf.glyph_positions
     glyphLine = buildGlyphLine(infos, positions, glyphNames)
-    bounds = calcGlyphLineBounds(glyphLine, font)
+    with tracer.span("calcGlyphLineBounds", numGlyphs=len(glyphLine)):
+        bounds = calcGlyphLineBounds(glyphLine, font, exact=autoCrop)
+    if bounds is None:
+        # Nothing is painted at all
+        bounds = (0, 0, 0, 0)
     bounds = scaleRect(bounds, scaleFactor, scaleFactor)
     bounds = insetRect(bounds, -margin, -margin)
     bounds = intRect(bounds)
+    if traversalLimits is not None:
+        traversalLimits.checkPixelArea(bounds[2] - bounds[0], bounds[3] - bounds[1])
+
+    if glyphCacheDir is not None:
+        drawGlyph = partial(_getGlyphCache(glyphCacheDir).drawGlyph, font)
+    else:
+        drawGlyph = font.drawGlyph
+
+    def drawGlyphLine(canvas):
+        canvas.scale(scaleFactor)
+        for glyph in glyphLine:
+            with canvas.savedState():
+                canvas.translate(glyph.xOffset, glyph.yOffset)
+                with tracer.span("drawGlyph", "traversal", glyph=glyph.name):
+                    drawGlyph(glyph.name, canvas, palette=palette)
+            canvas.translate(glyph.xAdvance, glyph.yAdvance)
+
+    def drawQuantizedGlyphLine(canvas):
+        # Place the glyphs at the same positions as GlyphAtlas does
+        xPhases, yPhases = subpixelPhases
+        x = y = 0
+        for glyph in glyphLine:
+            glyphX = sum(quantizePosition((x + glyph.xOffset) * scaleFactor, xPhases))
+            glyphY = sum(quantizePosition((y + glyph.yOffset) * scaleFactor, yPhases))
+            with canvas.savedState():
+                canvas.translate(glyphX, glyphY)
+                canvas.scale(scaleFactor)
+                with tracer.span("drawGlyph", "traversal", glyph=glyph.name):
+                    drawGlyph(glyph.name, canvas, palette=palette)
+            x += glyph.xAdvance
+            y += glyph.yAdvance
+
+    if subpixelPhases is None and glyphAtlas is not None:
+        subpixelPhases = (1, 1)
+    if subpixelPhases is not None:
+        draw = drawQuantizedGlyphLine
+    else:
+        draw = drawGlyphLine
+
+    if len(outputs) > 1 and paintStats is None:
+        # Traverse the font only once, and replay the result for each output
+        recording = RecordingCanvas()
+        draw(recording)
+        draw = recording.replay
+
+    # With 'returnData', the encoded outputs are returned in
+    # _RenderInfo.outputData instead of being written to the output paths
+    outputSizes = []
+    outputData = [] if returnData else None
+    for outputPath, surfaceClass in outputs:
+        if glyphAtlas is not None and surfaceClass.fileExtension == ".png":
+            with tracer.span("draw", "backend", backend="GlyphAtlas"):
+                image, _ = glyphAtlas.renderGlyphLine(
+                    font,
+                    glyphLine,
+                    fontSize,
+                    palette=palette,
+                    subpixelPhases=subpixelPhases,
+                    bounds=bounds,
+                )
+            with tracer.span("saveImage", "backend", backend="GlyphAtlas"):
+                data = encodePNG(unpremultiplyImage(image))
+                if returnData:
+                    outputData.append(data)
+                else:
+                    _writeOutput(outputPath, data)
+                outputSizes.append(len(data))
+            continue
+        surface = surfaceClass()
+        backendName = type(surface).__name__
+        with tracer.span("draw", "backend", backend=backendName):
+            with surface.canvas(bounds) as canvas:
+                if tracer is not nullTracer:
+                    canvas = TracingCanvas(canvas, tracer)
+                draw(canvas)
+        with tracer.span("saveImage", "backend", backend=backendName):
+            if returnData:
+                data = _encodeImage(surface)
+                outputData.append(data)
+                outputSizes.append(len(data))
+            elif outputPath is not None:
+                surface.saveImage(outputPath)
+                outputSizes.append(os.path.getsize(outputPath))
+            else:
+                data = _encodeImage(surface)
+                _writeOutput(None, data)
+                outputSizes.append(len(data))
+
+    numColorGlyphs = sum(
+        glyph.name in font.colrV1Glyphs or glyph.name in font.colrV0Glyphs
+        for glyph in glyphLine
+    )
+    return _RenderInfo(
+        numGlyphs=len(glyphLine),
+        numColorGlyphs=numColorGlyphs,
+        surfaceSize=(bounds[2] - bounds[0], bounds[3] - bounds[1]),
+        outputSizes=outputSizes,
+        outputData=outputData,
+    )
+
+
+class _RenderInfo(NamedTuple):
+    numGlyphs: int
+    numColorGlyphs: int
+    surfaceSize: tuple
+    outputSizes: list
+    outputData: list
+
+
+def _encodeImage(surface):
+    # Encode in memory if the backend can, else save to a temporary file
+    data = surface.encodeImage()
+    if data is None:
+        with tempfile.TemporaryDirectory() as tmpDir:
+            tmpPath = os.path.join(tmpDir, "output" + surface.fileExtension)
+            surface.saveImage(tmpPath)
+            with open(tmpPath, "rb") as f:
+                data = f.read()
+    return data
+
+
+class _RenderStatsCollector:
+    # Derives RenderStats from the trace events and drawing statistics
+    # recorded during a render call
+
+    phaseNames = {
+        "loadFont": "loadFont",
+        "hb.shape": "shape",
+        "calcGlyphLineBounds": "bounds",
+        "draw": "draw",
+        "saveImage": "encode",
+        "renderText": "total",
+        "renderTextToBytes": "total",
+    }
+
+    def __init__(self, tracer, paintStats, engine):
+        self.tracer = Tracer() if tracer is None else tracer
+        self.engine = engine
+        self.paintStats = PaintStats() if paintStats is None else paintStats
+        self._firstEvent = len(self.tracer.events)
+        self._paintCounts = self._getPaintCounts()
+
+    def _getPaintCounts(self):
+        numPaints = sum(
+            entry.count for entry in self.paintStats.getPaintStats().values()
+        )
+        numCompositeLayers = sum(
+            entry.count
+            for methodName, entry in self.paintStats.getCanvasStats().items()
+            if methodName.endswith(".compositeMode")
+        )
+        return numPaints, numCompositeLayers
+
+    def getStats(self, renderInfo, outputSizes, numCachedOutputs):
+        # The tracer may be shared with other threads
+        pid, tid = os.getpid(), threading.get_ident()
+        timings = dict.fromkeys(self.phaseNames.values(), 0.0)
+        events = self.tracer.events
+        for event in itertools.islice(events, self._firstEvent, len(events)):
+            phaseName = self.phaseNames.get(event["name"])
+            if phaseName is not None and (event["pid"], event["tid"]) == (pid, tid):
+                timings[phaseName] += event["dur"] / 1_000_000
+        numPaints, numCompositeLayers = (
+            after - before
+            for before, after in zip(self._paintCounts, self._getPaintCounts())
+        )
+        if self.engine == "harfbuzz":
+            numPaints = None
+        if renderInfo is None:
+            numGlyphs = numColorGlyphs = numNonColorGlyphs = None
+            surfaceSize = numPixels = None
+        else:
+            numGlyphs = renderInfo.numGlyphs
+            numColorGlyphs = renderInfo.numColorGlyphs
+            numNonColorGlyphs = numGlyphs - numColorGlyphs
+            surfaceSize = renderInfo.surfaceSize
+            numPixels = surfaceSize[0] * surfaceSize[1]
+        return RenderStats(
+            timings=timings,
+            numGlyphs=numGlyphs,
+            numColorGlyphs=numColorGlyphs,
+            numNonColorGlyphs=numNonColorGlyphs,
+            numPaints=numPaints,
+            numCompositeLayers=numCompositeLayers,
+            surfaceSize=surfaceSize,
+            numPixels=numPixels,
+            outputSizes=outputSizes,
+            numCachedOutputs=numCachedOutputs,
+        )
+
+
+def _resolveBackend(backendName, outputPath):
     if outputPath is None:
         suffix = ".svg"
     else:
@@ -65,29 +517,37 @@ def renderText(
             backendName = "svg"
         else:
             backendName = "skia"
+    return backendName, suffix
+
+
+# One GlyphCache per cache directory, so that the size of the cache is only
+# computed once per process, not once per render call
+_glyphCaches = {}
+_glyphCachesLock = threading.Lock()
+
+
+def _getGlyphCache(glyphCacheDir):
+    glyphCacheDir = os.path.abspath(os.fspath(glyphCacheDir))
+    with _glyphCachesLock:
+        glyphCache = _glyphCaches.get(glyphCacheDir)
+        if glyphCache is None:
+            glyphCache = _glyphCaches[glyphCacheDir] = GlyphCache(glyphCacheDir)
+    return glyphCache
+
+
+def _getSurfaceClass(backendName, suffix):
     surfaceClass = getSurfaceClass(backendName, suffix)
     if surfaceClass is None:
         raise BackendUnavailableError(backendName)
+    return surfaceClass
 
-    surface = surfaceClass()
-    with surface.canvas(bounds) as canvas:
-        canvas.scale(scaleFactor)
-        for glyph in glyphLine:
-            with canvas.savedState():
-                canvas.translate(glyph.xOffset, glyph.yOffset)
-                font.drawGlyph(glyph.name, canvas, palette=palette)
-            canvas.translate(glyph.xAdvance, glyph.yAdvance)
 
+def _writeOutput(outputPath, data):
     if outputPath is not None:
-        surface.saveImage(outputPath)
+        with open(outputPath, "wb") as f:
+            f.write(data)
     else:
-        import tempfile
-
-        with tempfile.NamedTemporaryFile(suffix=".svg") as tmp:
-            surface.saveImage(tmp.name)
-            with open(tmp.name, "rb") as f:
-                svgData = f.read().decode("utf-8").rstrip()
-        print(svgData)
+        print(data.decode("utf-8").rstrip())
 
 
 def buildGlyphLine(infos, positions, glyphNames):
@@ -105,20 +565,25 @@ def buildGlyphLine(infos, positions, glyphNames):
     return glyphLine
 
 
-def calcGlyphLineBounds(glyphLine, font):
+def calcGlyphLineBounds(glyphLine, font, exact=False):
+    # If 'exact' is True, use the bounds of the painted area instead of the
+    # HarfBuzz extents or the ClipBox. This can be much tighter for COLRv1
+    # glyphs.
+    getBounds = font.getPaintBounds if exact else font.getGlyphBounds
     bounds = None
     x, y = 0, 0
     for glyph in glyphLine:
-        glyphBounds = font.getGlyphBounds(glyph.name)
-        if glyphBounds is None:
-            continue
-        glyphBounds = offsetRect(glyphBounds, x + glyph.xOffset, y + glyph.yOffset)
+        glyphBounds = getBounds(glyph.name)
+        if glyphBounds is not None:
+            glyphBounds = offsetRect(
+                glyphBounds, x + glyph.xOffset, y + glyph.yOffset
+            )
+            if bounds is None:
+                bounds = glyphBounds
+            else:
+                bounds = unionRect(bounds, glyphBounds)
         x += glyph.xAdvance
         y += glyph.yAdvance
-        if bounds is None:
-            bounds = glyphBounds
-        else:
-            bounds = unionRect(bounds, glyphBounds)
     return bounds
 
 
@@ -0,0 +1,112 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+from . import __version__
+from .diskCache import DiskCache
+
+
+class RenderCache:
+    """A content-addressed cache for encoded render results, for use with
+    renderText() and renderTextToBytes().
+
+    Results are keyed by a hash of all inputs that affect the output: a
+    fingerprint of the font data, the text, the backend, the output format
+    and the render options. They are kept in a memory tier bounded to
+    'maxMemorySize' bytes, and optionally in a disk tier in 'cacheDir', which
+    can be shared between processes.
+    """
+
+    def __init__(
+        self, maxMemorySize=64 * 1024 * 1024, cacheDir=None, maxDiskSize=1024**3
+    ):
+        self.maxMemorySize = maxMemorySize
+        self.diskCache = None if cacheDir is None else DiskCache(cacheDir, maxDiskSize)
+        self.memoryHits = 0
+        self.diskHits = 0
+        self.misses = 0
+        self._memoryCache = OrderedDict()
+        self._memorySize = 0
+        self._fontFingerprints = {}
+
+    def getFontFingerprint(self, fontPath):
+        """Return a SHA-256 hex digest of the font file. The result is cached
+        for as long as the file's size and modification time don't change.
+        """
+        fontPath = os.path.abspath(os.fspath(fontPath))
+        stat = os.stat(fontPath)
+        statKey = fontPath, stat.st_size, stat.st_mtime_ns
+        fingerprint = self._fontFingerprints.get(statKey)
+        if fingerprint is None:
+            with open(fontPath, "rb") as f:
+                fingerprint = hashlib.sha256(f.read()).hexdigest()
+            self._fontFingerprints[statKey] = fingerprint
+        return fingerprint
+
+    def makeKey(self, fontPath, textString, backendName, fileExtension, renderOptions):
+        """Return the cache key for a render request, as a hex string."""
+        keyData = dict(
+            version=__version__,
+            font=self.getFontFingerprint(fontPath),
+            text=textString,
+            backend=backendName,
+            format=fileExtension,
+            options=renderOptions,
+        )
+        keyString = json.dumps(keyData, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(keyString.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached data for 'key', or None."""
+        data = self._memoryCache.get(key)
+        if data is not None:
+            self._memoryCache.move_to_end(key)
+            self.memoryHits += 1
+            return data
+        if self.diskCache is not None:
+            data = self.diskCache.read(_diskKey(key))
+            if data is not None:
+                self._putMemory(key, data)
+                self.diskHits += 1
+                return data
+        self.misses += 1
+        return None
+
+    def put(self, key, data):
+        self._putMemory(key, data)
+        if self.diskCache is not None:
+            self.diskCache.write(_diskKey(key), data)
+
+    def _putMemory(self, key, data):
+        if len(data) > self.maxMemorySize:
+            return
+        oldData = self._memoryCache.pop(key, None)
+        if oldData is not None:
+            self._memorySize -= len(oldData)
+        self._memoryCache[key] = data
+        self._memorySize += len(data)
+        while self._memorySize > self.maxMemorySize:
+            _, evictedData = self._memoryCache.popitem(last=False)
+            self._memorySize -= len(evictedData)
+
+    @property
+    def hitRate(self):
+        """The fraction of lookups that were served from the cache."""
+        numLookups = self.memoryHits + self.diskHits + self.misses
+        if not numLookups:
+            return 0.0
+        return (self.memoryHits + self.diskHits) / numLookups
+
+    def getStats(self):
+        return dict(
+            memoryHits=self.memoryHits,
+            diskHits=self.diskHits,
+            misses=self.misses,
+            hitRate=self.hitRate,
+            memoryEntries=len(self._memoryCache),
+            memorySize=self._memorySize,
+        )
+
+
+def _diskKey(key):
+    return key[:2], key
@@ -0,0 +1,285 @@
+"""Render the color glyphs of a font into sprite sheets: atlas PNG pages, and
+a JSON file describing where each glyph is.
+
+    $ python -m blackrenderer.spriteSheet font.ttf outputDir --sizes 32 64
+
+By default, all COLRv0 and COLRv1 glyphs are rendered. Use --codepoints to
+render the glyphs for a list of code points instead, for example
+"1F600-1F64F,2764". Each glyph is rendered once per size and palette.
+
+Glyphs are rendered by worker processes, and packed into pages in the order
+they come back, with a shelf packer. Glyphs are sent to the workers from
+highest to lowest, so that shelves are filled with glyphs of similar height.
+A page is written as soon as the next glyph doesn't fit anymore, so only one
+page is kept in memory.
+
+The JSON file lists one sprite per glyph, size and palette, with its page,
+its pixel rectangle and UV coordinates in the page, its bearings (the
+position of its left and top edges relative to the glyph origin, in pixels,
+with y going up) and its horizontal advance in pixels.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import pathlib
+import sys
+from .backends import getSurfaceClass
+from .backends.numpy import encodePNG
+from .font import BlackRendererFont
+from .glyphAtlas import _AtlasPage, rasterizeGlyph, unpremultiplyImage
+
+
+def buildSpriteSheets(
+    fontPath,
+    outputDir,
+    *,
+    glyphNames=None,
+    sizes=(64,),
+    paletteIndices=(0,),
+    pageSize=2048,
+    backendName=None,
+    numWorkers=None,
+    name=None,
+):
+    """Render sprite sheets, see the module docstring. 'glyphNames' defaults
+    to all color glyphs. Pages are written to 'outputDir' as <name>-<n>.png,
+    and the metadata as <name>.json, where 'name' defaults to the font file
+    name without extension. Returns the metadata as a dict.
+    """
+    fontPath = pathlib.Path(fontPath)
+    outputDir = pathlib.Path(outputDir)
+    if name is None:
+        name = fontPath.stem
+    if backendName is None:
+        backendName = "skia" if getSurfaceClass("skia") is not None else "numpy"
+    font = BlackRendererFont(fontPath)
+    if glyphNames is None:
+        glyphNames = getColorGlyphNames(font)
+    reverseCmap = {}
+    for codepoint, glyphName in sorted(font.ttFont.getBestCmap().items()):
+        reverseCmap.setdefault(glyphName, []).append(codepoint)
+
+    jobs = []
+    for fontSize in sizes:
+        glyphHeights = {}
+        for glyphName in glyphNames:
+            bounds = font.getPaintBounds(glyphName)
+            glyphHeights[glyphName] = 0 if bounds is None else bounds[3] - bounds[1]
+        sortedNames = sorted(glyphNames, key=glyphHeights.get, reverse=True)
+        for paletteIndex in paletteIndices:
+            jobs.extend(
+                (glyphName, fontSize, paletteIndex) for glyphName in sortedNames
+            )
+
+    outputDir.mkdir(parents=True, exist_ok=True)
+    writer = _SpriteSheetWriter(outputDir, name, pageSize)
+    scaleFactors = {fontSize: fontSize / font.unitsPerEm for fontSize in sizes}
+    glyphIDs = {glyphName: gid for gid, glyphName in enumerate(font.glyphNames)}
+    hmtx = font.ttFont["hmtx"]
+    for (glyphName, fontSize, paletteIndex), (image, xMin, yMax) in zip(
+        jobs, _renderSprites(fontPath, backendName, jobs, numWorkers)
+    ):
+        gid = glyphIDs[glyphName]
+        advance = hmtx[glyphName][0] * scaleFactors[fontSize]
+        sprite = dict(
+            glyph=glyphName,
+            glyphID=gid,
+            codepoints=reverseCmap.get(glyphName, []),
+            size=fontSize,
+            palette=paletteIndex,
+            bearingX=xMin,
+            bearingY=yMax,
+            advance=advance,
+        )
+        writer.addSprite(sprite, image)
+    writer.finish()
+
+    metadata = dict(
+        font=fontPath.name,
+        unitsPerEm=font.unitsPerEm,
+        pageSize=pageSize,
+        pages=writer.pageFileNames,
+        sprites=writer.sprites,
+    )
+    with open(outputDir / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=1)
+    return metadata
+
+
+def getColorGlyphNames(font):
+    """Return the names of the COLRv0 and COLRv1 glyphs of 'font', in glyph
+    order.
+    """
+    colorGlyphNames = set(font.colrV0GlyphNames) | set(font.colrV1GlyphNames)
+    return [glyphName for glyphName in font.glyphNames if glyphName in colorGlyphNames]
+
+
+def getCodepointGlyphNames(font, codepoints):
+    """Return the glyph names for 'codepoints', without duplicates. Code points
+    that are not in the font are skipped.
+    """
+    cmap = font.ttFont.getBestCmap()
+    glyphNames = {
+        cmap[codepoint]: None for codepoint in codepoints if codepoint in cmap
+    }
+    return list(glyphNames)
+
+
+class _SpriteSheetWriter:
+    # Packs sprites into pages, and writes each page as soon as it is full
+
+    def __init__(self, outputDir, name, pageSize):
+        self.outputDir = outputDir
+        self.name = name
+        self.pageSize = pageSize
+        self.pageFileNames = []
+        self.sprites = []
+        self._page = None
+
+    def addSprite(self, sprite, image):
+        height, width, _ = image.shape
+        sprite.update(page=None, x=0, y=0, width=width, height=height)
+        sprite["uv"] = [0, 0, 0, 0]
+        self.sprites.append(sprite)
+        if not width or not height:
+            return
+        if width > self.pageSize or height > self.pageSize:
+            raise ValueError(
+                f"glyph {sprite['glyph']!r} at size {sprite['size']} doesn't fit "
+                f"in a {self.pageSize} pixel page"
+            )
+        position = None
+        if self._page is not None:
+            position = self._page.allocate(width, height)
+        if position is None:
+            self._writePage()
+            self._page = _AtlasPage(self.pageSize)
+            position = self._page.allocate(width, height)
+        x, y = position
+        xMax = x + width
+        yMax = y + height
+        self._page.image[y:yMax, x:xMax] = image
+        sprite.update(page=len(self.pageFileNames), x=x, y=y)
+        sprite["uv"] = [coord / self.pageSize for coord in (x, y, xMax, yMax)]
+
+    def finish(self):
+        self._writePage()
+        self._page = None
+
+    def _writePage(self):
+        if self._page is None:
+            return
+        fileName = f"{self.name}-{len(self.pageFileNames)}.png"
+        with open(self.outputDir / fileName, "wb") as f:
+            f.write(encodePNG(unpremultiplyImage(self._page.image)))
+        self.pageFileNames.append(fileName)
+
+
+def _renderSprites(fontPath, backendName, jobs, numWorkers):
+    # Yield an (image, xMin, yMax) tuple for each (glyphName, fontSize,
+    # paletteIndex) job, in order
+    if numWorkers is None:
+        numWorkers = os.cpu_count() or 1
+    if numWorkers <= 1 or len(jobs) <= 1:
+        _initWorker(fontPath, backendName)
+        yield from map(_renderSprite, jobs)
+        return
+    chunkSize = max(1, min(64, len(jobs) // (numWorkers * 4)))
+    with multiprocessing.Pool(
+        numWorkers, initializer=_initWorker, initargs=(fontPath, backendName)
+    ) as pool:
+        yield from pool.imap(_renderSprite, jobs, chunksize=chunkSize)
+
+
+_workerState = {}
+
+
+def _initWorker(fontPath, backendName):
+    _workerState["font"] = BlackRendererFont(fontPath)
+    _workerState["surfaceClass"] = getSurfaceClass(backendName, ".png")
+
+
+def _renderSprite(job):
+    glyphName, fontSize, paletteIndex = job
+    font = _workerState["font"]
+    return rasterizeGlyph(
+        _workerState["surfaceClass"],
+        font,
+        glyphName,
+        fontSize,
+        palette=font.getPalette(paletteIndex),
+    )
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m blackrenderer.spriteSheet",
+        description=__doc__.split("\n")[0],
+    )
+    parser.add_argument("font", help="The font file")
+    parser.add_argument("output", help="The output directory")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[64], help="Font sizes in pixels"
+    )
+    parser.add_argument(
+        "--palettes", type=int, nargs="+", default=[0], help="CPAL palette indices"
+    )
+    parser.add_argument(
+        "--codepoints",
+        type=parseCodepoints,
+        help="Hexadecimal code points and ranges to render instead of all color "
+        "glyphs, for example 1F600-1F64F,2764",
+    )
+    parser.add_argument("--page-size", type=int, default=2048)
+    parser.add_argument(
+        "--workers", type=int, help="The number of processes (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["skia", "numpy"],
+        help="The backend to render with (default: skia if available)",
+    )
+    parser.add_argument(
+        "--name", help="The base name of the output files (default: the font's)"
+    )
+    args = parser.parse_args(args)
+
+    glyphNames = None
+    if args.codepoints is not None:
+        font = BlackRendererFont(args.font)
+        glyphNames = getCodepointGlyphNames(font, args.codepoints)
+    metadata = buildSpriteSheets(
+        args.font,
+        args.output,
+        glyphNames=glyphNames,
+        sizes=args.sizes,
+        paletteIndices=args.palettes,
+        pageSize=args.page_size,
+        backendName=args.backend,
+        numWorkers=args.workers,
+        name=args.name,
+    )
+    print(f"{len(metadata['sprites'])} sprites, {len(metadata['pages'])} pages")
+    return 0
+
+
+def parseCodepoints(string):
+    codepoints = []
+    for item in string.split(","):
+        item = item.strip().upper().replace("U+", "")
+        if not item:
+            continue
+        first, _, last = item.partition("-")
+        try:
+            first = int(first, 16)
+            last = int(last, 16) if last else first
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid code point: '{item}'")
+        codepoints.extend(range(first, last + 1))
+    return codepoints
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import threading
+import time
+from .backends.base import Canvas
+
+
+class Tracer:
+    """Collects timed spans as Chrome trace events, which can be viewed with
+    chrome://tracing or https://ui.perfetto.dev.
+
+    All events carry the process and thread ID, so spans from parallel
+    renders show up on separate tracks. Timestamps come from
+    time.perf_counter_ns(), which is system-wide on common platforms, so
+    events from multiple processes on the same machine can be combined with
+    extend().
+    """
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category="render", **args):
+        start = _timestamp()
+        try:
+            yield
+        finally:
+            self.addSpan(name, category, start, _timestamp() - start, args)
+
+    def addSpan(self, name, category, start, duration, args=None):
+        """Add a complete ("X") event. 'start' and 'duration' are in
+        microseconds.
+        """
+        event = dict(
+            name=name,
+            cat=category,
+            ph="X",
+            ts=start,
+            dur=duration,
+            pid=os.getpid(),
+            tid=threading.get_ident(),
+        )
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def extend(self, events):
+        """Add events collected by another Tracer, for example in a worker
+        process.
+        """
+        with self._lock:
+            self.events.extend(events)
+
+    def getTraceEvents(self):
+        """Return all events, plus metadata events that name the processes
+        and threads.
+        """
+        with self._lock:
+            events = list(self.events)
+        metadata = []
+        for pid in sorted({event["pid"] for event in events}):
+            metadata.append(
+                dict(name="process_name", ph="M", pid=pid, args=dict(name=f"pid {pid}"))
+            )
+        for pid, tid in sorted({(event["pid"], event["tid"]) for event in events}):
+            metadata.append(
+                dict(
+                    name="thread_name",
+                    ph="M",
+                    pid=pid,
+                    tid=tid,
+                    args=dict(name=f"thread {tid}"),
+                )
+            )
+        return metadata + events
+
+    def save(self, path):
+        """Write the events as trace event JSON."""
+        trace = dict(traceEvents=self.getTraceEvents(), displayTimeUnit="ms")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(trace, f)
+
+
+class NullTracer:
+    """A Tracer stand-in that records nothing."""
+
+    events = ()
+
+    @staticmethod
+    def span(name, category="render", **args):
+        return nullcontext()
+
+
+nullTracer = NullTracer()
+
+
+class TracingCanvas(Canvas):
+    """A Canvas wrapper that adds a span for each compositeMode() context of
+    the wrapped canvas, which is where backends push and composite layers.
+    """
+
+    def __init__(self, canvas, tracer):
+        self.canvas = canvas
+        self.tracer = tracer
+
+    def newPath(self):
+        return self.canvas.newPath()
+
+    @contextmanager
+    def savedState(self):
+        with self.canvas.savedState():
+            yield
+
+    @contextmanager
+    def compositeMode(self, compositeMode):
+        with self.tracer.span(
+            "compositeMode",
+            "backend",
+            backend=type(self.canvas).__name__,
+            mode=compositeMode.name,
+        ):
+            with self.canvas.compositeMode(compositeMode):
+                yield
+
+    def transform(self, transform):
+        self.canvas.transform(transform)
+
+    def clipPath(self, path):
+        self.canvas.clipPath(path)
+
+    def drawPathSolid(self, path, color):
+        self.canvas.drawPathSolid(path, color)
+
+    def drawPathLinearGradient(self, path, *args):
+        self.canvas.drawPathLinearGradient(path, *args)
+
+    def drawPathRadialGradient(self, path, *args):
+        self.canvas.drawPathRadialGradient(path, *args)
+
+    def drawPathSweepGradient(self, path, *args):
+        self.canvas.drawPathSweepGradient(path, *args)
+
+
+def _timestamp():
+    return time.perf_counter_ns() / 1000
@@ -0,0 +1,104 @@
+from typing import NamedTuple, Optional
+from .paintGraph import PaintGraphWalker
+
+
+class TraversalBudgetError(Exception):
+    """Raised when a glyph or a render exceeds a TraversalLimits budget."""
+
+    def __init__(self, message, glyphName=None, limitName=None, limit=None):
+        super().__init__(message)
+        self.glyphName = glyphName
+        self.limitName = limitName
+        self.limit = limit
+
+
+class TraversalLimits(NamedTuple):
+    """Limits on the work needed to draw a glyph, to protect against fonts
+    whose paint graphs are crafted to be very expensive to draw. A field set
+    to None is not limited.
+    """
+
+    # The number of Paint nodes visited when drawing a glyph; shared
+    # subgraphs count once for each time they are reached
+    maxNodes: Optional[int] = 100_000
+    # The nesting depth of Paint nodes, including PaintColrGlyph references
+    maxDepth: Optional[int] = 64
+    # The number of layers pushed with canvas.compositeMode() for a glyph
+    maxLayers: Optional[int] = 1_000
+    # The number of pixels of a rendered image
+    maxPixelArea: Optional[int] = 100_000_000
+
+    def checkPixelArea(self, width, height):
+        if self.maxPixelArea is not None and width * height > self.maxPixelArea:
+            raise TraversalBudgetError(
+                f"Image of {width}x{height} pixels exceeds the traversal limit "
+                f"maxPixelArea={self.maxPixelArea}",
+                limitName="maxPixelArea",
+                limit=self.maxPixelArea,
+            )
+
+
+class TraversalValidator(PaintGraphWalker):
+    """Checks the glyphs of a BlackRendererFont against TraversalLimits,
+    without drawing them. Results for shared subgraphs are memoized, and
+    validation stops as soon as a limit is exceeded, so validating a glyph
+    takes time proportional to the size of its paint graph at most, however
+    many nodes drawing it would visit.
+    """
+
+    def __init__(self, font, limits):
+        super().__init__(font)
+        self.limits = limits
+
+    def validateFont(self):
+        for glyphName in self.font.colrV1GlyphNames:
+            self.validateGlyph(glyphName)
+        for glyphName in self.font.colrV0GlyphNames:
+            self.validateGlyph(glyphName)
+
+    def validateGlyph(self, glyphName):
+        """Raise TraversalBudgetError if drawing 'glyphName' exceeds the
+        limits. Return a (numNodes, depth, numLayers) tuple otherwise.
+        """
+        if glyphName in self.font.colrV1Glyphs:
+            return self.walkGlyph(glyphName, 0, glyphName)
+        layers = self.font.colrV0Glyphs.get(glyphName)
+        result = (0, 0, 0) if layers is None else (len(layers), 1, 0)
+        self._checkResult(result, 0, glyphName)
+        return result
+
+    def visitPaint(self, paint, paintName, depth, rootGlyphName):
+        # 'depth' is the number of Paint nodes above this one
+        self._checkLimit("maxDepth", depth + 1, rootGlyphName)
+        numNodes = 1
+        childDepth = 0
+        # PaintComposite pushes a layer for the backdrop and one for the source
+        numLayers = 2 if paintName == "PaintComposite" else 0
+        for child in self.iterChildren(paint, paintName):
+            childResult = self.walkChild(child, depth + 1, rootGlyphName)
+            numNodes += childResult[0]
+            childDepth = max(childDepth, childResult[1])
+            numLayers += childResult[2]
+            self._checkLimit("maxNodes", numNodes, rootGlyphName)
+            self._checkLimit("maxLayers", numLayers, rootGlyphName)
+        return numNodes, childDepth + 1, numLayers
+
+    def reuseResult(self, result, depth, rootGlyphName):
+        self._checkResult(result, depth, rootGlyphName)
+
+    def _checkResult(self, result, depth, rootGlyphName):
+        numNodes, subgraphDepth, numLayers = result
+        self._checkLimit("maxNodes", numNodes, rootGlyphName)
+        self._checkLimit("maxDepth", depth + subgraphDepth, rootGlyphName)
+        self._checkLimit("maxLayers", numLayers, rootGlyphName)
+
+    def _checkLimit(self, limitName, value, glyphName):
+        limit = getattr(self.limits, limitName)
+        if limit is not None and value > limit:
+            raise TraversalBudgetError(
+                f"Glyph '{glyphName}' exceeds the traversal limit "
+                f"{limitName}={limit}",
+                glyphName=glyphName,
+                limitName=limitName,
+                limit=limit,
+            )
@@ -0,0 +1,132 @@
+import pathlib
+import numpy as np
+import pytest
+from fontTools.pens.basePen import MissingComponentError
+from fontTools.pens.recordingPen import DecomposingRecordingPen, RecordingPen
+from fontTools.ttLib import TTFont
+from blackrenderer.arrayPath import (
+    ArrayPath,
+    CLOSE,
+    CUBIC,
+    END,
+    LINE,
+    MOVE,
+    QUAD,
+    getGlyphOutline,
+    replayOutline,
+)
+from blackrenderer.font import BlackRendererFont
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+
+
+def _drawTestShape(pen):
+    pen.moveTo((0, 0))
+    pen.lineTo((100, 0))
+    pen.qCurveTo((150, 50), (100, 100))
+    pen.curveTo((80, 120), (20, 120), (0, 100))
+    pen.closePath()
+
+
+def test_arrayPath_construction():
+    path = ArrayPath()
+    _drawTestShape(path)
+    assert path.verbs.dtype == np.uint8
+    assert path.points.dtype == np.float64
+    assert [MOVE, LINE, QUAD, CUBIC, CLOSE] == path.verbs.tolist()
+    assert (7, 2) == path.points.shape
+    assert (0, 0, 150, 120) == path.bounds
+
+
+def test_arrayPath_replay():
+    path = ArrayPath()
+    _drawTestShape(path)
+    expected = RecordingPen()
+    _drawTestShape(expected)
+    assert expected.value == path.value
+
+
+def test_arrayPath_impliedOnCurvePoints():
+    path = ArrayPath()
+    path.moveTo((0, 0))
+    path.qCurveTo((0, 100), (100, 100), (100, 0))
+    path.closePath()
+    assert [MOVE, QUAD, QUAD, CLOSE] == path.verbs.tolist()
+    assert [[0, 100], [50, 100], [100, 100], [100, 0]] == path.points[1:].tolist()
+
+    path = ArrayPath()
+    path.qCurveTo((0, 0), (0, 100), (100, 100), (100, 0), None)
+    path.closePath()
+    assert [MOVE, QUAD, QUAD, QUAD, QUAD, CLOSE] == path.verbs.tolist()
+    assert [50, 0] == path.points[0].tolist()
+    assert [50, 0] == path.points[-1].tolist()
+
+
+def test_arrayPath_transformed():
+    path = ArrayPath()
+    _drawTestShape(path)
+    transformed = path.transformed((2, 0, 0, 3, 10, 20))
+    assert path.verbs is transformed.verbs
+    assert (10, 20, 310, 380) == transformed.bounds
+    rotated = path.transformed((0, 1, -1, 0, 0, 0))
+    assert [100, 0] == path.points[1].tolist()
+    assert [0, 100] == rotated.points[1].tolist()
+
+
+def test_arrayPath_concat():
+    path1 = ArrayPath()
+    _drawTestShape(path1)
+    path2 = path1.transformed((1, 0, 0, 1, 500, 0))
+    path = ArrayPath.concat([path1, path2])
+    assert 10 == len(path)
+    assert (0, 0, 650, 120) == path.bounds
+    assert ArrayPath().bounds is None
+
+
+def test_arrayPath_glyphOutline():
+    font = BlackRendererFont(dataDir / "MutatorSans.ttf")
+    path = ArrayPath()
+    font._drawGlyphOutline("B", path)
+    recording = RecordingPen()
+    font._drawGlyphOutline("B", recording)
+    assert recording.value == path.value
+    assert font.getGlyphBounds("B") == pytest.approx(path.bounds)
+
+
+def test_arrayPath_addComponent():
+    glyphSet = TTFont(dataDir / "MutatorSans.ttf").getGlyphSet()
+    path = ArrayPath(glyphSet=glyphSet)
+    glyphSet["Aacute"].draw(path)
+    recording = DecomposingRecordingPen(glyphSet)
+    glyphSet["Aacute"].draw(recording)
+    assert recording.value == path.value
+    with pytest.raises(MissingComponentError):
+        glyphSet["Aacute"].draw(ArrayPath())
+
+
+@pytest.mark.parametrize("fileName", ["Nabla.subset.ttf", "crash.subset.otf"])
+def test_getGlyphOutline(fileName):
+    font = BlackRendererFont(dataDir / fileName)
+    for glyphID in range(len(font.glyphNames)):
+        verbs, coords = getGlyphOutline(font.hbFont, glyphID)
+        recording = RecordingPen()
+        replayOutline(verbs, coords, recording)
+        expected = RecordingPen()
+        font.hbFont.draw_glyph_with_pen(glyphID, expected)
+        assert expected.value == recording.value
+
+
+def test_skiaPath_appendOutline():
+    skia = pytest.importorskip("blackrenderer.backends.skia")
+    font = BlackRendererFont(dataDir / "Nabla.subset.ttf")
+    for glyphID in range(len(font.glyphNames)):
+        path = skia.SkiaPath()
+        path.appendOutline(*getGlyphOutline(font.hbFont, glyphID))
+        expected = skia.SkiaPath()
+        font.hbFont.draw_glyph_with_pen(glyphID, expected)
+        assert expected.path == path.path
+    # Skia has no END verb, these paths are built segment by segment
+    path = skia.SkiaPath()
+    path.appendOutline([MOVE, LINE, END, MOVE, LINE, CLOSE], [0, 0, 1, 1, 2, 2, 3, 3])
+    assert 5 == path.path.countVerbs()
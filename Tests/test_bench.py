@@ -0,0 +1,135 @@
+import json
+import pytest
+from blackrenderer.bench import (
+    IMPROVEMENT,
+    REGRESSION,
+    UNCHANGED,
+    calcQuartiles,
+    compareResults,
+    getEnvironmentKey,
+    loadBaseline,
+    main,
+    summarizeByPaintFormat,
+)
+
+
+environment = dict(
+    python="3.10.0",
+    implementation="CPython",
+    platform="Linux-5.15.0-x86_64-with-glibc2.35",
+    machine="x86_64",
+    versions={"fonttools": "4.37.1", "blackrenderer": "0.6.1.dev3"},
+)
+
+
+def _benchmark(name, samples, paintFormats=("PaintSolid",), backend="skia"):
+    return dict(
+        name=name,
+        stage="rasterize",
+        backend=backend,
+        paintFormats=list(paintFormats),
+        number=1,
+        samples=samples,
+    )
+
+
+def _writeResults(path, benchmarks, env=environment):
+    path.write_text(json.dumps(dict(environment=env, benchmarks=benchmarks)))
+    return str(path)
+
+
+baselineBenchmarks = [
+    _benchmark("solid", [1.0, 1.01, 0.99, 1.02, 0.98]),
+    _benchmark("gradient", [2.0, 2.01, 1.99, 2.02, 1.98], ["PaintLinearGradient"]),
+    _benchmark("noisy", [1.0, 0.6, 1.4, 0.8, 1.2]),
+]
+
+
+def test_calcQuartiles():
+    assert (2, 3, 4) == calcQuartiles([5, 1, 3, 2, 4])
+    assert (1, 1, 1) == calcQuartiles([1])
+
+
+def test_compareResults():
+    baseline = {b["name"]: b for b in baselineBenchmarks}
+    current = {
+        "solid": _benchmark("solid", [1.5, 1.51, 1.49, 1.52, 1.48]),
+        "gradient": _benchmark(
+            "gradient", [1.0, 1.01, 0.99, 1.02, 0.98], ["PaintLinearGradient"]
+        ),
+        "noisy": _benchmark("noisy", [1.3, 0.8, 1.6, 1.0, 1.4]),
+        "new": _benchmark("new", [1.0]),
+    }
+    comparisons = {c.name: c for c in compareResults(baseline, current, 0.1)}
+    assert {"solid", "gradient", "noisy"} == set(comparisons)
+    assert REGRESSION == comparisons["solid"].status
+    assert 1.5 == pytest.approx(comparisons["solid"].ratio)
+    assert IMPROVEMENT == comparisons["gradient"].status
+    # 30% slower, but within the noise
+    assert UNCHANGED == comparisons["noisy"].status
+
+    summary = summarizeByPaintFormat(comparisons.values())
+    assert ["PaintLinearGradient", "PaintSolid"] == list(summary)
+    ratio, count = summary["PaintSolid"]
+    assert 2 == count
+    assert (1.5 * 1.3) ** 0.5 == pytest.approx(ratio)
+
+
+def test_main(tmp_path, capsys):
+    baselinePath = str(tmp_path / "baseline.json")
+    before = _writeResults(tmp_path / "before.json", baselineBenchmarks)
+    assert 0 == main(["store", baselinePath, before])
+    baseline = loadBaseline(baselinePath)
+    assert [getEnvironmentKey(environment)] == list(baseline["environments"])
+
+    assert 0 == main(["compare", baselinePath, before])
+
+    slower = [
+        dict(b, samples=[s * 1.3 for s in b["samples"]]) for b in baselineBenchmarks
+    ]
+    after = _writeResults(tmp_path / "after.json", slower)
+    capsys.readouterr()
+    assert 1 == main(["compare", baselinePath, after])
+    output = capsys.readouterr().out
+    assert "regression" in output
+    assert "+30.0%  PaintSolid (2)" in output
+    assert 0 == main(["compare", baselinePath, after, "--threshold", "0.5"])
+
+    # Package versions don't select the baseline, but are reported
+    upgradedEnvironment = dict(
+        environment, versions={"fonttools": "4.38.0", "blackrenderer": "0.6.1"}
+    )
+    upgraded = _writeResults(tmp_path / "upgraded.json", slower, upgradedEnvironment)
+    capsys.readouterr()
+    assert 1 == main(["compare", baselinePath, upgraded])
+    output = capsys.readouterr().out
+    assert "warning: package versions differ from the baseline" in output
+    assert "versions.fonttools: 4.37.1 -> 4.38.0" in output
+    assert "versions.blackrenderer: 0.6.1.dev3 -> 0.6.1" in output
+    assert getEnvironmentKey(environment) == getEnvironmentKey(upgradedEnvironment)
+
+    otherEnvironment = dict(environment, python="3.11.0")
+    other = _writeResults(tmp_path / "other.json", slower, otherEnvironment)
+    with pytest.raises(SystemExit) as e:
+        main(["compare", baselinePath, other])
+    assert 2 == e.value.code
+    assert 1 == main(["compare", baselinePath, other, "--any-environment"])
+
+
+def test_main_combineRuns(tmp_path):
+    baselinePath = str(tmp_path / "baseline.json")
+    run1 = _writeResults(tmp_path / "run1.json", baselineBenchmarks[:1])
+    run2 = _writeResults(tmp_path / "run2.json", baselineBenchmarks[:1])
+    assert 0 == main(["store", baselinePath, run1, run2])
+    (entry,) = loadBaseline(baselinePath)["environments"].values()
+    assert 10 == len(entry["benchmarks"]["solid"]["samples"])
+
+
+def test_loadBaseline_rekeysEntries(tmp_path):
+    # Baselines used to be keyed on package versions as well
+    baselinePath = tmp_path / "baseline.json"
+    entry = dict(environment=environment, benchmarks={})
+    environments = {"CPython-3.10.0-x86_64-0123456789ab": entry}
+    baselinePath.write_text(json.dumps(dict(formatVersion=1, environments=environments)))
+    baseline = loadBaseline(str(baselinePath))
+    assert {getEnvironmentKey(environment): entry} == baseline["environments"]
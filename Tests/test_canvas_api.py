@@ -15,7 +15,8 @@ if not tmpOutputDir.exists():
 
 
 backends = [
-    (name, getSurfaceClass(name)) for name in ["cairo", "coregraphics", "skia", "svg"]
+    (name, getSurfaceClass(name))
+    for name in ["cairo", "coregraphics", "numpy", "skia", "svg"]
 ]
 backends = [(name, surface) for name, surface in backends if surface is not None]
 
@@ -87,6 +88,34 @@ def test_sweepGradient(backendName, surfaceClass, extend):
     assert expectedPath.read_bytes() == outputPath.read_bytes()
 
 
+test_sweepAngles = [(0, 100), (30, 60), (-90, 90), (270, 90), (200, 340), (-45, 45)]
+
+
+@pytest.mark.parametrize("startAngle, endAngle", test_sweepAngles)
+@pytest.mark.parametrize("extend", test_extendModes)
+def test_sweepGradient_numpyMatchesSkia(startAngle, endAngle, extend):
+    if getSurfaceClass("skia") is None:
+        pytest.skip("skia is not available")
+    colorLine = [(0, (1, 0, 0, 1)), (0.5, (0, 1, 0, 1)), (1, (0, 0, 1, 1))]
+    images = []
+    for backendName in ["numpy", "skia"]:
+        surface = getSurfaceClass(backendName)()
+        with surface.canvas((0, 0, 200, 200)) as canvas:
+            canvas.drawRectSweepGradient(
+                (0, 0, 200, 200),
+                colorLine,
+                (100, 100),
+                startAngle,
+                endAngle,
+                extend,
+                Identity,
+            )
+        images.append(surface.getImageArray().astype(int))
+    diff = abs(images[0] - images[1]).max(axis=-1)
+    # Only antialiasing of the color transitions may differ
+    assert (diff > 8).mean() < 0.01
+
+
 test_compositeModes = [
     CompositeMode.CLEAR,
     CompositeMode.SRC,
@@ -136,3 +165,14 @@ def test_compositeMode(backendName, surfaceClass, compositeMode):
     surface.saveImage(outputPath)
     diff = compareImages(expectedPath, outputPath)
     assert diff < 0.00013, diff
+
+
+def test_svgNestedClip(caplog):
+    surface = getSurfaceClass("svg")()
+    with surface.canvas((0, 0, 400, 400)) as canvas:
+        canvas.clipPath(canvas._rectPath((50, 50, 300, 300)))
+        canvas.clipPath(canvas._rectPath((100, 100, 300, 300)))
+        canvas.drawRectSolid((0, 0, 400, 400), (1, 0.2, 0, 1))
+        canvas.drawRectSolid((0, 0, 200, 200), (0, 0.2, 1, 1))
+    assert 1 == len(caplog.records)
+    assert "more than two nested clip paths" in caplog.records[0].getMessage()
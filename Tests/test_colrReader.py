@@ -0,0 +1,91 @@
+import gc
+import pathlib
+import pytest
+from blackrenderer.backends.recording import RecordingCanvas
+from blackrenderer.colrReader import COLRReader, readCPALPalettes
+from blackrenderer.font import BlackRendererFont
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+
+testFonts = [
+    "more_samples-glyf_colr_1.ttf",
+    "TestVariableCOLR-VF.ttf",
+    "Nabla.subset.ttf",
+    "Noto-COLRv1.subset.ttf",
+    "TwemojiMozilla.subset.default.3299.ttf",
+    "issue113.ttf",
+]
+
+
+@pytest.mark.parametrize("fileName", testFonts)
+def test_lazyReader(fileName):
+    font = BlackRendererFont(dataDir / fileName)
+    lazyFont = BlackRendererFont(dataDir / fileName, colrReader="lazy")
+    assert list(font.colrV1GlyphNames) == list(lazyFont.colrV1GlyphNames)
+    assert sorted(font.colrV0GlyphNames) == sorted(lazyFont.colrV0GlyphNames)
+    assert font.palettes == lazyFont.palettes
+    locations = [None, {"wght": 700}] if font.axisTags else [None]
+    glyphNames = list(font.colrV1GlyphNames) + list(font.colrV0GlyphNames)
+    for location in locations:
+        font.setLocation(location)
+        lazyFont.setLocation(location)
+        for glyphName in glyphNames:
+            recording = RecordingCanvas()
+            lazyRecording = RecordingCanvas()
+            font.drawGlyph(glyphName, recording)
+            lazyFont.drawGlyph(glyphName, lazyRecording)
+            assert recording.ops == lazyRecording.ops, glyphName
+            assert font.getGlyphBounds(glyphName) == lazyFont.getGlyphBounds(glyphName)
+            assert font.getPaintBounds(glyphName) == lazyFont.getPaintBounds(glyphName)
+
+
+def test_lazyReader_zeroCopy():
+    font = BlackRendererFont(
+        dataDir / "more_samples-glyf_colr_1.ttf", colrReader="lazy"
+    )
+    data = font._getTableData("COLR")
+    assert isinstance(data, memoryview)
+    assert data.obj is font._fontData
+    assert data == font.ttFont.getTableData("COLR")
+
+
+def test_COLRReader():
+    font = BlackRendererFont(dataDir / "more_samples-glyf_colr_1.ttf")
+    ttFont = font.ttFont
+    reader = COLRReader(
+        ttFont.getTableData("COLR"), ttFont.getGlyphOrder(), ttFont.getGlyphID
+    )
+    assert 1 == reader.version
+    assert "composite_colr_glyph" in reader.baseGlyphPaintRecords
+    assert ".notdef" not in reader.baseGlyphPaintRecords
+    assert "no such glyph" not in reader.baseGlyphPaintRecords
+    record = reader.baseGlyphPaintRecords["composite_colr_glyph"]
+    assert "composite_colr_glyph" == record.BaseGlyph
+    paint = record.Paint
+    assert 32 == paint.Format
+    assert paint.SourcePaint is paint.SourcePaint
+    with pytest.raises(AttributeError):
+        paint.Glyph
+
+    # Decoded tables are freed when they're no longer used
+    del record, paint
+    gc.collect()
+    assert 0 == len(reader._tables)
+
+    layers = reader.layerList.Paint
+    assert [p.Format for p in layers[:3]] == [p.Format for p in layers[0:3]]
+    assert layers[-1] is layers[len(layers) - 1]
+    with pytest.raises(IndexError):
+        layers[len(layers)]
+
+
+def test_readCPALPalettes():
+    font = BlackRendererFont(dataDir / "more_samples-glyf_colr_1.ttf")
+    palettes = readCPALPalettes(font.ttFont.getTableData("CPAL"))
+    assert font.palettes == palettes
+
+
+def test_unknownCOLRReader():
+    with pytest.raises(ValueError, match="unknown COLR reader"):
+        BlackRendererFont(dataDir / "more_samples-glyf_colr_1.ttf", colrReader="x")
@@ -0,0 +1,109 @@
+import pathlib
+from fontTools.misc.transform import Identity
+from fontTools.ttLib.tables.otTables import CompositeMode, ExtendMode
+import numpy as np
+import pytest
+from blackrenderer.backends.numpy import NumpyPixelSurface
+from blackrenderer.backends.recording import (
+    BEGIN_COMPOSITE,
+    CLIP,
+    DRAW_LINEAR_GRADIENT,
+    DRAW_SOLID,
+    END_COMPOSITE,
+    RESTORE,
+    SAVE,
+    RecordingCanvas,
+)
+from blackrenderer.font import BlackRendererFont
+
+
+pytest.importorskip("pathops")
+from blackrenderer.flatten import flattenRecording  # noqa: E402
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+
+testFonts = [
+    "more_samples-glyf_colr_1.ttf",
+    "Nabla.subset.ttf",
+    "Noto-COLRv1.subset.ttf",
+    "nested-paintglyph.ttf",
+]
+
+flatOps = {DRAW_SOLID, DRAW_LINEAR_GRADIENT, BEGIN_COMPOSITE, END_COMPOSITE}
+
+
+def _rectPath(canvas, xMin, yMin, xMax, yMax):
+    path = canvas.newPath()
+    path.moveTo((xMin, yMin))
+    path.lineTo((xMin, yMax))
+    path.lineTo((xMax, yMax))
+    path.lineTo((xMax, yMin))
+    path.closePath()
+    return path
+
+
+def _render(recording, bounds):
+    surface = NumpyPixelSurface()
+    with surface.canvas(bounds) as canvas:
+        recording.replay(canvas)
+    return surface.getImageArray(premultiplied=True).astype(int)
+
+
+@pytest.mark.parametrize("fileName", testFonts)
+def test_flattenRecording_fonts(fileName):
+    font = BlackRendererFont(dataDir / fileName)
+    for glyphName in font.colrV1GlyphNames:
+        recording = font.compileGlyph(glyphName, optimize=False)
+        flattened = font.compileGlyph(glyphName, flatten=True)
+        assert all(op[0] not in {SAVE, CLIP} for op in flattened.ops), glyphName
+        xMin, yMin, xMax, yMax = font.getGlyphBounds(glyphName)
+        if xMin >= xMax or yMin >= yMax:
+            continue
+        scale = 100 / max(xMax - xMin, yMax - yMin)
+        bounds = tuple(round(v * scale) for v in (xMin, yMin, xMax, yMax))
+        images = []
+        for r in [recording, flattened]:
+            scaled = RecordingCanvas()
+            with scaled.savedState():
+                scaled.scale(scale)
+                r.replay(scaled)
+            images.append(_render(scaled, bounds))
+        assert np.abs(images[0] - images[1]).max() <= 16, glyphName
+
+
+def test_flattenRecording_clips():
+    recording = RecordingCanvas()
+    colorLine = [(0, (1, 0, 0, 1)), (1, (0, 0, 1, 1))]
+    with recording.savedState():
+        recording.clipPath(_rectPath(recording, 0, 0, 30, 30))
+        with recording.savedState():
+            recording.translate(10, 10)
+            recording.clipPath(_rectPath(recording, 0, 0, 30, 30))
+            recording.drawPathLinearGradient(
+                None, colorLine, (0, 0), (20, 0), ExtendMode.PAD, Identity
+            )
+        recording.drawPathSolid(_rectPath(recording, 20, 20, 40, 40), (0, 1, 0, 1))
+        # A SRC_IN layer clears everything within the clip but outside its
+        # content
+        with recording.compositeMode(CompositeMode.SRC_IN):
+            recording.drawPathSolid(_rectPath(recording, 0, 0, 25, 25), (0, 0, 0, 1))
+    flattened = flattenRecording(recording)
+    assert [op[0] for op in flattened.ops] == [
+        DRAW_LINEAR_GRADIENT,
+        DRAW_SOLID,
+        SAVE,
+        CLIP,
+        BEGIN_COMPOSITE,
+        DRAW_SOLID,
+        END_COMPOSITE,
+        RESTORE,
+    ]
+    gradientPath = flattened.paths[flattened.ops[0][1]]
+    assert (10, 10, 30, 30) == gradientPath.bounds
+    assert (10, 10) == flattened.ops[0][3]
+    solidPath = flattened.paths[flattened.ops[1][1]]
+    assert (20, 20, 30, 30) == solidPath.bounds
+    assert np.array_equal(
+        _render(recording, (0, 0, 50, 50)), _render(flattened, (0, 0, 50, 50))
+    )
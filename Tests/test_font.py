@@ -1,5 +1,11 @@
 import pathlib
+import pytest
+from fontTools.colorLib.builder import buildCOLR, buildCPAL
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib.tables.otTables import PaintFormat
 from blackrenderer.font import BlackRendererFont
+from blackrenderer.render import renderText
 
 
 testDir = pathlib.Path(__file__).resolve().parent
@@ -10,3 +16,116 @@ def test_font():
     font = BlackRendererFont(testFont1)
     assert len(font.glyphNames) > len(font.colrV0GlyphNames)
     assert len(font.glyphNames) > len(font.colrV1GlyphNames)
+
+
+testFonts = {
+    "mutator": testDir / "data" / "MutatorSans.ttf",
+    "more_samples": testDir / "data" / "more_samples-glyf_colr_1.ttf",
+    "nested_paintglyph": testDir / "data" / "nested-paintglyph.ttf",
+    "ftvartest": testDir / "data" / "TestVariableCOLR-VF.ttf",
+}
+
+
+test_paintBounds = [
+    ("mutator", "A", None, (20, 0, 376, 700)),
+    ("mutator", "A", {"wdth": 1000}, (50, 0, 1140, 700)),
+    ("mutator", "space", None, None),
+    ("more_samples", "transformed_sweep", None, (308, 194, 1000, 906)),
+    ("more_samples", "clip_box_center", None, (250, 250, 750, 750)),
+    ("more_samples", "composite_SRC_IN", None, (250, 250, 750, 750)),
+    ("more_samples", "composite_XOR", None, (166, 166, 834, 834)),
+    ("more_samples", "composite_colr_glyph", None, (150, 250, 850, 950)),
+    ("more_samples", "scale_1.5_1.5_center_0_0", None, (250, 250, 1125, 1125)),
+    ("nested_paintglyph", "A", None, (53, 163, 547, 457)),
+    ("ftvartest", "A", {"wght": 400}, (398, -130, 878, 590)),
+    ("ftvartest", "A", {"wght": 700}, (398, -130, 978, 590)),
+]
+
+
+@pytest.mark.parametrize(
+    "fontName, glyphName, location, expectedBounds", test_paintBounds
+)
+def test_getPaintBounds(fontName, glyphName, location, expectedBounds):
+    font = BlackRendererFont(testFonts[fontName])
+    bounds = font.getPaintBounds(glyphName, location)
+    if expectedBounds is None:
+        assert bounds is None
+    else:
+        assert expectedBounds == tuple(round(v) for v in bounds)
+    # The location argument must not change the current location
+    assert [] == font.hbFont.get_var_coords_normalized()
+
+
+def test_getPaintBounds_cache():
+    font = BlackRendererFont(testFonts["ftvartest"])
+    font.setLocation({"wght": 700})
+    bounds = font.getPaintBounds("A")
+    assert bounds is font.getPaintBounds("A")
+    assert bounds is font.getPaintBounds("A", {"wght": 700})
+    assert bounds != font.getPaintBounds("A", {"wght": 400})
+
+
+unboundedPaints = [
+    {"Format": PaintFormat.PaintSolid, "PaletteIndex": 0, "Alpha": 1.0},
+    {
+        "Format": PaintFormat.PaintLinearGradient,
+        "ColorLine": {"ColorStop": [(0, 0), (1, 1)]},
+        "x0": 0,
+        "y0": 0,
+        "x1": 500,
+        "y1": 0,
+        "x2": 0,
+        "y2": 500,
+    },
+]
+
+
+def _buildUnboundedFont(path, rootPaint, baseOutline=False):
+    # A COLRv1 glyph "A" without a ClipBox, whose paint fills everything
+    fb = FontBuilder(1000, isTTF=True)
+    glyphOrder = [".notdef", "A"]
+    fb.setupGlyphOrder(glyphOrder)
+    fb.setupCharacterMap({ord("A"): "A"})
+    glyphs = {glyphName: TTGlyphPen(None).glyph() for glyphName in glyphOrder}
+    if baseOutline:
+        pen = TTGlyphPen(None)
+        pen.moveTo((100, 0))
+        pen.lineTo((500, 0))
+        pen.lineTo((500, 700))
+        pen.closePath()
+        glyphs["A"] = pen.glyph()
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics(
+        {
+            glyphName: (600, getattr(glyph, "xMin", 0))
+            for glyphName, glyph in glyphs.items()
+        }
+    )
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupOS2()
+    fb.setupPost()
+    fb.font["COLR"] = buildCOLR({"A": rootPaint})
+    fb.font["CPAL"] = buildCPAL([[(1, 0, 0, 1), (0, 0, 1, 1)]])
+    fb.save(path)
+
+
+@pytest.mark.parametrize("rootPaint", unboundedPaints)
+def test_getGlyphBounds_unboundedPaint(tmpdir, rootPaint):
+    fontPath = pathlib.Path(tmpdir) / "unbounded.ttf"
+    _buildUnboundedFont(fontPath, rootPaint)
+    font = BlackRendererFont(fontPath)
+    assert (0, 0, 0, 0) == font.getGlyphBounds("A")
+    font.getPaintBounds("A")
+    renderText(fontPath, "AA", pathlib.Path(tmpdir) / "unbounded.png")
+    renderText(fontPath, "AA", pathlib.Path(tmpdir) / "cropped.png", autoCrop=True)
+
+
+@pytest.mark.parametrize(
+    "baseOutline, expectedBounds", [(False, None), (True, (100, 0, 500, 700))]
+)
+def test_getPaintBounds_unboundedPaint(tmpdir, baseOutline, expectedBounds):
+    fontPath = pathlib.Path(tmpdir) / "unbounded.ttf"
+    _buildUnboundedFont(fontPath, unboundedPaints[0], baseOutline)
+    font = BlackRendererFont(fontPath)
+    font.getGlyphBounds = None  # The fallback must not go through it
+    assert expectedBounds == font.getPaintBounds("A")
@@ -0,0 +1,90 @@
+import pathlib
+import numpy as np
+import uharfbuzz as hb
+from blackrenderer.backends.numpy import NumpyPixelSurface
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.glyphAtlas import GlyphAtlas, quantizePosition
+from blackrenderer.render import buildGlyphLine
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+
+
+def _shape(font, text):
+    buf = hb.Buffer()
+    buf.add_str(text)
+    buf.guess_segment_properties()
+    hb.shape(font.hbFont, buf)
+    return buildGlyphLine(buf.glyph_infos, buf.glyph_positions, font.glyphNames)
+
+
+def test_glyphAtlas_renderGlyphLine():
+    font = BlackRendererFont(dataDir / "Nabla.subset.ttf")
+    glyphLine = _shape(font, "ABCABC")
+    fontSize = 40
+    atlas = GlyphAtlas()
+    image, bounds = atlas.renderGlyphLine(font, glyphLine, fontSize, margin=2)
+    assert (3, 3, 0) == (atlas.misses, atlas.hits, atlas.evictions)
+    assert (bounds[3] - bounds[1], bounds[2] - bounds[0], 4) == image.shape
+    # Draw the same line directly, at the same whole pixel positions
+    scaleFactor = fontSize / font.unitsPerEm
+    surface = NumpyPixelSurface()
+    with surface.canvas(bounds) as canvas:
+        x = 0
+        for glyph in glyphLine:
+            with canvas.savedState():
+                canvas.translate(round(x * scaleFactor), 0)
+                canvas.scale(scaleFactor)
+                font.drawGlyph(glyph.name, canvas)
+            x += glyph.xAdvance
+    expected = surface.getImageArray(premultiplied=True).astype(int)
+    # Overlapping glyphs are composited in 8 bits
+    assert np.abs(expected - image.astype(int)).max() <= 2
+    image2, bounds2 = atlas.renderGlyphLine(font, glyphLine, fontSize, margin=2)
+    assert (3, 9) == (atlas.misses, atlas.hits)
+    assert bounds == bounds2
+    assert np.array_equal(image, image2)
+
+
+def test_glyphAtlas_eviction():
+    font = BlackRendererFont(dataDir / "Nabla.subset.ttf")
+    # One glyph per page
+    atlas = GlyphAtlas(pageSize=44, maxPages=2)
+    cellA = atlas.getCell(font, "A", 40)
+    atlas.getCell(font, "B", 40)
+    atlas.getCell(font, "A", 40)
+    assert 2 == len(atlas.pages)
+    assert 2 * 44 * 44 * 4 == atlas.memoryUsage
+    # "B" is on the least recently used page
+    atlas.getCell(font, "C", 40)
+    assert 1 == atlas.evictions
+    assert cellA is atlas.getCell(font, "A", 40)
+    atlas.getCell(font, "B", 40)
+    assert (4, 2, 2) == (atlas.misses, atlas.hits, atlas.evictions)
+    # Glyphs that don't fit in a page are drawn, but not kept
+    cell = atlas.getCell(font, "A", 100)
+    assert cell.pageIndex is None
+    assert cell.image.shape[0] > 44
+    # Cells used by a line are not evicted while the line is being drawn
+    glyphLine = _shape(font, "ABC")
+    image, _ = atlas.renderGlyphLine(font, glyphLine, 30)
+    fresh, _ = GlyphAtlas().renderGlyphLine(font, glyphLine, 30)
+    assert np.array_equal(image, fresh)
+
+
+def test_quantizePosition():
+    assert (3, 0.25) == quantizePosition(3.2, 4)
+    assert (4, 0) == quantizePosition(3.9, 4)
+    assert (-4, 0.75) == quantizePosition(-3.3, 4)
+    assert (3, 0) == quantizePosition(3.4, 1)
+
+
+def test_glyphAtlas_subpixelPhases():
+    font = BlackRendererFont(dataDir / "Nabla.subset.ttf")
+    glyphLine = _shape(font, "AAAAAAAA")
+    atlas = GlyphAtlas()
+    atlas.renderGlyphLine(font, glyphLine, 37, subpixelPhases=(4, 1))
+    assert 1 < atlas.misses <= 4
+    atlas = GlyphAtlas()
+    atlas.renderGlyphLine(font, glyphLine, 37)
+    assert 1 == atlas.misses
@@ -0,0 +1,152 @@
+import os
+import pathlib
+from blackrenderer.backends.svg import SVGSurface
+from blackrenderer.diskCache import DiskCache
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.glyphCache import GlyphCache
+from blackrenderer.render import renderText
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+glyphNames = ["composite_colr_glyph", "clip_box_center", "transformed_sweep"]
+
+
+def _renderSVG(drawGlyph, font, glyphName, tmpdir):
+    surface = SVGSurface()
+    bounds = tuple(round(v) for v in font.getGlyphBounds(glyphName))
+    with surface.canvas(bounds) as canvas:
+        drawGlyph(glyphName, canvas)
+    outputPath = pathlib.Path(tmpdir) / "glyph.svg"
+    surface.saveImage(outputPath)
+    return outputPath.read_bytes()
+
+
+def _listEntries(cacheDir):
+    return sorted(p for p in pathlib.Path(cacheDir).glob("*/*") if p.is_file())
+
+
+def test_glyphCache(tmpdir):
+    cacheDir = pathlib.Path(tmpdir) / "cache"
+    font = BlackRendererFont(fontPath)
+    cache = GlyphCache(cacheDir)
+    for glyphName in glyphNames:
+        expected = _renderSVG(font.drawGlyph, font, glyphName, tmpdir)
+        drawGlyph = lambda *args: cache.drawGlyph(font, *args)  # noqa: E731
+        assert expected == _renderSVG(drawGlyph, font, glyphName, tmpdir)
+    assert (0, 3) == (cache.hits, cache.misses)
+    assert 3 == len(_listEntries(cacheDir))
+
+    # A fresh cache instance, as in a new process, renders warm
+    font = BlackRendererFont(fontPath)
+    cache = GlyphCache(cacheDir)
+    for glyphName in glyphNames:
+        expected = _renderSVG(font.drawGlyph, font, glyphName, tmpdir)
+        drawGlyph = lambda *args: cache.drawGlyph(font, *args)  # noqa: E731
+        assert expected == _renderSVG(drawGlyph, font, glyphName, tmpdir)
+    assert (3, 0) == (cache.hits, cache.misses)
+
+
+def test_glyphCache_keys(tmpdir):
+    font = BlackRendererFont(dataDir / "TestVariableCOLR-VF.ttf")
+    cache = GlyphCache(tmpdir)
+    cache.getRecording(font, "A")
+    cache.getRecording(font, "A")
+    font.setLocation({"wght": 700})
+    cache.getRecording(font, "A")
+    cache.getRecording(font, "A", textColor=(1, 0, 0, 1))
+    assert (1, 3) == (cache.hits, cache.misses)
+    entries = _listEntries(tmpdir)
+    assert 3 == len(entries)
+    assert {font.contentHash} == {p.parent.name for p in entries}
+
+
+def test_glyphCache_invalidEntry(tmpdir):
+    font = BlackRendererFont(fontPath)
+    cache = GlyphCache(tmpdir)
+    recording = cache.getRecording(font, "composite_colr_glyph")
+    (entryPath,) = _listEntries(tmpdir)
+    entryPath.write_bytes(entryPath.read_bytes()[:-3])
+    cache = GlyphCache(tmpdir)
+    assert (
+        recording.toBytes()
+        == cache.getRecording(font, "composite_colr_glyph").toBytes()
+    )
+    assert (0, 1) == (cache.hits, cache.misses)
+    assert recording.toBytes() == entryPath.read_bytes()
+
+
+def test_glyphCache_eviction(tmpdir):
+    font = BlackRendererFont(fontPath)
+    cache = GlyphCache(tmpdir)
+    for glyphName in glyphNames:
+        cache.getRecording(font, glyphName)
+    entries = _listEntries(tmpdir)
+    sizes = [p.stat().st_size for p in entries]
+    # Make the entry for the first glyph the least recently used one
+    for i, p in enumerate(entries):
+        os.utime(p, (1000 + i, 1000 + i))
+    cache.getRecording(font, glyphNames[0])
+    lruPath = min(entries, key=lambda p: p.stat().st_mtime)
+
+    cache = GlyphCache(tmpdir, maxSize=sum(sizes) - 1)
+    cache.evict()
+    remaining = _listEntries(tmpdir)
+    assert lruPath not in remaining
+    assert sum(p.stat().st_size for p in remaining) <= cache.maxSize * 0.75
+    cache.clear()
+    assert [] == _listEntries(tmpdir)
+
+
+def test_contentHash():
+    font1 = BlackRendererFont(fontPath)
+    font2 = BlackRendererFont(fontPath)
+    font3 = BlackRendererFont(dataDir / "TestVariableCOLR-VF.ttf")
+    assert 64 == len(font1.contentHash)
+    assert font1.contentHash == font2.contentHash
+    assert font1.contentHash != font3.contentHash
+
+
+def test_glyphCache_optimize(tmpdir):
+    font = BlackRendererFont(fontPath)
+    cache = GlyphCache(tmpdir)
+    optimizingCache = GlyphCache(tmpdir, optimize=True)
+    for glyphName in glyphNames:
+        recording = cache.getRecording(font, glyphName)
+        optimized = optimizingCache.getRecording(font, glyphName)
+        assert len(optimized.ops) < len(recording.ops)
+    assert 2 * len(glyphNames) == len(_listEntries(tmpdir))
+
+
+def test_glyphCache_tmpFiles(tmpdir):
+    font = BlackRendererFont(fontPath)
+    cache = GlyphCache(tmpdir)
+    for glyphName in glyphNames:
+        cache.getRecording(font, glyphName)
+    entryDir = _listEntries(tmpdir)[0].parent
+    # Another process is still writing this one
+    writingPath = entryDir / "writing.tmp"
+    writingPath.write_bytes(b"x" * 100)
+    # A crashed writer left this one behind
+    stalePath = entryDir / "stale.tmp"
+    stalePath.write_bytes(b"x" * 100)
+    os.utime(stalePath, (1000, 1000))
+    cache.clear()
+    assert [writingPath] == _listEntries(tmpdir)
+
+
+def test_renderText_glyphCacheReused(tmpdir, monkeypatch):
+    calcSizeCalls = []
+    calcSize = DiskCache._calcSize
+
+    def countingCalcSize(self):
+        calcSizeCalls.append(self.cacheDir)
+        return calcSize(self)
+
+    monkeypatch.setattr(DiskCache, "_calcSize", countingCalcSize)
+    cacheDir = pathlib.Path(tmpdir) / "cache"
+    for text, fileName in [("ABC", "text1.svg"), ("DEF", "text2.svg")]:
+        outputPath = pathlib.Path(tmpdir) / fileName
+        renderText(fontPath, text, outputPath, glyphCacheDir=cacheDir)
+    # The size of the cache directory is only computed on the first write
+    assert 1 == len(calcSizeCalls)
@@ -0,0 +1,137 @@
+import json
+import os
+import pathlib
+import sys
+import pytest
+from blackrenderer.backends.recording import RecordingCanvas
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.glyphComplexity import (
+    ComplexityAnalyzer,
+    CostModel,
+    GlyphComplexity,
+    analyzeFont,
+    calibrateCostModel,
+    costFeatures,
+    main,
+)
+from blackrenderer.paintStats import PaintStats
+
+
+testDir = pathlib.Path(__file__).resolve().parent
+dataDir = testDir / "data"
+sys.path.insert(0, os.fspath(testDir.parent / "benchmarks"))
+
+from benchmarkScaling import loadStressFont  # noqa: E402
+from stressFont import StressFontParameters  # noqa: E402
+
+
+def _countVisitedPaints(font, glyphName):
+    font.paintStats = PaintStats()
+    font.drawGlyph(glyphName, RecordingCanvas())
+    numPaints = sum(entry.count for entry in font.paintStats.getPaintStats().values())
+    font.paintStats = None
+    return numPaints
+
+
+def test_analyzeFont():
+    font = BlackRendererFont(dataDir / "more_samples-glyf_colr_1.ttf")
+    complexities = {c.glyphName: c for c in analyzeFont(font)}
+    colrGlyphNames = set(font.colrV1GlyphNames) | set(font.colrV0GlyphNames)
+    assert colrGlyphNames == set(complexities)
+    for glyphName in font.colrV1GlyphNames:
+        complexity = complexities[glyphName]
+        assert _countVisitedPaints(font, glyphName) == complexity.nodeCount
+    expectedComplexity = GlyphComplexity(
+        glyphName="composite_colr_glyph",
+        nodeCount=8,
+        maxDepth=5,
+        outlinePoints=88,
+        fillArea=980000,
+        compositeCount=1,
+        gradientCount=2,
+        isVariable=False,
+    )
+    assert expectedComplexity == complexities["composite_colr_glyph"]
+    complexity = complexities["colored_circles_v0"]
+    assert 8 == complexity.nodeCount
+    assert 1 == complexity.maxDepth
+    assert 0 < complexity.outlinePoints
+    assert 0 < complexity.fillArea
+
+
+def test_analyzeFont_variable():
+    font = BlackRendererFont(dataDir / "TestVariableCOLR-VF.ttf")
+    complexities = analyzeFont(font)
+    assert complexities
+    assert any(c.isVariable for c in complexities)
+
+
+def test_analyzeGlyph_sharedSubgraphs():
+    font = loadStressFont(StressFontParameters(layers=3, depth=4, fanOut=4))
+    analyzer = ComplexityAnalyzer(font)
+    complexity = analyzer.analyzeGlyph("stress")
+    assert _countVisitedPaints(font, "stress") == complexity.nodeCount
+    assert 19 == complexity.maxDepth
+    # The paint graph is analyzed once per distinct node
+    assert len(analyzer._paintCache) < 100 < complexity.nodeCount
+
+
+def test_calibrateCostModel():
+    coefficients = dict(
+        nodeCount=1e-5,
+        outlinePoints=1e-6,
+        fillArea=1e-10,
+        compositeCount=5e-4,
+        gradientCount=2e-4,
+        isVariable=1e-4,
+    )
+    expectedModel = CostModel(["traverse", "rasterize"], "skia", 1e-4, coefficients)
+    benchmarks = []
+    for i in range(20):
+        complexity = dict(
+            nodeCount=1 + i * 7 % 13,
+            maxDepth=3,
+            outlinePoints=10 + i * 31 % 17,
+            fillArea=1000 * (i * 11 % 19),
+            compositeCount=i % 3,
+            gradientCount=i * 5 % 7,
+            isVariable=bool(i % 2),
+        )
+        cost = expectedModel.predict(GlyphComplexity("x", **complexity))
+        for stage, backend, fraction in [
+            ("traverse", None, 0.25),
+            ("rasterize", "skia", 0.75),
+            ("rasterize", "svg", 0.1),
+        ]:
+            benchmarks.append(
+                dict(
+                    stage=stage,
+                    backend=backend,
+                    font="test",
+                    glyph=f"glyph{i}",
+                    complexity=complexity,
+                    samples=[cost * fraction],
+                )
+            )
+    model = calibrateCostModel(benchmarks)
+    assert model.intercept == pytest.approx(expectedModel.intercept)
+    assert costFeatures == list(model.coefficients)
+    for name, coefficient in coefficients.items():
+        assert model.coefficients[name] == pytest.approx(coefficient)
+
+    with pytest.raises(ValueError):
+        calibrateCostModel(benchmarks[:9])
+
+
+def test_main(tmpdir, capsys):
+    fontPath = os.fspath(dataDir / "more_samples-glyf_colr_1.ttf")
+    main(["report", fontPath, "--top", "3"])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split()[:2] == ["glyph", "nodes"]
+    assert 3 + 3 == len(lines)
+
+    modelPath = os.path.join(tmpdir, "model.json")
+    CostModel(["traverse"], None, 1.0, dict(nodeCount=1.0)).save(modelPath)
+    main(["report", fontPath, "composite_colr_glyph", "--model", modelPath, "--json"])
+    (report,) = json.loads(capsys.readouterr().out)
+    assert 9.0 == report["predictedCost"]
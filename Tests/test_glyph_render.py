@@ -4,6 +4,7 @@ from fontTools.misc.arrayTools import scaleRect, intRect
 from blackrenderer.font import BlackRendererFont
 from blackrenderer.backends import getSurfaceClass
 from blackrenderer.backends.pathCollector import BoundsCanvas, PathCollectorCanvas
+from blackrenderer.hbPaint import hasPaintAPI
 from compareImages import compareImages
 
 
@@ -16,9 +17,11 @@ if not tmpOutputDir.exists():
 
 
 backends = [
-    (name, getSurfaceClass(name)) for name in ["cairo", "coregraphics", "skia", "svg"]
+    (name, getSurfaceClass(name))
+    for name in ["cairo", "coregraphics", "numpy", "skia", "svg"]
 ]
 backends = [(name, surface) for name, surface in backends if surface is not None]
+pixelBackends = [(name, surface) for name, surface in backends if name != "svg"]
 
 
 testFonts = {
@@ -142,6 +145,52 @@ def test_renderGlyph(
     assert diff < 0.00012, diff
 
 
+# The reference images for these were made with a fontTools version that
+# reads sweep gradient angles without the 180 degree bias of the spec
+unbiasedSweepGlyphs = {
+    ("more_samples", "transformed_sweep"),
+    ("more_samples", "composite_colr_glyph"),
+}
+
+
+@pytest.mark.skipif(not hasPaintAPI, reason="uharfbuzz has no paint API")
+@pytest.mark.parametrize("fontName, glyphName, location, paletteIndex", test_glyphs)
+@pytest.mark.parametrize("backendName, surfaceClass", pixelBackends)
+def test_renderGlyph_harfbuzzEngine(
+    backendName, surfaceClass, fontName, glyphName, location, paletteIndex
+):
+    if (fontName, glyphName) in unbiasedSweepGlyphs:
+        pytest.skip("HarfBuzz biases sweep angles, the reference images don't")
+    font = BlackRendererFont(testFonts[fontName], engine="harfbuzz")
+    font.setLocation(location)
+
+    scaleFactor = 1 / 4
+    boundingBox = font.getGlyphBounds(glyphName)
+    boundingBox = scaleRect(boundingBox, scaleFactor, scaleFactor)
+    boundingBox = intRect(boundingBox)
+    palette = font.getPalette(paletteIndex)
+
+    surface = surfaceClass()
+    ext = surface.fileExtension
+    with surface.canvas(boundingBox) as canvas:
+        canvas.scale(scaleFactor)
+        font.drawGlyph(glyphName, canvas, palette=palette)
+
+    locationString = "_" + _locationToString(location) if location else ""
+    paletteString = "_" + str(paletteIndex) if paletteIndex else ""
+    fileName = (
+        f"glyph_{fontName}_{glyphName}{locationString}{paletteString}"
+        f"_{backendName}{ext}"
+    )
+    expectedPath = expectedOutputDir / fileName
+    outputPath = tmpOutputDir / ("hb_" + fileName)
+    surface.saveImage(outputPath)
+    diff = compareImages(expectedPath, outputPath)
+    # HarfBuzz quantizes colors to 8 bits, so allow for a little more
+    # difference. SVG output is not compared for the same reason.
+    assert diff < 0.0004, diff
+
+
 def _locationToString(location):
     return ",".join(f"{name}={value}" for name, value in sorted(location.items()))
 
@@ -217,3 +266,8 @@ def test_recursive():
     with surface.canvas(boundingBox) as canvas:
         with pytest.raises(RecursionError):
             font.drawGlyph(glyphName, canvas)
+
+
+def test_unknownEngine():
+    with pytest.raises(ValueError, match="unknown engine"):
+        BlackRendererFont(testFonts["mutator"], engine="rust")
@@ -1,3 +1,4 @@
+import json
 import os
 import pathlib
 import subprocess
@@ -30,6 +31,54 @@ def test_mainprog(tmpdir, testString, fontPath, outputFormat):
     assert os.path.isfile(outputPath)
 
 
+def test_mainprog_multipleOutputs(tmpdir):
+    outputPaths = [os.path.join(tmpdir, "test" + suffix) for suffix in [".png", ".svg"]]
+    args = [
+        "blackrenderer",
+        os.fspath(dataDir / "MutatorSans.ttf"),
+        "ABC",
+        *outputPaths,
+        "--font-size",
+        "50",
+    ]
+    subprocess.check_output(args)
+    for outputPath in outputPaths:
+        assert os.path.isfile(outputPath)
+
+
+def test_mainprog_stats(tmpdir):
+    outputPath = os.path.join(tmpdir, "test.svg")
+    args = [
+        "blackrenderer",
+        os.fspath(dataDir / "more_samples-glyf_colr_1.ttf"),
+        "1",
+        outputPath,
+        "--stats",
+    ]
+    result = subprocess.run(args, check=True, capture_output=True, text=True)
+    assert "Glyph gradient_p2_skewed: 1 draws" in result.stderr
+    assert "PaintLinearGradient" in result.stderr
+    assert "SVGCanvas.drawPathLinearGradient" in result.stderr
+
+
+def test_mainprog_trace(tmpdir):
+    outputPath = os.path.join(tmpdir, "test.svg")
+    tracePath = os.path.join(tmpdir, "trace.json")
+    args = [
+        "blackrenderer",
+        os.fspath(dataDir / "more_samples-glyf_colr_1.ttf"),
+        "1",
+        outputPath,
+        "--trace",
+        tracePath,
+    ]
+    subprocess.check_output(args)
+    with open(tracePath) as f:
+        trace = json.load(f)
+    names = {event["name"] for event in trace["traceEvents"]}
+    assert {"renderText", "hb.shape", "drawGlyph", "saveImage"} <= names
+
+
 expectedSVGOutput = """\
 <?xml version='1.0' encoding='ASCII'?>
 <svg width="42" height="75" preserveAspectRatio="xMinYMin slice" viewBox="-17 -20 42 75" version="1.1" xmlns="http://www.w3.org/2000/svg">
@@ -0,0 +1,124 @@
+import pathlib
+from fontTools.pens.recordingPen import RecordingPen
+import numpy as np
+import pytest
+from blackrenderer.arrayPath import ArrayPath
+from blackrenderer.backends.recording import RecordingCanvas
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.glyphCache import GlyphCache
+from blackrenderer.outlineStore import OutlineStore, getCOLRLayerGlyphNames
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+
+testFonts = [
+    "more_samples-glyf_colr_1.ttf",
+    "TestVariableCOLR-VF.ttf",
+    "Nabla.subset.ttf",
+    "Noto-COLRv1.subset.ttf",
+]
+
+
+def _drawAllGlyphs(font, glyphNames):
+    results = []
+    for glyphName in glyphNames:
+        recording = RecordingCanvas()
+        font.drawGlyph(glyphName, recording)
+        paths = [(p.verbs.tolist(), p.points.tolist()) for p in recording.paths]
+        results.append((recording.ops, paths, font.getPaintBounds(glyphName)))
+    return results
+
+
+@pytest.mark.parametrize("colrReader", ["fonttools", "lazy"])
+@pytest.mark.parametrize("fileName", testFonts)
+def test_outlineStore_drawGlyph(fileName, colrReader):
+    font = BlackRendererFont(dataDir / fileName, colrReader=colrReader)
+    glyphNames = list(font.colrV1GlyphNames) + list(font.colrV0GlyphNames)
+    expected = _drawAllGlyphs(BlackRendererFont(dataDir / fileName), glyphNames)
+    outlineStore = OutlineStore.fromFont(font, getCOLRLayerGlyphNames(font))
+    font.outlineStore = OutlineStore.fromBytes(outlineStore.toBytes())
+    assert expected == _drawAllGlyphs(font, glyphNames)
+
+
+def test_outlineStore():
+    font = BlackRendererFont(dataDir / "Nabla.subset.ttf")
+    outlineStore = OutlineStore.fromFont(font)
+    assert len(font.glyphNames) == len(outlineStore)
+    for glyphID, glyphName in enumerate(font.glyphNames):
+        assert glyphID in outlineStore
+        expected = ArrayPath()
+        font._drawGlyphOutline(glyphName, expected)
+        path = outlineStore.getPath(glyphID)
+        assert np.array_equal(expected.verbs, path.verbs)
+        assert np.array_equal(expected.points, path.points)
+        assert expected.bounds == outlineStore.getBounds(glyphID)
+        pen = RecordingPen()
+        assert outlineStore.drawOutline(glyphID, pen)
+        assert expected.value == pen.value
+    assert len(font.glyphNames) not in outlineStore
+    assert outlineStore.getPath(len(font.glyphNames)) is None
+    assert not outlineStore.drawOutline(len(font.glyphNames), ArrayPath())
+
+    # Arrays are shared with the paths, and can't be modified through them
+    path = outlineStore.getPath(1)
+    with pytest.raises(ValueError):
+        path.points[0] = (0, 0)
+
+    # Appending to a path copies
+    path.appendArrays(*outlineStore.getArrays(1))
+    assert 2 * len(outlineStore.getPath(1)) == len(path)
+
+
+def test_outlineStore_location():
+    font = BlackRendererFont(dataDir / "TestVariableCOLR-VF.ttf")
+    outlineStore = OutlineStore.fromFont(font, location={"wght": 700})
+    font.setLocation({"wght": 700})
+    assert outlineStore.normalizedCoords == tuple(
+        font.hbFont.get_var_coords_normalized()
+    )
+    glyphName = font.ttFont.getGlyphName(outlineStore.glyphIDs[-1])
+    expected = ArrayPath()
+    font._drawGlyphOutline(glyphName, expected)
+    font.setLocation(None)
+    default = ArrayPath()
+    font._drawGlyphOutline(glyphName, default)
+
+    # The store is only used at its own location
+    font.outlineStore = outlineStore
+    path = ArrayPath()
+    font._drawGlyphOutline(glyphName, path)
+    assert default.value == path.value
+    font.setLocation({"wght": 700})
+    path = ArrayPath()
+    font._drawGlyphOutline(glyphName, path)
+    assert expected.value == path.value
+
+
+def test_outlineStore_serialize(tmpdir):
+    font = BlackRendererFont(dataDir / "more_samples-glyf_colr_1.ttf")
+    outlineStore = OutlineStore.fromFont(font)
+    path = pathlib.Path(tmpdir) / "outlines.bros"
+    outlineStore.save(path)
+    loaded = OutlineStore.load(path)
+    assert outlineStore.normalizedCoords == loaded.normalizedCoords
+    for name in ["glyphIDs", "verbOffsets", "pointOffsets", "verbs", "points"]:
+        assert np.array_equal(getattr(outlineStore, name), getattr(loaded, name))
+    data = outlineStore.toBytes()
+    with pytest.raises(ValueError, match="not an outline store"):
+        OutlineStore.fromBytes(b"XXXX" + data[4:])
+    with pytest.raises(ValueError, match="wrong size"):
+        OutlineStore.fromBytes(data[:-1])
+
+
+def test_glyphCache_outlineStore(tmpdir):
+    font = BlackRendererFont(dataDir / "more_samples-glyf_colr_1.ttf")
+    glyphNames = getCOLRLayerGlyphNames(font)
+    cache = GlyphCache(pathlib.Path(tmpdir) / "cache")
+    outlineStore = cache.getOutlineStore(font, glyphNames)
+    assert (0, 1) == (cache.hits, cache.misses)
+    cached = cache.getOutlineStore(font, glyphNames)
+    assert (1, 1) == (cache.hits, cache.misses)
+    assert np.array_equal(outlineStore.points, cached.points)
+    assert len(glyphNames) == len(cached)
+    cache.getOutlineStore(font)
+    assert (1, 2) == (cache.hits, cache.misses)
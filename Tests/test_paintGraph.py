@@ -0,0 +1,73 @@
+import pathlib
+import pytest
+from fontTools.ttLib.tables import otTables
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.glyphComplexity import ComplexityAnalyzer
+from blackrenderer.paintGraph import PaintGraphWalker, getPaintName
+from blackrenderer.traversalLimits import TraversalLimits, TraversalValidator
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+
+
+class NodeCounter(PaintGraphWalker):
+    def __init__(self, font):
+        super().__init__(font)
+        self.numVisits = 0
+
+    def visitPaint(self, paint, paintName):
+        self.numVisits += 1
+        return 1 + sum(
+            self.walkChild(child) for child in self.iterChildren(paint, paintName)
+        )
+
+
+def _makeSelfContainingLayers(font, glyphName):
+    # Replace the glyph's paint with a PaintColrLayers that is its own layer
+    layers = font.colrLayersV1.Paint
+    paint = otTables.Paint()
+    paint.Format = otTables.PaintFormat.PaintColrLayers
+    paint.FirstLayerIndex = len(layers)
+    paint.NumLayers = 1
+    layers.append(paint)
+    font.colrV1Glyphs[glyphName].Paint = paint
+
+
+def test_walkGlyph_memoized():
+    font = BlackRendererFont(fontPath)
+    counter = NodeCounter(font)
+    # composite_colr_glyph draws colored_circles_v0... through PaintColrGlyph
+    numNodes = counter.walkGlyph("composite_colr_glyph")
+    assert 8 == numNodes
+    numVisits = counter.numVisits
+    assert numNodes == counter.walkGlyph("composite_colr_glyph")
+    assert numVisits == counter.numVisits
+
+
+def test_getPaintName():
+    paint = otTables.Paint()
+    paint.Format = otTables.PaintFormat.PaintVarSolid
+    assert "PaintSolid" == getPaintName(paint)
+    paint.Format = 200
+    assert getPaintName(paint) is None
+
+
+unlimited = TraversalLimits(None, None, None, None)
+
+
+@pytest.mark.parametrize(
+    "walkGlyph",
+    [
+        lambda font, glyphName: NodeCounter(font).walkGlyph(glyphName),
+        lambda font, glyphName: ComplexityAnalyzer(font).analyzeGlyph(glyphName),
+        lambda font, glyphName: TraversalValidator(font, unlimited).validateGlyph(
+            glyphName
+        ),
+    ],
+)
+def test_selfContainingLayers(walkGlyph):
+    font = BlackRendererFont(fontPath)
+    _makeSelfContainingLayers(font, "composite_colr_glyph")
+    with pytest.raises(RecursionError, match="PaintColrLayers table references"):
+        walkGlyph(font, "composite_colr_glyph")
@@ -0,0 +1,284 @@
+import pathlib
+from fontTools.colorLib.builder import buildCOLR, buildCPAL
+from fontTools.fontBuilder import FontBuilder
+from fontTools.misc.transform import Identity
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib.tables.otTables import CompositeMode, ExtendMode, PaintFormat
+import numpy as np
+import pytest
+from blackrenderer.backends.numpy import NumpyPixelSurface
+from blackrenderer.backends.svg import SVGSurface
+from blackrenderer.backends.recording import (
+    BEGIN_COMPOSITE,
+    DRAW_LINEAR_GRADIENT,
+    DRAW_RADIAL_GRADIENT,
+    DRAW_SOLID,
+    END_COMPOSITE,
+    RESTORE,
+    SAVE,
+    TRANSFORM,
+    RecordingCanvas,
+)
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.paintOptimizer import optimizeRecording
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+
+testFonts = [
+    "more_samples-glyf_colr_1.ttf",
+    "Nabla.subset.ttf",
+    "Noto-COLRv1.subset.ttf",
+    "issue113.ttf",
+]
+
+
+def _rectPath(canvas, xMin, yMin, xMax, yMax):
+    path = canvas.newPath()
+    path.moveTo((xMin, yMin))
+    path.lineTo((xMin, yMax))
+    path.lineTo((xMax, yMax))
+    path.lineTo((xMax, yMin))
+    path.closePath()
+    return path
+
+
+def _render(recording, bounds):
+    surface = NumpyPixelSurface()
+    with surface.canvas(bounds) as canvas:
+        recording.replay(canvas)
+    return surface.getImageArray(premultiplied=True).astype(int)
+
+
+@pytest.mark.parametrize("fileName", testFonts)
+def test_optimizeRecording_fonts(fileName):
+    font = BlackRendererFont(dataDir / fileName)
+    numOps = numOptimizedOps = 0
+    for glyphName in font.colrV1GlyphNames:
+        recording = RecordingCanvas()
+        font.drawGlyph(glyphName, recording)
+        optimized = font.compileGlyph(glyphName)
+        numOps += len(recording.ops)
+        numOptimizedOps += len(optimized.ops)
+        xMin, yMin, xMax, yMax = font.getGlyphBounds(glyphName)
+        if xMin >= xMax or yMin >= yMax:
+            continue
+        scale = 100 / max(xMax - xMin, yMax - yMin, 1)
+        bounds = tuple(round(v * scale) for v in (xMin, yMin, xMax, yMax))
+        images = []
+        for r in [recording, optimized]:
+            scaled = RecordingCanvas()
+            with scaled.savedState():
+                scaled.scale(scale)
+                r.replay(scaled)
+            images.append(_render(scaled, bounds))
+        # Merged fills can differ by antialiasing rounding on shared pixels
+        assert np.abs(images[0] - images[1]).max() <= 16, glyphName
+    assert numOptimizedOps < numOps
+
+
+def test_optimizeRecording_uniformGradient():
+    recording = RecordingCanvas()
+    red = (1, 0, 0, 1)
+    clear = (0, 0, 1, 0)
+    path = _rectPath(recording, 0, 0, 10, 10)
+    colorLine = [(0, red), (1, red)]
+    recording.drawPathLinearGradient(
+        path, colorLine, (0, 0), (10, 0), ExtendMode.PAD, Identity
+    )
+    # Two circles that don't contain each other only paint a cone
+    recording.drawPathRadialGradient(
+        path, colorLine, (0, 0), 1, (10, 0), 1, ExtendMode.PAD, Identity
+    )
+    recording.drawPathSweepGradient(
+        path, colorLine, (5, 5), 0, 90, ExtendMode.PAD, Identity
+    )
+    recording.drawPathSolid(path, clear)
+    recording.drawPathLinearGradient(
+        path, [(0, clear), (1, clear)], (0, 0), (10, 0), ExtendMode.PAD, Identity
+    )
+    optimized = optimizeRecording(recording)
+    opCodes = [op[0] for op in optimized.ops]
+    assert [DRAW_SOLID, DRAW_RADIAL_GRADIENT, DRAW_SOLID] == opCodes
+    assert red == optimized.ops[0][2]
+
+
+def test_optimizeRecording_compositeLayers():
+    recording = RecordingCanvas()
+    path = _rectPath(recording, 0, 0, 10, 10)
+    with recording.compositeMode(CompositeMode.SRC_OVER):
+        recording.drawPathSolid(path, (1, 0, 0, 1))
+        with recording.compositeMode(CompositeMode.DEST):
+            recording.drawPathSolid(path, (0, 1, 0, 1))
+    with recording.compositeMode(CompositeMode.SRC_OVER):
+        recording.drawPathSolid(path, (1, 0, 0, 1))
+        with recording.compositeMode(CompositeMode.MULTIPLY):
+            recording.drawPathSolid(path, (0, 1, 0, 1))
+    # An empty SRC layer still clears the backdrop
+    with recording.compositeMode(CompositeMode.SRC):
+        pass
+    with recording.compositeMode(CompositeMode.SRC_OVER):
+        pass
+    optimized = optimizeRecording(recording)
+    assert [op[0] for op in optimized.ops] == [
+        DRAW_SOLID,
+        BEGIN_COMPOSITE,
+        DRAW_SOLID,
+        BEGIN_COMPOSITE,
+        DRAW_SOLID,
+        END_COMPOSITE,
+        END_COMPOSITE,
+        BEGIN_COMPOSITE,
+        END_COMPOSITE,
+    ]
+
+
+def test_optimizeRecording_transforms():
+    recording = RecordingCanvas()
+    path = _rectPath(recording, 0, 0, 10, 10)
+    with recording.savedState():
+        recording.translate(10, 20)
+        recording.scale(2)
+        with recording.savedState():
+            recording.translate(1, 1)
+            recording.drawPathSolid(path, (1, 0, 0, 1))
+    with recording.savedState():
+        recording.translate(1, 1)
+        recording.clipPath(path)
+    with recording.savedState():
+        recording.translate(1, 1)
+        recording.translate(-1, -1)
+        recording.drawPathSolid(path, (1, 0, 0, 1))
+    optimized = optimizeRecording(recording, foldTransforms=False)
+    assert optimized.ops == [
+        (SAVE,),
+        (TRANSFORM, (2, 0, 0, 2, 12, 22)),
+        (DRAW_SOLID, 0, (1, 0, 0, 1)),
+        (RESTORE,),
+        (DRAW_SOLID, 0, (1, 0, 0, 1)),
+    ]
+
+
+def test_optimizeRecording_mergeFills():
+    recording = RecordingCanvas()
+    red = (1, 0, 0, 1)
+    for rect in [(0, 0, 10, 10), (20, 0, 30, 10), (25, 5, 35, 15)]:
+        with recording.savedState():
+            recording.drawPathSolid(_rectPath(recording, *rect), red)
+    optimized = optimizeRecording(recording)
+    assert [op[0] for op in optimized.ops] == [DRAW_SOLID, DRAW_SOLID]
+    assert 10 == len(optimized.paths[0])
+    assert np.array_equal(
+        _render(recording, (0, 0, 40, 20)), _render(optimized, (0, 0, 40, 20))
+    )
+
+
+def test_optimizeRecording_foldTransforms():
+    recording = RecordingCanvas()
+    path = _rectPath(recording, 0, 0, 10, 10)
+    colorLine = [(0, (1, 0, 0, 1)), (1, (0, 0, 1, 1))]
+    with recording.savedState():
+        recording.translate(10, 20)
+        recording.drawPathSolid(path, (1, 0, 0, 1))
+        with recording.savedState():
+            recording.scale(2)
+            recording.drawPathRadialGradient(
+                path, colorLine, (5, 5), 0, (5, 5), 5, ExtendMode.PAD, Identity
+            )
+            recording.transform((1, 0, 0.5, 1, 0, 0))
+            recording.drawPathLinearGradient(
+                path, colorLine, (0, 0), (10, 0), ExtendMode.PAD, Identity
+            )
+        recording.drawPathSolid(path, (0, 1, 0, 1))
+    with recording.savedState():
+        recording.scale(0)
+        recording.drawPathSolid(path, (1, 0, 0, 1))
+    optimized = optimizeRecording(recording)
+    assert [op[0] for op in optimized.ops] == [
+        DRAW_SOLID,
+        DRAW_RADIAL_GRADIENT,
+        DRAW_LINEAR_GRADIENT,
+        DRAW_SOLID,
+        SAVE,
+        TRANSFORM,
+        DRAW_SOLID,
+        RESTORE,
+    ]
+    # The translated path is shared by both solid fills
+    assert optimized.ops[0][1] == optimized.ops[3][1]
+    assert (10, 20, 20, 30) == optimized.paths[0].bounds
+    assert (10, 20, 30, 40) == optimized.paths[1].bounds
+    # Circles stay circles, but a skewed linear gradient keeps its transform
+    assert ((20, 30), 0, (20, 30), 10) == optimized.ops[1][3:7]
+    assert Identity == optimized.ops[1][-1]
+    assert (2, 0, 1, 2, 10, 20) == tuple(optimized.ops[2][-1])
+    assert np.array_equal(
+        _render(recording, (0, 0, 60, 60)), _render(optimized, (0, 0, 60, 60))
+    )
+
+
+def _rectGlyph(xMin, yMin, xMax, yMax):
+    pen = TTGlyphPen(None)
+    pen.moveTo((xMin, yMin))
+    pen.lineTo((xMin, yMax))
+    pen.lineTo((xMax, yMax))
+    pen.lineTo((xMax, yMin))
+    pen.closePath()
+    return pen.glyph()
+
+
+def _paintGlyph(glyphName, paint):
+    return {"Format": PaintFormat.PaintGlyph, "Glyph": glyphName, "Paint": paint}
+
+
+def _paintSolid(paletteIndex):
+    return {"Format": PaintFormat.PaintSolid, "PaletteIndex": paletteIndex}
+
+
+def test_compileGlyph_clipInCompositeLayer(tmpdir):
+    # The source of the composite ends with a clip; it must not leak into the
+    # layer drawn after the composite, with backends that don't restore the
+    # state at the end of a composite layer
+    glyphs = {
+        ".notdef": TTGlyphPen(None).glyph(),
+        "A": TTGlyphPen(None).glyph(),
+        "box": _rectGlyph(0, 0, 1000, 1000),
+        "small": _rectGlyph(0, 0, 300, 300),
+    }
+    fb = FontBuilder(1000, isTTF=True)
+    fb.setupGlyphOrder(list(glyphs))
+    fb.setupCharacterMap({ord("A"): "A"})
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics(
+        {
+            glyphName: (1000, getattr(glyph, "xMin", 0))
+            for glyphName, glyph in glyphs.items()
+        }
+    )
+    fb.setupHorizontalHeader(ascent=1000, descent=0)
+    fb.setupOS2()
+    fb.setupPost()
+    composite = {
+        "Format": PaintFormat.PaintComposite,
+        "CompositeMode": CompositeMode.MULTIPLY,
+        "SourcePaint": _paintGlyph("small", _paintGlyph("box", _paintSolid(0))),
+        "BackdropPaint": _paintGlyph("box", _paintSolid(1)),
+    }
+    rootPaint = {
+        "Format": PaintFormat.PaintColrLayers,
+        "Layers": [composite, _paintGlyph("box", _paintSolid(2))],
+    }
+    fb.font["COLR"] = buildCOLR({"A": rootPaint})
+    fb.font["CPAL"] = buildCPAL([[(1, 0, 0, 1), (0, 1, 0, 1), (0, 0, 1, 0.5)]])
+    fontPath = pathlib.Path(tmpdir) / "composite.ttf"
+    fb.save(fontPath)
+
+    font = BlackRendererFont(fontPath)
+    outputs = []
+    for optimize in [False, True]:
+        recording = font.compileGlyph("A", optimize=optimize)
+        surface = SVGSurface()
+        with surface.canvas((0, 0, 1000, 1000)) as canvas:
+            recording.replay(canvas)
+        outputs.append(surface.encodeImage())
+    assert outputs[0] == outputs[1]
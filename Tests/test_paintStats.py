@@ -0,0 +1,86 @@
+from collections import Counter
+import itertools
+import pathlib
+from blackrenderer.backends.recording import RecordingCanvas
+from blackrenderer.font import PAINT_NAMES, BlackRendererFont
+from blackrenderer.paintStats import CallStatsEntry, PaintStats, PaintStatsEntry
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+glyphNames = ["composite_colr_glyph", "clip_box_center", "colored_circles_v0"]
+
+
+def _countPaints(font, glyphName):
+    counts = Counter()
+    colr = font.ttFont["COLR"].table
+
+    # Not Paint.traverse(), which visits shared Paints only once with some
+    # fontTools versions
+    def countPaint(paint):
+        counts[PAINT_NAMES[paint.Format]] += 1
+        for child in paint.getChildren(colr):
+            countPaint(child)
+
+    countPaint(font.colrV1Glyphs[glyphName].Paint)
+    return counts
+
+
+def test_paintStats():
+    font = BlackRendererFont(fontPath)
+    stats = PaintStats()
+    font.paintStats = stats
+    for glyphName in glyphNames:
+        font.drawGlyph(glyphName, RecordingCanvas())
+    font.drawGlyph(glyphNames[0], RecordingCanvas())
+
+    glyphStats = stats.getGlyphStats()
+    assert glyphNames == stats.glyphNames
+    assert [2, 1, 1] == [glyphStats[glyphName].count for glyphName in glyphNames]
+
+    for glyphName in glyphNames[:2]:
+        paintStats = stats.getPaintStats(glyphName)
+        expectedCounts = _countPaints(font, glyphName)
+        if glyphName == glyphNames[0]:
+            expectedCounts = Counter({k: 2 * v for k, v in expectedCounts.items()})
+        assert expectedCounts == {k: v.count for k, v in paintStats.items()}
+        for entry in paintStats.values():
+            assert 0 <= entry.selfTime <= entry.cumulativeTime
+    # COLRv0 glyphs have no Paints, but do call Canvas methods
+    assert {} == stats.getPaintStats("colored_circles_v0")
+    canvasStats = stats.getCanvasStats("colored_circles_v0")
+    assert {"RecordingCanvas.newPath", "RecordingCanvas.drawPathSolid"} == set(
+        canvasStats
+    )
+
+    totals = stats.getPaintStats()
+    assert sum(entry.count for entry in totals.values()) == sum(
+        entry.count
+        for glyphName in stats.glyphNames
+        for entry in stats.getPaintStats(glyphName).values()
+    )
+
+    stats.reset()
+    assert {} == stats.getGlyphStats()
+    font.paintStats = None
+    font.drawGlyph(glyphNames[0], RecordingCanvas())
+    assert {} == stats.getGlyphStats()
+
+
+def test_paintStats_selfTime():
+    # A fake timer that advances one unit per call
+    stats = PaintStats(timer=itertools.count().__next__)
+    with stats.timeGlyph("A", RecordingCanvas()) as canvas:  # t=0
+        stats.beginPaint("PaintColrLayers")  # t=1
+        stats.beginPaint("PaintColrLayers")  # t=2
+        canvas.newPath()  # t=3, 4
+        stats.endPaint()  # t=5
+        stats.beginPaint("PaintGlyph")  # t=6
+        stats.endPaint()  # t=7
+        stats.endPaint()  # t=8
+    assert {
+        "PaintColrLayers": PaintStatsEntry(2, 3 + 3, 7),
+        "PaintGlyph": PaintStatsEntry(1, 1, 1),
+    } == stats.getPaintStats("A")
+    assert {"RecordingCanvas.newPath": CallStatsEntry(1, 1)} == stats.getCanvasStats()
+    assert {"A": CallStatsEntry(1, 9)} == stats.getGlyphStats()
@@ -0,0 +1,112 @@
+import pathlib
+import pytest
+from blackrenderer.backends import getSurfaceClass
+from blackrenderer.backends.recording import (
+    CLIP,
+    DRAW_SOLID,
+    RESTORE,
+    SAVE,
+    FanOutCanvas,
+    RecordingCanvas,
+)
+from blackrenderer.font import BlackRendererFont
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+
+testGlyphs = [
+    ("more_samples-glyf_colr_1.ttf", "composite_colr_glyph"),
+    ("more_samples-glyf_colr_1.ttf", "clip_box_center"),
+    ("nested-paintglyph.ttf", "A"),
+    ("MutatorSans.ttf", "B"),
+]
+
+backendNames = ["numpy", "svg"]
+
+
+def _renderDirect(backendName, font, glyphName, tmpdir):
+    surface = getSurfaceClass(backendName)()
+    with surface.canvas(_getBounds(font, glyphName)) as canvas:
+        font.drawGlyph(glyphName, canvas)
+    return _saveAndRead(surface, backendName + "_direct", tmpdir)
+
+
+def _getBounds(font, glyphName):
+    return tuple(round(v) for v in font.getGlyphBounds(glyphName))
+
+
+def _saveAndRead(surface, name, tmpdir):
+    path = pathlib.Path(tmpdir) / (name + surface.fileExtension)
+    surface.saveImage(path)
+    return path.read_bytes()
+
+
+@pytest.mark.parametrize("fontName, glyphName", testGlyphs)
+def test_recordingCanvas_replay(tmpdir, fontName, glyphName):
+    font = BlackRendererFont(dataDir / fontName)
+    recording = RecordingCanvas()
+    font.drawGlyph(glyphName, recording)
+    assert recording.ops
+
+    surfaces = [getSurfaceClass(name)() for name in backendNames]
+    bounds = _getBounds(font, glyphName)
+    for name, surface in zip(backendNames, surfaces):
+        with surface.canvas(bounds) as canvas:
+            recording.replay(canvas)
+        replayed = _saveAndRead(surface, name + "_replayed", tmpdir)
+        assert _renderDirect(name, font, glyphName, tmpdir) == replayed
+
+
+@pytest.mark.parametrize("fontName, glyphName", testGlyphs)
+def test_fanOutCanvas(tmpdir, fontName, glyphName):
+    font = BlackRendererFont(dataDir / fontName)
+    bounds = _getBounds(font, glyphName)
+    surfaces = [getSurfaceClass(name)() for name in backendNames]
+    with surfaces[0].canvas(bounds) as canvas1, surfaces[1].canvas(bounds) as canvas2:
+        font.drawGlyph(glyphName, FanOutCanvas(canvas1, canvas2))
+    for name, surface in zip(backendNames, surfaces):
+        fannedOut = _saveAndRead(surface, name + "_fannedOut", tmpdir)
+        assert _renderDirect(name, font, glyphName, tmpdir) == fannedOut
+
+
+def test_recordingCanvas_sharedPaths():
+    recording = RecordingCanvas()
+    path = recording._rectPath((0, 0, 100, 100))
+    with recording.savedState():
+        recording.clipPath(path)
+        recording.drawPathSolid(path, (1, 0, 0, 1))
+        recording.drawPathSolid(None, (0, 0, 1, 0.5))
+    assert [path] == recording.paths
+    assert [
+        (SAVE,),
+        (CLIP, 0),
+        (DRAW_SOLID, 0, (1, 0, 0, 1)),
+        (DRAW_SOLID, None, (0, 0, 1, 0.5)),
+        (RESTORE,),
+    ] == recording.ops
+
+
+@pytest.mark.parametrize("fontName, glyphName", testGlyphs)
+def test_recordingCanvas_toBytes(tmpdir, fontName, glyphName):
+    font = BlackRendererFont(dataDir / fontName)
+    recording = RecordingCanvas()
+    font.drawGlyph(glyphName, recording)
+    data = recording.toBytes()
+    decoded = RecordingCanvas.fromBytes(data)
+    assert data == decoded.toBytes()
+    assert [p.value for p in recording.paths] == [p.value for p in decoded.paths]
+
+    surface = getSurfaceClass("svg")()
+    with surface.canvas(_getBounds(font, glyphName)) as canvas:
+        decoded.replay(canvas)
+    replayed = _saveAndRead(surface, "decoded", tmpdir)
+    assert _renderDirect("svg", font, glyphName, tmpdir) == replayed
+
+
+def test_recordingCanvas_fromBytes_invalid():
+    recording = RecordingCanvas()
+    recording.drawRectSolid((0, 0, 10, 10), (1, 0, 0, 1))
+    data = recording.toBytes()
+    for invalidData in [b"", b"XXXX" + data[4:], data[:-1], data + b"\0"]:
+        with pytest.raises(ValueError):
+            RecordingCanvas.fromBytes(invalidData)
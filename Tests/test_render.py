@@ -0,0 +1,193 @@
+import pathlib
+import re
+import numpy as np
+from PIL import Image
+import pytest
+from blackrenderer import render
+from blackrenderer.backends import getSurfaceClass
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.glyphAtlas import GlyphAtlas
+from blackrenderer.hbPaint import hasPaintAPI
+from blackrenderer.render import (
+    RenderStats,
+    buildGlyphLine,
+    calcGlyphLineBounds,
+    renderText,
+    renderTextToBytes,
+)
+from blackrenderer.renderCache import RenderCache
+import uharfbuzz as hb
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+
+
+def _shape(font, text):
+    buf = hb.Buffer()
+    buf.add_str(text)
+    buf.guess_segment_properties()
+    hb.shape(font.hbFont, buf)
+    return buildGlyphLine(buf.glyph_infos, buf.glyph_positions, font.glyphNames)
+
+
+def _readSVGSize(path):
+    m = re.search(r'<svg width="(\d+)" height="(\d+)"', path.read_text())
+    return int(m.group(1)), int(m.group(2))
+
+
+def test_calcGlyphLineBounds():
+    font = BlackRendererFont(dataDir / "MutatorSans.ttf")
+    glyphLine = _shape(font, "A A")
+    bounds = calcGlyphLineBounds(glyphLine, font)
+    assert (20, 0, 1022, 700) == bounds
+    assert bounds == calcGlyphLineBounds(glyphLine, font, exact=True)
+
+
+@pytest.mark.parametrize(
+    "fontName, text",
+    [
+        ("nested-paintglyph.ttf", "A"),
+        ("more_samples-glyf_colr_1.ttf", "0"),
+    ],
+)
+def test_renderText_autoCrop(tmpdir, fontName, text):
+    outputPath = pathlib.Path(tmpdir) / "test.svg"
+    renderText(dataDir / fontName, text, outputPath, fontSize=100)
+    width, height = _readSVGSize(outputPath)
+    renderText(dataDir / fontName, text, outputPath, fontSize=100, autoCrop=True)
+    croppedWidth, croppedHeight = _readSVGSize(outputPath)
+    assert croppedWidth * croppedHeight < width * height
+
+
+def test_renderText_returnStats(tmpdir):
+    fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+    outputPath = pathlib.Path(tmpdir) / "test.svg"
+    assert renderText(fontPath, "MN+", outputPath) is None
+    stats = renderText(fontPath, "MN+", outputPath, fontSize=100, returnStats=True)
+    assert isinstance(stats, RenderStats)
+    assert {"loadFont", "shape", "bounds", "draw", "encode", "total"} == set(
+        stats.timings
+    )
+    assert all(t > 0 for t in stats.timings.values())
+    assert stats.timings["total"] >= sum(
+        t for phase, t in stats.timings.items() if phase != "total"
+    )
+    assert (3, 2, 1) == (
+        stats.numGlyphs,
+        stats.numColorGlyphs,
+        stats.numNonColorGlyphs,
+    )
+    font = BlackRendererFont(fontPath)
+    colr = font.ttFont["COLR"].table
+    numPaints = 0
+    for glyphName in ["composite_DEST_OVER", "composite_XOR"]:
+        paints = []
+        font.colrV1Glyphs[glyphName].Paint.traverse(colr, paints.append)
+        numPaints += len(paints)
+    assert numPaints == stats.numPaints
+    # Each PaintComposite pushes two layers
+    assert 4 == stats.numCompositeLayers
+    width, height = stats.surfaceSize
+    assert width * height == stats.numPixels
+    assert [outputPath.stat().st_size] == stats.outputSizes
+    assert 0 == stats.numCachedOutputs
+
+
+@pytest.mark.skipif(not hasPaintAPI, reason="uharfbuzz has no paint API")
+def test_renderText_returnStats_harfbuzzEngine(tmpdir):
+    fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+    outputPath = pathlib.Path(tmpdir) / "test.svg"
+    stats = renderText(
+        fontPath, "MN+", outputPath, fontSize=100, returnStats=True, engine="harfbuzz"
+    )
+    # Paints are not visited in Python, but Canvas calls are still counted
+    assert stats.numPaints is None
+    assert stats.numCompositeLayers > 0
+
+
+def test_renderTextToBytes_returnStats():
+    fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+    cache = RenderCache()
+    data, stats = renderTextToBytes(
+        fontPath, "1", ".svg", resultCache=cache, returnStats=True
+    )
+    assert [len(data)] == stats.outputSizes
+    assert (1, 0) == (stats.numGlyphs, stats.numCachedOutputs)
+    cachedData, stats = renderTextToBytes(
+        fontPath, "1", ".svg", resultCache=cache, returnStats=True
+    )
+    assert data == cachedData
+    assert [len(data)] == stats.outputSizes
+    assert (None, 0, 1) == (stats.numGlyphs, stats.numPaints, stats.numCachedOutputs)
+
+
+@pytest.mark.parametrize(
+    "backendName, fileExtension, inMemory",
+    [
+        ("numpy", ".png", True),
+        ("skia", ".png", True),
+        ("svg", ".svg", True),
+        ("skia", ".pdf", False),
+    ],
+)
+def test_renderTextToBytes_encode(
+    tmpdir, monkeypatch, backendName, fileExtension, inMemory
+):
+    if getSurfaceClass(backendName, fileExtension) is None:
+        pytest.skip(f"{backendName} is not available")
+    fontPath = dataDir / "nested-paintglyph.ttf"
+    outputPath = pathlib.Path(tmpdir) / ("output" + fileExtension)
+    options = dict(fontSize=100, backendName=backendName)
+    renderText(fontPath, "A", outputPath, **options)
+    if inMemory:
+        # Only path-only backends go through a temporary file
+        monkeypatch.setattr(render.tempfile, "TemporaryDirectory", None)
+    data = renderTextToBytes(fontPath, "A", fileExtension, **options)
+    assert outputPath.read_bytes() == data
+
+
+def test_renderText_multipleOutputs(tmpdir):
+    fontPath = dataDir / "nested-paintglyph.ttf"
+    tmpdir = pathlib.Path(tmpdir)
+    outputPaths = [tmpdir / "multi.svg", tmpdir / "multi.png"]
+    renderText(fontPath, "A", outputPaths, fontSize=100)
+    renderText(fontPath, "A", tmpdir / "single.svg", fontSize=100)
+    renderText(fontPath, "A", tmpdir / "single.png", fontSize=100)
+    for suffix in [".svg", ".png"]:
+        multi = (tmpdir / ("multi" + suffix)).read_bytes()
+        assert (tmpdir / ("single" + suffix)).read_bytes() == multi
+
+
+def test_renderText_glyphAtlas(tmpdir):
+    fontPath = dataDir / "Nabla.subset.ttf"
+    tmpdir = pathlib.Path(tmpdir)
+    atlas = GlyphAtlas()
+    options = dict(fontSize=37, subpixelPhases=(4, 1))
+    renderText(
+        fontPath, "ABCABCCBA", tmpdir / "direct.png", backendName="numpy", **options
+    )
+    renderText(fontPath, "ABCABCCBA", tmpdir / "atlas.png", glyphAtlas=atlas, **options)
+    # At most four phases per glyph
+    assert atlas.misses <= 12
+    assert 9 == atlas.hits + atlas.misses
+    images = []
+    for fileName in ["direct.png", "atlas.png"]:
+        image = np.asarray(Image.open(tmpdir / fileName)).astype(int)
+        images.append(image[..., :3] * image[..., 3:] // 255)
+    assert images[0].shape == images[1].shape
+    assert np.abs(images[0] - images[1]).max() <= 2
+
+
+def test_renderText_glyphAtlas_paintOutsideOutline(tmpdir):
+    # The paint of scale_1.5_1.5_center_0_0 reaches past its base glyph
+    fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+    tmpdir = pathlib.Path(tmpdir)
+    options = dict(fontSize=100, margin=40, backendName="numpy")
+    renderText(fontPath, "k", tmpdir / "direct.png", **options)
+    renderText(fontPath, "k", tmpdir / "atlas.png", glyphAtlas=GlyphAtlas(), **options)
+    images = []
+    for fileName in ["direct.png", "atlas.png"]:
+        image = np.asarray(Image.open(tmpdir / fileName)).astype(int)
+        images.append(image[..., :3] * image[..., 3:] // 255)
+    assert images[0].shape == images[1].shape
+    assert np.abs(images[0] - images[1]).max() <= 2
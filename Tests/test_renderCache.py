@@ -0,0 +1,94 @@
+import pathlib
+import shutil
+import pytest
+from blackrenderer.hbPaint import hasPaintAPI
+from blackrenderer.render import renderText, renderTextToBytes
+from blackrenderer.renderCache import RenderCache
+from blackrenderer.traversalLimits import TraversalBudgetError, TraversalLimits
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+fontPath = dataDir / "nested-paintglyph.ttf"
+
+
+def test_renderCache_memory():
+    cache = RenderCache()
+    expected = renderTextToBytes(fontPath, "A", ".svg", fontSize=100)
+    for i in range(3):
+        data = renderTextToBytes(fontPath, "A", ".svg", fontSize=100, resultCache=cache)
+        assert expected == data
+    assert (2, 0, 1) == (cache.memoryHits, cache.diskHits, cache.misses)
+    assert 2 / 3 == cache.hitRate
+
+    # Any change in the inputs must result in a cache miss
+    renderTextToBytes(fontPath, "A", ".svg", fontSize=101, resultCache=cache)
+    renderTextToBytes(fontPath, "AA", ".svg", fontSize=100, resultCache=cache)
+    renderTextToBytes(
+        fontPath, "A", ".png", fontSize=100, backendName="numpy", resultCache=cache
+    )
+    assert 4 == cache.misses
+    assert 4 == cache.getStats()["memoryEntries"]
+
+
+@pytest.mark.skipif(not hasPaintAPI, reason="uharfbuzz has no paint API")
+def test_renderCache_engine():
+    cache = RenderCache()
+    for engine in ["python", "harfbuzz"]:
+        renderTextToBytes(fontPath, "A", ".svg", engine=engine, resultCache=cache)
+    assert 2 == cache.misses
+
+
+def test_renderCache_traversalLimits():
+    cache = RenderCache()
+    renderTextToBytes(fontPath, "A", ".svg", resultCache=cache)
+    # A cached result must not bypass stricter limits
+    with pytest.raises(TraversalBudgetError):
+        renderTextToBytes(
+            fontPath,
+            "A",
+            ".svg",
+            traversalLimits=TraversalLimits(maxNodes=1),
+            resultCache=cache,
+        )
+    assert 2 == cache.misses
+
+
+def test_renderCache_memoryLimit():
+    sizes = [100, 200, 300]
+    expected = [renderTextToBytes(fontPath, "A", ".svg", fontSize=s) for s in sizes]
+    # Room for the last two results only
+    cache = RenderCache(maxMemorySize=len(expected[1]) + len(expected[2]))
+    for size in sizes:
+        renderTextToBytes(fontPath, "A", ".svg", fontSize=size, resultCache=cache)
+    assert cache.getStats()["memorySize"] <= cache.maxMemorySize
+    assert 2 == cache.getStats()["memoryEntries"]
+    # The least recently used entry was evicted
+    renderTextToBytes(fontPath, "A", ".svg", fontSize=300, resultCache=cache)
+    assert 1 == cache.memoryHits
+    renderTextToBytes(fontPath, "A", ".svg", fontSize=100, resultCache=cache)
+    assert 4 == cache.misses
+
+
+def test_renderCache_disk(tmpdir):
+    tmpdir = pathlib.Path(tmpdir)
+    cacheDir = tmpdir / "cache"
+    outputPaths = [tmpdir / "test.svg", tmpdir / "test.png"]
+    renderText(fontPath, "A", outputPaths, resultCache=RenderCache(cacheDir=cacheDir))
+    expected = [p.read_bytes() for p in outputPaths]
+    for p in outputPaths:
+        p.unlink()
+
+    cache = RenderCache(cacheDir=cacheDir)
+    renderText(fontPath, "A", outputPaths, resultCache=cache)
+    assert (0, 2, 0) == (cache.memoryHits, cache.diskHits, cache.misses)
+    assert expected == [p.read_bytes() for p in outputPaths]
+
+
+def test_renderCache_fontFingerprint(tmpdir):
+    tmpFontPath = pathlib.Path(tmpdir) / "font.ttf"
+    shutil.copy(fontPath, tmpFontPath)
+    cache = RenderCache()
+    fingerprint = cache.getFontFingerprint(tmpFontPath)
+    assert fingerprint == cache.getFontFingerprint(fontPath)
+    shutil.copy(dataDir / "MutatorSans.ttf", tmpFontPath)
+    assert fingerprint != cache.getFontFingerprint(tmpFontPath)
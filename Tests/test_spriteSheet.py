@@ -0,0 +1,73 @@
+import json
+import pathlib
+import numpy as np
+from PIL import Image
+from blackrenderer.backends.numpy import NumpyPixelSurface
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.glyphAtlas import rasterizeGlyph, unpremultiplyImage
+from blackrenderer.spriteSheet import buildSpriteSheets, main, parseCodepoints
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+
+
+def test_buildSpriteSheets(tmp_path):
+    fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+    metadata = buildSpriteSheets(
+        fontPath,
+        tmp_path,
+        sizes=[16, 48],
+        pageSize=256,
+        backendName="numpy",
+        numWorkers=1,
+    )
+    font = BlackRendererFont(fontPath)
+    numColorGlyphs = len(set(font.colrV0GlyphNames) | set(font.colrV1GlyphNames))
+    assert 2 * numColorGlyphs == len(metadata["sprites"])
+    assert len(metadata["pages"]) > 1
+    assert metadata == json.loads((tmp_path / f"{fontPath.stem}.json").read_text())
+    pages = [np.asarray(Image.open(tmp_path / p)) for p in metadata["pages"]]
+    for sprite in metadata["sprites"][::10]:
+        image, xMin, yMax = rasterizeGlyph(
+            NumpyPixelSurface, font, sprite["glyph"], sprite["size"]
+        )
+        assert (xMin, yMax) == (sprite["bearingX"], sprite["bearingY"])
+        x, y, width, height = (sprite[k] for k in ["x", "y", "width", "height"])
+        right = x + width
+        bottom = y + height
+        page = pages[sprite["page"]]
+        assert np.array_equal(unpremultiplyImage(image), page[y:bottom, x:right])
+        assert [x / 256, y / 256, right / 256, bottom / 256] == sprite["uv"]
+    # Worker processes give the same result
+    buildSpriteSheets(
+        fontPath,
+        tmp_path / "workers",
+        sizes=[16, 48],
+        pageSize=256,
+        backendName="numpy",
+        numWorkers=2,
+    )
+    for fileName in metadata["pages"] + [f"{fontPath.stem}.json"]:
+        assert (tmp_path / fileName).read_bytes() == (
+            tmp_path / "workers" / fileName
+        ).read_bytes()
+
+
+def test_main(tmp_path, capsys):
+    fontPath = dataDir / "Nabla.subset.ttf"
+    args = [str(fontPath), str(tmp_path), "--codepoints", "U+41-43,20"]
+    assert 0 == main(args + ["--palettes", "0", "1", "--name", "nabla"])
+    assert "8 sprites, 1 pages" in capsys.readouterr().out
+    metadata = json.loads((tmp_path / "nabla.json").read_text())
+    assert ["nabla-0.png"] == metadata["pages"]
+    sprites = {(s["glyph"], s["palette"]): s for s in metadata["sprites"]}
+    assert [65] == sprites["A", 1]["codepoints"]
+    assert sprites["A", 0]["advance"] > 0
+    # Nothing is drawn for a space
+    assert (None, 0, 0) == tuple(
+        sprites["space", 0][k] for k in ["page", "width", "height"]
+    )
+
+
+def test_parseCodepoints():
+    assert [0x41, 0x42, 0x43, 0x1F600] == parseCodepoints("41-43, U+1F600")
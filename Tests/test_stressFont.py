@@ -0,0 +1,88 @@
+from collections import Counter
+import os
+import pathlib
+import sys
+import pytest
+from blackrenderer.backends.recording import RecordingCanvas, SAVE
+
+
+benchmarksDir = pathlib.Path(__file__).resolve().parent.parent / "benchmarks"
+sys.path.insert(0, os.fspath(benchmarksDir))
+
+from benchmarkScaling import loadStressFont  # noqa: E402
+from stressFont import StressFontParameters, stressGlyphName  # noqa: E402
+
+
+def _countPaints(font, glyphName):
+    counts = Counter()
+    colr = font.ttFont["COLR"].table
+
+    def countPaint(paint):
+        counts[paint.Format] += 1
+
+    font.colrV1Glyphs[glyphName].Paint.traverse(colr, countPaint)
+    return counts
+
+
+def _record(font, location=None):
+    font.setLocation(location)
+    recording = RecordingCanvas()
+    font.drawGlyph(stressGlyphName, recording)
+    return recording
+
+
+def test_stressFont_layers():
+    font = loadStressFont(StressFontParameters(layers=10))
+    recording = _record(font)
+    numLayers = sum(1 for op in recording.ops if op[0] == SAVE)
+    # One saved state for the PaintColrLayers, plus one per PaintGlyph
+    assert 11 == numLayers
+
+
+def test_stressFont_fanOut():
+    # The number of drawing operations grows with fanOut ** depth
+    parameters = StressFontParameters(layers=2)
+    numOps = len(_record(loadStressFont(parameters)).ops)
+    numOpsNested = len(
+        _record(loadStressFont(parameters._replace(depth=2, fanOut=3))).ops
+    )
+    assert numOpsNested > 9 * numOps
+
+
+def test_stressFont_variable():
+    parameters = StressFontParameters(layers=8, variableDensity=0.5)
+    font = loadStressFont(parameters)
+    paintCounts = _countPaints(font, stressGlyphName)
+    assert 4 == paintCounts[15]  # PaintVarTranslate
+    assert _record(font).ops != _record(font, {"wght": 900}).ops
+
+    font = loadStressFont(parameters._replace(variableDensity=0))
+    assert font.instancer is None
+    assert _record(font).ops == _record(font, {"wght": 900}).ops
+
+
+def test_stressFont_composite():
+    font = loadStressFont(StressFontParameters(layers=8, compositeDensity=0.25))
+    assert 2 == _countPaints(font, stressGlyphName)[32]  # PaintComposite
+
+
+def test_stressFont_stops():
+    font = loadStressFont(StressFontParameters(layers=2, stops=7))
+    linearGradient = font.colrLayersV1.Paint[1].Paint
+    assert 7 == len(linearGradient.ColorLine.ColorStop)
+
+
+@pytest.mark.parametrize(
+    "parameters",
+    [
+        dict(layers=0),
+        dict(depth=-1),
+        dict(fanOut=0),
+        dict(stops=1),
+        dict(outlineComplexity=2),
+        dict(compositeDensity=1.5),
+    ],
+)
+def test_stressFont_invalidParameters(parameters):
+    with pytest.raises(ValueError):
+        loadStressFont(StressFontParameters(**parameters))
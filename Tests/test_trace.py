@@ -0,0 +1,101 @@
+import json
+import os
+import pathlib
+import threading
+from blackrenderer.render import renderText, renderTextToBytes
+from blackrenderer.trace import Tracer, nullTracer
+
+
+dataDir = pathlib.Path(__file__).resolve().parent / "data"
+fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+
+
+def _isNested(inner, outer):
+    return (
+        outer["ts"] <= inner["ts"]
+        and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    )
+
+
+def test_trace_renderText(tmpdir):
+    tracer = Tracer()
+    outputPath = os.path.join(tmpdir, "test.svg")
+    renderText(fontPath, "MN1", outputPath, tracer=tracer)
+
+    events = tracer.events
+    names = [event["name"] for event in events]
+    assert {
+        "renderText",
+        "loadFont",
+        "hb.shape",
+        "calcGlyphLineBounds",
+        "drawGlyph",
+        "draw",
+        "compositeMode",
+        "saveImage",
+    } == set(names)
+    assert ["composite_DEST_OVER", "composite_XOR", "gradient_p2_skewed"] == [
+        event["args"]["glyph"] for event in events if event["name"] == "drawGlyph"
+    ]
+    for event in events:
+        assert "X" == event["ph"]
+        assert os.getpid() == event["pid"]
+        assert threading.get_ident() == event["tid"]
+
+    (renderEvent,) = [event for event in events if event["name"] == "renderText"]
+    (drawEvent,) = [event for event in events if event["name"] == "draw"]
+    assert "SVGSurface" == drawEvent["args"]["backend"]
+    for event in events:
+        assert _isNested(event, renderEvent)
+        if event["name"] in {"drawGlyph", "compositeMode"}:
+            assert _isNested(event, drawEvent)
+    compositeModes = [
+        event["args"]["mode"] for event in events if event["name"] == "compositeMode"
+    ]
+    assert {"SRC_OVER", "DEST_OVER", "XOR"} == set(compositeModes)
+
+    tracePath = os.path.join(tmpdir, "trace.json")
+    tracer.save(tracePath)
+    with open(tracePath) as f:
+        trace = json.load(f)
+    metadata = [event for event in trace["traceEvents"] if event["ph"] == "M"]
+    assert ["process_name", "thread_name"] == [event["name"] for event in metadata]
+    assert len(events) + 2 == len(trace["traceEvents"])
+
+
+def test_trace_threads():
+    tracer = Tracer()
+    # Keep all threads alive at the same time, so their IDs are unique
+    barrier = threading.Barrier(3)
+
+    def render():
+        barrier.wait()
+        renderTextToBytes(fontPath, "1", ".svg", tracer=tracer)
+        barrier.wait()
+
+    threads = [threading.Thread(target=render) for i in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    threadIDs = {event["tid"] for event in tracer.events}
+    assert 3 == len(threadIDs)
+    renderEvents = [
+        event for event in tracer.events if event["name"] == "renderTextToBytes"
+    ]
+    assert 3 == len(renderEvents)
+    threadNames = [
+        event for event in tracer.getTraceEvents() if event["name"] == "thread_name"
+    ]
+    assert 3 == len(threadNames)
+
+    otherTracer = Tracer()
+    otherTracer.extend(tracer.events)
+    assert tracer.events == otherTracer.events
+
+
+def test_nullTracer():
+    with nullTracer.span("test", arg=1):
+        pass
+    assert () == nullTracer.events
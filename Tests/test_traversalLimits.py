@@ -0,0 +1,94 @@
+import os
+import pathlib
+import sys
+import time
+import pytest
+from blackrenderer.backends.recording import BEGIN_COMPOSITE, RecordingCanvas
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.paintStats import PaintStats
+from blackrenderer.render import renderTextToBytes
+from blackrenderer.traversalLimits import (
+    TraversalBudgetError,
+    TraversalLimits,
+    TraversalValidator,
+)
+
+
+testDir = pathlib.Path(__file__).resolve().parent
+dataDir = testDir / "data"
+sys.path.insert(0, os.fspath(testDir.parent / "benchmarks"))
+
+from benchmarkScaling import loadStressFont  # noqa: E402
+from stressFont import StressFontParameters  # noqa: E402
+
+
+fontPath = dataDir / "more_samples-glyf_colr_1.ttf"
+unlimited = TraversalLimits(None, None, None, None)
+
+
+def test_validateGlyph():
+    font = BlackRendererFont(fontPath)
+    validator = TraversalValidator(font, unlimited)
+    for glyphName in font.colrV1GlyphNames:
+        numNodes, depth, numLayers = validator.validateGlyph(glyphName)
+        font.paintStats = PaintStats()
+        recording = RecordingCanvas()
+        font.drawGlyph(glyphName, recording)
+        paintStats = font.paintStats.getPaintStats()
+        assert sum(entry.count for entry in paintStats.values()) == numNodes
+        assert sum(op[0] == BEGIN_COMPOSITE for op in recording.ops) == numLayers
+    assert (8, 5, 2) == validator.validateGlyph("composite_colr_glyph")
+    assert (0, 0, 0) == validator.validateGlyph(".notdef")
+
+
+@pytest.mark.parametrize(
+    "limits, glyphName, limitName",
+    [
+        (TraversalLimits(maxNodes=7), "composite_colr_glyph", "maxNodes"),
+        (TraversalLimits(maxDepth=4), "composite_colr_glyph", "maxDepth"),
+        (TraversalLimits(maxLayers=1), "composite_colr_glyph", "maxLayers"),
+    ],
+)
+def test_drawGlyph_overBudget(limits, glyphName, limitName):
+    font = BlackRendererFont(fontPath)
+    font.traversalLimits = limits
+    canvas = RecordingCanvas()
+    with pytest.raises(TraversalBudgetError) as excinfo:
+        font.drawGlyph(glyphName, canvas)
+    assert limitName == excinfo.value.limitName
+    assert glyphName == excinfo.value.glyphName
+    assert [] == canvas.ops
+    with pytest.raises(TraversalBudgetError):
+        font.getPaintBounds(glyphName)
+    font.traversalLimits = None
+    font.drawGlyph(glyphName, canvas)
+
+
+def test_load_exponentialGraph():
+    # Drawing this glyph would visit nearly 10**12 paint nodes
+    parameters = StressFontParameters(layers=4, depth=12, fanOut=8)
+    font = loadStressFont(parameters)
+    t = time.perf_counter()
+    with pytest.raises(TraversalBudgetError, match="limit maxNodes=100000"):
+        BlackRendererFont(
+            ttFont=font.ttFont, hbFont=font.hbFont, traversalLimits=TraversalLimits()
+        )
+    assert time.perf_counter() - t < 1
+    validator = TraversalValidator(font, unlimited)
+    assert validator.validateGlyph("stress")[0] > 10**11
+
+
+def test_load_recursive():
+    with pytest.raises(RecursionError):
+        BlackRendererFont(
+            dataDir / "crash.subset.otf", traversalLimits=TraversalLimits()
+        )
+
+
+def test_renderTextToBytes_maxPixelArea():
+    data = renderTextToBytes(fontPath, "1", ".svg", traversalLimits=TraversalLimits())
+    assert data.startswith(b"<?xml")
+    with pytest.raises(TraversalBudgetError, match="maxPixelArea=1000"):
+        renderTextToBytes(
+            fontPath, "1", ".svg", traversalLimits=TraversalLimits(maxPixelArea=1000)
+        )
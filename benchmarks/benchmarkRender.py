@@ -0,0 +1,334 @@
+"""Benchmark the rendering pipeline on the fonts and glyphs of the test suite.
+
+Each stage of the pipeline is timed separately:
+
+- load: constructing a BlackRendererFont
+- shape: shaping a string with HarfBuzz
+- traverse: walking the paint graph of a glyph (drawing into a RecordingCanvas)
+- rasterize: replaying a glyph into a backend canvas
+- encode: saving the rendered surface to a file
+
+The results are written as JSON, see 'python benchmarks/benchmarkRender.py -h'.
+"""
+
+import argparse
+from contextlib import contextmanager
+import importlib.metadata
+import json
+import logging
+import os
+import pathlib
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from fontTools.misc.arrayTools import intRect, scaleRect
+import uharfbuzz as hb
+from blackrenderer.backends import getSurfaceClass
+from blackrenderer.backends.recording import RecordingCanvas
+from blackrenderer.font import PAINT_NAMES, BlackRendererFont
+from blackrenderer.glyphComplexity import ComplexityAnalyzer
+
+
+testDir = pathlib.Path(__file__).resolve().parent.parent / "Tests"
+sys.path.insert(0, os.fspath(testDir))
+
+from test_glyph_render import testFonts, test_glyphs  # noqa: E402
+
+
+allStages = ["load", "shape", "traverse", "rasterize", "encode"]
+allBackendNames = ["cairo", "coregraphics", "numpy", "skia", "svg"]
+scaleFactor = 1 / 4
+maxShapingTextLength = 64
+
+distributions = [
+    "blackrenderer",
+    "fonttools",
+    "uharfbuzz",
+    "numpy",
+    "skia-python",
+    "pycairo",
+    "pyobjc-framework-Quartz",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark font loading, shaping, paint graph traversal, and "
+        "each backend's rasterization and encoding, using the test suite's "
+        "fonts and glyphs."
+    )
+    parser.add_argument(
+        "--output",
+        type=pathlib.Path,
+        help="The JSON output file. Writes to stdout if omitted.",
+    )
+    parser.add_argument("--stages", nargs="+", choices=allStages, default=allStages)
+    parser.add_argument("--backends", nargs="+", default=allBackendNames)
+    parser.add_argument(
+        "--filter",
+        default="",
+        help="Only run benchmarks whose name contains this string",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=7,
+        help="The number of samples to take for each benchmark (default: 7)",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.02,
+        help="The minimum duration of a single sample, in seconds. Fast "
+        "operations are repeated until this duration is reached (default: 0.02)",
+    )
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+    # Don't let repeated backend warnings drown the output
+    logging.getLogger("blackrenderer").setLevel(logging.ERROR)
+
+    results = runBenchmarks(
+        stages=args.stages,
+        backendNames=args.backends,
+        nameFilter=args.filter,
+        repeat=args.repeat,
+        minTime=args.min_time,
+        verbose=args.verbose,
+    )
+    resultsJSON = json.dumps(results, indent=2)
+    if args.output is None:
+        print(resultsJSON)
+    else:
+        args.output.write_text(resultsJSON + "\n")
+
+
+def runBenchmarks(
+    *,
+    stages=allStages,
+    backendNames=allBackendNames,
+    nameFilter="",
+    repeat=7,
+    minTime=0.02,
+    verbose=False,
+):
+    backends = [(name, getSurfaceClass(name)) for name in backendNames]
+    backends = [(name, surface) for name, surface in backends if surface is not None]
+    benchmarks = []
+
+    def addBenchmark(stage, backendName, fontName, glyphName, func, **info):
+        nameParts = [stage, backendName, fontName, glyphName]
+        location = info.get("location")
+        if location:
+            nameParts.append(_locationToString(location))
+        if info.get("paletteIndex"):
+            nameParts.append(f"palette={info['paletteIndex']}")
+        name = "/".join(part for part in nameParts if part is not None)
+        if nameFilter not in name:
+            return
+        number, samples = timeFunction(func, repeat, minTime)
+        benchmarks.append(
+            dict(
+                name=name,
+                stage=stage,
+                backend=backendName,
+                font=fontName,
+                glyph=glyphName,
+                **info,
+                number=number,
+                samples=samples,
+            )
+        )
+        if verbose:
+            median = sorted(samples)[len(samples) // 2]
+            print(f"{name}: {median * 1000:.3f} ms", file=sys.stderr)
+
+    fonts = {}
+    for fontName, fontPath in testFonts.items():
+        if not fontPath.exists():
+            if verbose:
+                print(f"skipping {fontName}: {fontPath} not found", file=sys.stderr)
+            continue
+        fonts[fontName] = BlackRendererFont(fontPath)
+        if "load" in stages:
+            addBenchmark(
+                "load", None, fontName, None, lambda: BlackRendererFont(fontPath)
+            )
+        if "shape" in stages:
+            text = _getShapingText(fonts[fontName])
+            addBenchmark(
+                "shape",
+                None,
+                fontName,
+                None,
+                lambda: _shape(fonts[fontName], text),
+                text=text,
+            )
+
+    tmpDir = tempfile.mkdtemp()
+    try:
+        _runGlyphBenchmarks(fonts, backends, stages, tmpDir, addBenchmark)
+    finally:
+        shutil.rmtree(tmpDir)
+
+    return dict(environment=getEnvironment(), benchmarks=benchmarks)
+
+
+def _runGlyphBenchmarks(fonts, backends, stages, tmpDir, addBenchmark):
+    analyzers = {}
+    for fontName, glyphName, location, paletteIndex in test_glyphs:
+        font = fonts.get(fontName)
+        if font is None:
+            continue
+        font.setLocation(location)
+        palette = font.getPalette(paletteIndex)
+        info = dict(
+            location=location,
+            paletteIndex=paletteIndex,
+            paintFormats=getPaintFormats(font, glyphName),
+        )
+        if glyphName in font.colrV1Glyphs or glyphName in font.colrV0Glyphs:
+            if fontName not in analyzers:
+                analyzers[fontName] = ComplexityAnalyzer(font)
+            info["complexity"] = getComplexity(analyzers[fontName], glyphName)
+
+        def traverse():
+            recording = RecordingCanvas()
+            font.drawGlyph(glyphName, recording, palette=palette)
+            return recording
+
+        if "traverse" in stages:
+            addBenchmark("traverse", None, fontName, glyphName, traverse, **info)
+        if "rasterize" not in stages and "encode" not in stages:
+            continue
+
+        recording = traverse()
+        boundingBox = font.getGlyphBounds(glyphName)
+        boundingBox = intRect(scaleRect(boundingBox, scaleFactor, scaleFactor))
+        for backendName, surfaceClass in backends:
+
+            def rasterize():
+                surface = surfaceClass()
+                with surface.canvas(boundingBox) as canvas:
+                    canvas.scale(scaleFactor)
+                    recording.replay(canvas)
+                return surface
+
+            if "rasterize" in stages:
+                addBenchmark(
+                    "rasterize", backendName, fontName, glyphName, rasterize, **info
+                )
+            if "encode" in stages:
+                surface = rasterize()
+                outputPath = os.path.join(
+                    tmpDir, f"{backendName}{surface.fileExtension}"
+                )
+                addBenchmark(
+                    "encode",
+                    backendName,
+                    fontName,
+                    glyphName,
+                    lambda: surface.saveImage(outputPath),
+                    **info,
+                )
+
+
+def timeFunction(func, repeat, minTime):
+    """Time 'func', and return (number, samples), where 'samples' is a list
+    of 'repeat' durations of a single call, in seconds. Each sample is the
+    average of 'number' calls, where 'number' is chosen so that a sample takes
+    at least 'minTime' seconds.
+    """
+    number = 1
+    while True:
+        duration = _timeCalls(func, number)
+        if duration >= minTime or number >= 1_000_000:
+            break
+        number *= 10 if duration < minTime / 10 else 2
+    samples = [_timeCalls(func, number) / number for _ in range(repeat)]
+    return number, samples
+
+
+def _timeCalls(func, number):
+    with _gcDisabled():
+        t = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - t
+
+
+@contextmanager
+def _gcDisabled():
+    import gc
+
+    gcEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gcEnabled:
+            gc.enable()
+
+
+def getPaintFormats(font, glyphName):
+    """Return a sorted list of the Paint formats used by a glyph, or
+    ["COLRv0"] or ["Outline"] for glyphs without COLRv1 data.
+    """
+    glyph = font.colrV1Glyphs.get(glyphName)
+    if glyph is None:
+        return ["COLRv0" if glyphName in font.colrV0Glyphs else "Outline"]
+    paintFormats = set()
+    colr = font.ttFont["COLR"].table
+    glyph.Paint.traverse(
+        colr, lambda paint: paintFormats.add(PAINT_NAMES[paint.Format])
+    )
+    return sorted(paintFormats)
+
+
+def getComplexity(analyzer, glyphName):
+    """Return the complexity of a color glyph as a dict, for calibrating
+    cost models with 'python -m blackrenderer.glyphComplexity calibrate'.
+    """
+    complexity = analyzer.analyzeGlyph(glyphName)._asdict()
+    del complexity["glyphName"]
+    return complexity
+
+
+def getEnvironment():
+    versions = {}
+    for distribution in distributions:
+        try:
+            versions[distribution] = importlib.metadata.version(distribution)
+        except importlib.metadata.PackageNotFoundError:
+            pass
+    return dict(
+        python=platform.python_version(),
+        implementation=platform.python_implementation(),
+        platform=platform.platform(),
+        machine=platform.machine(),
+        processor=platform.processor(),
+        versions=versions,
+    )
+
+
+def _getShapingText(font):
+    cmap = font.ttFont.getBestCmap() or {}
+    codePoints = sorted(cmap)[:maxShapingTextLength]
+    return "".join(chr(codePoint) for codePoint in codePoints)
+
+
+def _shape(font, text):
+    buf = hb.Buffer()
+    buf.add_str(text)
+    buf.guess_segment_properties()
+    hb.shape(font.hbFont, buf)
+    return buf
+
+
+def _locationToString(location):
+    return ",".join(f"{name}={value}" for name, value in sorted(location.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Benchmark how rendering time scales with paint graph complexity.
+
+For each stress font dimension (see stressFont.py), a series of fonts is
+generated in which only that dimension varies, and paint graph traversal and
+each backend's rasterization are timed for the "stress" glyph. Plotting the
+times against the parameter values exposes super-linear behavior.
+
+The results are written as JSON, in the same format as benchmarkRender.py
+writes, so they can be stored and compared with 'python -m blackrenderer.bench'.
+Each benchmark additionally lists its 'parameter' and 'value'.
+"""
+
+import argparse
+from io import BytesIO
+import json
+import logging
+import pathlib
+import sys
+from fontTools.misc.arrayTools import intRect, scaleRect
+from fontTools.ttLib import TTFont
+import uharfbuzz as hb
+from blackrenderer.backends import getSurfaceClass
+from blackrenderer.backends.recording import RecordingCanvas
+from blackrenderer.font import BlackRendererFont
+from blackrenderer.glyphComplexity import ComplexityAnalyzer
+from benchmarkRender import getComplexity, getEnvironment, getPaintFormats, timeFunction
+from stressFont import StressFontParameters, buildStressFont, stressGlyphName
+
+
+allStages = ["traverse", "rasterize"]
+allBackendNames = ["cairo", "coregraphics", "numpy", "skia", "svg"]
+scaleFactor = 1 / 4
+
+# For each parameter, the values to sweep over; all other parameters keep
+# their defaults, except where overridden here
+sweeps = {
+    "layers": ([1, 4, 16, 64, 256], {}),
+    "depth": ([0, 1, 2, 3, 4, 5], dict(layers=4)),
+    "fanOut": ([1, 2, 3, 4, 5, 6], dict(layers=4, depth=3)),
+    "stops": ([2, 4, 16, 64, 256], {}),
+    "compositeDensity": ([0.0, 0.25, 0.5, 0.75, 1.0], {}),
+    "variableDensity": ([0.0, 0.25, 0.5, 0.75, 1.0], {}),
+    "outlineComplexity": ([4, 16, 64, 256, 1024], {}),
+}
+
+# Variable paints only vary away from the default location
+location = {"wght": 900}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark rendering time against each stress font parameter."
+    )
+    parser.add_argument(
+        "--output",
+        type=pathlib.Path,
+        help="The JSON output file. Writes to stdout if omitted.",
+    )
+    parser.add_argument(
+        "--parameters", nargs="+", choices=list(sweeps), default=list(sweeps)
+    )
+    parser.add_argument("--stages", nargs="+", choices=allStages, default=allStages)
+    parser.add_argument("--backends", nargs="+", default=allBackendNames)
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="The number of samples to take for each benchmark (default: 5)",
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=0.02,
+        help="The minimum duration of a single sample, in seconds (default: 0.02)",
+    )
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args()
+    logging.getLogger("blackrenderer").setLevel(logging.ERROR)
+
+    results = runScalingBenchmarks(
+        parameterNames=args.parameters,
+        stages=args.stages,
+        backendNames=args.backends,
+        repeat=args.repeat,
+        minTime=args.min_time,
+        verbose=args.verbose,
+    )
+    resultsJSON = json.dumps(results, indent=2)
+    if args.output is None:
+        print(resultsJSON)
+    else:
+        args.output.write_text(resultsJSON + "\n")
+
+
+def runScalingBenchmarks(
+    *,
+    parameterNames=tuple(sweeps),
+    stages=allStages,
+    backendNames=allBackendNames,
+    repeat=5,
+    minTime=0.02,
+    verbose=False,
+):
+    backends = [(name, getSurfaceClass(name)) for name in backendNames]
+    backends = [(name, surface) for name, surface in backends if surface is not None]
+    benchmarks = []
+
+    for parameterName in parameterNames:
+        values, overrides = sweeps[parameterName]
+        for value in values:
+            parameters = StressFontParameters(**overrides)._replace(
+                **{parameterName: value}
+            )
+            font = loadStressFont(parameters)
+            font.setLocation(location)
+            info = dict(
+                parameter=parameterName,
+                value=value,
+                font="stress",
+                glyph=stressGlyphName,
+                location=location,
+                paintFormats=getPaintFormats(font, stressGlyphName),
+                complexity=getComplexity(ComplexityAnalyzer(font), stressGlyphName),
+            )
+
+            def traverse():
+                recording = RecordingCanvas()
+                font.drawGlyph(stressGlyphName, recording)
+                return recording
+
+            def addBenchmark(stage, backendName, func):
+                nameParts = [stage, backendName, f"stress/{parameterName}={value}"]
+                name = "/".join(part for part in nameParts if part is not None)
+                number, samples = timeFunction(func, repeat, minTime)
+                benchmarks.append(
+                    dict(
+                        name=name,
+                        stage=stage,
+                        backend=backendName,
+                        **info,
+                        number=number,
+                        samples=samples,
+                    )
+                )
+                if verbose:
+                    median = sorted(samples)[len(samples) // 2]
+                    print(f"{name}: {median * 1000:.3f} ms", file=sys.stderr)
+
+            if "traverse" in stages:
+                addBenchmark("traverse", None, traverse)
+            if "rasterize" not in stages:
+                continue
+
+            recording = traverse()
+            boundingBox = font.getGlyphBounds(stressGlyphName)
+            boundingBox = intRect(scaleRect(boundingBox, scaleFactor, scaleFactor))
+            for backendName, surfaceClass in backends:
+
+                def rasterize():
+                    surface = surfaceClass()
+                    with surface.canvas(boundingBox) as canvas:
+                        canvas.scale(scaleFactor)
+                        recording.replay(canvas)
+                    return surface
+
+                addBenchmark("rasterize", backendName, rasterize)
+
+    return dict(environment=getEnvironment(), benchmarks=benchmarks)
+
+
+def loadStressFont(parameters):
+    """Build a stress font, and return it as a BlackRendererFont."""
+    f = BytesIO()
+    buildStressFont(parameters).save(f)
+    fontData = f.getvalue()
+    return BlackRendererFont(
+        ttFont=TTFont(BytesIO(fontData)), hbFont=hb.Font(hb.Face(fontData))
+    )
+
+
+if __name__ == "__main__":
+    main()
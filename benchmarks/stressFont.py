@@ -0,0 +1,363 @@
+"""Generate synthetic COLRv1 stress fonts for scaling benchmarks.
+
+Each font is built with fontTools' COLR builder, from a small set of
+parameters that each control one dimension of paint graph complexity:
+
+- layers: the number of layers in each PaintColrLayers leaf
+- depth: the PaintColrGlyph nesting depth above the leaf glyph
+- fanOut: the number of PaintColrGlyph references per nesting level; since
+  all of them refer to the same glyph, the paint graph is a DAG, and a
+  glyph visits fanOut ** depth leaves
+- stops: the number of color stops of each gradient
+- compositeDensity: the fraction of layers wrapped in a PaintComposite
+- variableDensity: the fraction of layers that use variable paints
+- outlineComplexity: the number of curve segments of each outline
+
+The color glyph to render is called "stress", and is mapped to "A". The font
+has a single "wght" axis; variable paints change at non-default weights.
+
+    $ python benchmarks/stressFont.py stress.ttf --layers 100 --depth 2
+"""
+
+import argparse
+import math
+from typing import NamedTuple
+from fontTools.colorLib.builder import buildCOLR, buildCPAL
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib.tables.otTables import CompositeMode, PaintFormat
+from fontTools.varLib.builder import buildVarData, buildVarRegionList, buildVarStore
+
+
+stressGlyphName = "stress"
+unitsPerEm = 1000
+numShapes = 8
+numColors = 12
+clipBox = (0, -200, 1000, 800)
+wghtAxis = ("wght", 100, 400, 900, "Weight")
+
+compositeModes = [mode for mode in CompositeMode if mode != CompositeMode.CLEAR]
+
+
+class StressFontParameters(NamedTuple):
+    layers: int = 16
+    depth: int = 0
+    fanOut: int = 2
+    stops: int = 4
+    compositeDensity: float = 0.0
+    variableDensity: float = 0.0
+    outlineComplexity: int = 16
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic COLRv1 stress font."
+    )
+    parser.add_argument("output", help="The output font file")
+    defaults = StressFontParameters()
+    for name, fieldType in StressFontParameters.__annotations__.items():
+        parser.add_argument(
+            "--" + _camelToDashes(name),
+            dest=name,
+            type=fieldType,
+            default=getattr(defaults, name),
+            help=f"(default: {getattr(defaults, name)})",
+        )
+    args = parser.parse_args()
+    parameters = StressFontParameters(
+        **{name: getattr(args, name) for name in StressFontParameters._fields}
+    )
+    buildStressFont(parameters).save(args.output)
+
+
+def buildStressFont(parameters=None, **kwargs):
+    """Build a stress font, and return it as a TTFont. Parameters can be
+    passed as a StressFontParameters tuple, or as keyword arguments.
+    """
+    if parameters is None:
+        parameters = StressFontParameters(**kwargs)
+    elif kwargs:
+        parameters = parameters._replace(**kwargs)
+    _checkParameters(parameters)
+
+    shapeNames = [f"shape{i}" for i in range(numShapes)]
+    levelNames = [f"{stressGlyphName}.level{i}" for i in range(parameters.depth)]
+    colorGlyphNames = levelNames + [stressGlyphName]
+    glyphOrder = [".notdef"] + colorGlyphNames + shapeNames
+
+    fb = FontBuilder(unitsPerEm, isTTF=True)
+    fb.setupGlyphOrder(glyphOrder)
+    fb.setupCharacterMap({ord("A"): stressGlyphName})
+    glyphs = {glyphName: _emptyGlyph() for glyphName in glyphOrder}
+    for i, shapeName in enumerate(shapeNames):
+        glyphs[shapeName] = _makeShapeGlyph(i, parameters.outlineComplexity)
+    fb.setupGlyf(glyphs)
+    fb.setupHorizontalMetrics({glyphName: (unitsPerEm, 0) for glyphName in glyphOrder})
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable(
+        dict(familyName="BlackRenderer Stress", styleName="Regular"),
+    )
+    fb.setupOS2(sTypoAscender=800, sTypoDescender=-200, usWinAscent=800)
+    fb.setupPost()
+    fb.setupFvar([wghtAxis], [])
+
+    builder = _PaintGraphBuilder(parameters)
+    colorGlyphs = builder.buildColorGlyphs(levelNames)
+    fb.font["COLR"] = buildCOLR(
+        colorGlyphs,
+        version=1,
+        glyphMap=fb.font.getReverseGlyphMap(),
+        varStore=builder.buildVarStore(),
+        clipBoxes={glyphName: clipBox for glyphName in colorGlyphs},
+    )
+    fb.font["CPAL"] = buildCPAL([_makePalette()])
+    return fb.font
+
+
+def _checkParameters(parameters):
+    if parameters.layers < 1:
+        raise ValueError("'layers' must be at least 1")
+    if parameters.depth < 0:
+        raise ValueError("'depth' must not be negative")
+    if parameters.fanOut < 1:
+        raise ValueError("'fanOut' must be at least 1")
+    if parameters.stops < 2:
+        raise ValueError("'stops' must be at least 2")
+    if parameters.outlineComplexity < 3:
+        raise ValueError("'outlineComplexity' must be at least 3")
+    for name in ["compositeDensity", "variableDensity"]:
+        if not 0 <= getattr(parameters, name) <= 1:
+            raise ValueError(f"'{name}' must be between 0 and 1")
+
+
+class _PaintGraphBuilder:
+    def __init__(self, parameters):
+        self.parameters = parameters
+        # One list of deltas per variation index, for the single region at
+        # the maximum weight
+        self.deltas = []
+
+    def buildColorGlyphs(self, levelNames):
+        # The leaf glyph is the innermost level, or "stress" itself if there
+        # is no nesting
+        glyphNames = levelNames + [stressGlyphName]
+        colorGlyphs = {glyphNames[0]: self.buildLeafPaint()}
+        for childName, glyphName in zip(glyphNames, glyphNames[1:]):
+            colorGlyphs[glyphName] = self.buildLevelPaint(childName)
+        return colorGlyphs
+
+    def buildLeafPaint(self):
+        parameters = self.parameters
+        layers = []
+        compositeIndex = 0
+        for i in range(parameters.layers):
+            paint = self.buildLayerPaint(i)
+            if _isSelected(i, parameters.compositeDensity):
+                paint = self.buildComposite(i, paint, compositeIndex)
+                compositeIndex += 1
+            layers.append(paint)
+        return {"Format": PaintFormat.PaintColrLayers, "Layers": layers}
+
+    def buildLevelPaint(self, childName):
+        fanOut = self.parameters.fanOut
+        scale = 1 / math.sqrt(fanOut)
+        layers = []
+        for i in range(fanOut):
+            angle = 2 * math.pi * i / fanOut
+            layers.append(
+                {
+                    "Format": PaintFormat.PaintTranslate,
+                    "dx": round(120 * math.cos(angle)) if fanOut > 1 else 0,
+                    "dy": round(120 * math.sin(angle)) if fanOut > 1 else 0,
+                    "Paint": {
+                        "Format": PaintFormat.PaintScaleUniformAroundCenter,
+                        "scale": scale,
+                        "centerX": 500,
+                        "centerY": 300,
+                        "Paint": {
+                            "Format": PaintFormat.PaintColrGlyph,
+                            "Glyph": childName,
+                        },
+                    },
+                }
+            )
+        return {"Format": PaintFormat.PaintColrLayers, "Layers": layers}
+
+    def buildLayerPaint(self, index):
+        isVariable = _isSelected(index, self.parameters.variableDensity)
+        fillBuilders = [
+            self.buildSolid,
+            self.buildLinearGradient,
+            self.buildRadialGradient,
+            self.buildSweepGradient,
+        ]
+        fill = fillBuilders[index % len(fillBuilders)](index, isVariable)
+        paint = {
+            "Format": PaintFormat.PaintGlyph,
+            "Glyph": f"shape{index % numShapes}",
+            "Paint": fill,
+        }
+        if isVariable:
+            paint = {
+                "Format": PaintFormat.PaintVarTranslate,
+                "dx": 0,
+                "dy": 0,
+                "VarIndexBase": self.addDeltas([40, -40]),
+                "Paint": paint,
+            }
+        return paint
+
+    def buildComposite(self, index, paint, compositeIndex):
+        backdrop = {
+            "Format": PaintFormat.PaintGlyph,
+            "Glyph": f"shape{(index + 1) % numShapes}",
+            "Paint": self.buildSolid(index + 1, False),
+        }
+        return {
+            "Format": PaintFormat.PaintComposite,
+            "SourcePaint": paint,
+            "CompositeMode": compositeModes[compositeIndex % len(compositeModes)],
+            "BackdropPaint": backdrop,
+        }
+
+    def buildSolid(self, index, isVariable):
+        paint = {"PaletteIndex": index % numColors, "Alpha": 0.8}
+        if isVariable:
+            paint["Format"] = PaintFormat.PaintVarSolid
+            paint["VarIndexBase"] = self.addDeltas([-0.5])
+        else:
+            paint["Format"] = PaintFormat.PaintSolid
+        return paint
+
+    def buildLinearGradient(self, index, isVariable):
+        return self.buildGradient(
+            PaintFormat.PaintLinearGradient,
+            index,
+            isVariable,
+            dict(x0=100, y0=-100, x1=900, y1=700, x2=900, y2=-100),
+            [0, 0, 60, 0, 0, 60],
+        )
+
+    def buildRadialGradient(self, index, isVariable):
+        return self.buildGradient(
+            PaintFormat.PaintRadialGradient,
+            index,
+            isVariable,
+            dict(x0=450, y0=250, r0=20, x1=500, y1=300, r1=450),
+            [0, 0, 10, 40, 40, -100],
+        )
+
+    def buildSweepGradient(self, index, isVariable):
+        return self.buildGradient(
+            PaintFormat.PaintSweepGradient,
+            index,
+            isVariable,
+            dict(centerX=500, centerY=300, startAngle=0, endAngle=270),
+            [0, 0, 0.25, 0.25],
+        )
+
+    def buildGradient(self, paintFormat, index, isVariable, fields, fieldDeltas):
+        colorLine = self.buildColorLine(index, isVariable)
+        paint = dict(fields, ColorLine=colorLine)
+        if isVariable:
+            # PaintVarXxx formats directly follow their static counterparts
+            paint["Format"] = paintFormat + 1
+            paint["VarIndexBase"] = self.addDeltas(fieldDeltas)
+        else:
+            paint["Format"] = paintFormat
+        return paint
+
+    def buildColorLine(self, index, isVariable):
+        numStops = self.parameters.stops
+        colorStops = []
+        for i in range(numStops):
+            colorStop = {
+                "StopOffset": i / (numStops - 1),
+                "PaletteIndex": (index + i) % numColors,
+                "Alpha": 1.0 if i % 2 else 0.7,
+            }
+            if isVariable:
+                # The variable offsets stay within [0, 1]
+                delta = 0.5 / (numStops - 1) if 0 < i < numStops - 1 else 0
+                colorStop["VarIndexBase"] = self.addDeltas([delta, -0.2])
+            colorStops.append(colorStop)
+        # Alternate the extend modes, to cover all of them
+        extend = ["pad", "repeat", "reflect"][index % 3]
+        return {"Extend": extend, "ColorStop": colorStops}
+
+    def addDeltas(self, fieldDeltas):
+        # Return the VarIndexBase for a sequence of variable fields, given
+        # their deltas at the maximum weight. Fractional deltas are for
+        # F2Dot14 fields.
+        varIndexBase = len(self.deltas)
+        for delta in fieldDeltas:
+            if isinstance(delta, float):
+                delta = round(delta * (1 << 14))
+            self.deltas.append([delta])
+        return varIndexBase
+
+    def buildVarStore(self):
+        if not self.deltas:
+            return None
+        axisTag = wghtAxis[0]
+        regionList = buildVarRegionList([{axisTag: (0, 1, 1)}], [axisTag])
+        # Without a DeltaSetIndexMap, variation indices address VarData
+        # subtables by their high 16 bits
+        varData = []
+        for start in range(0, len(self.deltas), 0x10000):
+            items = self.deltas[start:][:0x10000]
+            varData.append(buildVarData([0], items, optimize=False))
+        return buildVarStore(regionList, varData)
+
+
+def _isSelected(index, density):
+    # Spread the selected items evenly: exactly round(n * density) of the
+    # first n items are selected
+    return math.floor((index + 1) * density + 0.5) > math.floor(index * density + 0.5)
+
+
+def _makeShapeGlyph(shapeIndex, numSegments):
+    # A wavy ring made of quadratic segments, with a hole; shapes are
+    # spread out over the em
+    angle = 2 * math.pi * shapeIndex / numShapes
+    centerX = 500 + 200 * math.cos(angle)
+    centerY = 300 + 200 * math.sin(angle)
+    pen = TTGlyphPen(None)
+    _drawRing(pen, centerX, centerY, 240, numSegments, clockwise=True)
+    _drawRing(pen, centerX, centerY, 90, max(3, numSegments // 4), clockwise=False)
+    return pen.glyph()
+
+
+def _drawRing(pen, centerX, centerY, radius, numSegments, clockwise):
+    direction = -1 if clockwise else 1
+
+    def point(i, r):
+        a = direction * 2 * math.pi * i / (2 * numSegments)
+        return round(centerX + r * math.cos(a)), round(centerY + r * math.sin(a))
+
+    pen.moveTo(point(0, radius))
+    for i in range(numSegments):
+        offCurveRadius = radius * (1.25 if i % 2 else 0.9)
+        pen.qCurveTo(point(2 * i + 1, offCurveRadius), point(2 * i + 2, radius))
+    pen.closePath()
+
+
+def _emptyGlyph():
+    return TTGlyphPen(None).glyph()
+
+
+def _makePalette():
+    palette = []
+    for i in range(numColors):
+        hue = i / numColors
+        r, g, b = (0.5 + 0.5 * math.cos(2 * math.pi * (hue + k / 3)) for k in range(3))
+        palette.append((r, g, b, 1.0))
+    return palette
+
+
+def _camelToDashes(name):
+    return "".join("-" + c.lower() if c.isupper() else c for c in name)
+
+
+if __name__ == "__main__":
+    main()
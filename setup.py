@@ -37,12 +37,14 @@ setup(
     packages=find_packages("Lib"),
     install_requires=[
         "fonttools >= 4.34.0",
-        "uharfbuzz >= 0.16.0",
+        "uharfbuzz >= 0.39.0",
+        "numpy",
     ],
     extras_require={
-        "skia": ["skia-python", "numpy"],
+        "skia": ["skia-python"],
         "cairo": ["pycairo"],
         "cg": ["pyobjc; sys_platform == 'darwin'"],
+        "pathops": ["skia-pathops"],
     },
     setup_requires=["setuptools_scm"],
     entry_points={